@@ -0,0 +1,69 @@
+"""
+Data factories and timing helpers shared by the benchmarks
+"""
+import random
+import timeit
+import uuid
+from typing import Any, Callable
+
+WORDS = (
+    'government climate energy market election police city report court '
+    'minister company prices war talks health study data water summit '
+    'president protest bank oil gas school storm record million people'
+).split()
+SOURCES = [f'Source {i}' for i in range(50)]
+
+
+def sentence(n_words: int) -> str:
+    return ' '.join(random.choices(WORDS, k=n_words)).capitalize() + '.'
+
+
+def article(i: int) -> dict:
+    # a full newsapi article published during a week
+    source = random.choice(SOURCES)
+    return {
+        'id': uuid.uuid4().hex,
+        'source': {'id': source.lower().replace(' ', '-'), 'name': source},
+        'author': f'Author {i}',
+        'title': sentence(10),
+        'description': ' '.join(sentence(15) for _ in range(2)),
+        'url': f'https://example.com/news/{i}/{uuid.uuid4().hex}',
+        'urlToImage': f'https://example.com/images/{uuid.uuid4().hex}.jpg',
+        'publishedAt': (
+            f'2023-04-{random.randint(1, 7):02d}T'
+            f'{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:00Z'
+        ),
+        'content': ' '.join(sentence(20) for _ in range(3)),
+    }
+
+
+def make_important_news(n_articles: int) -> dict[str, dict]:
+    # a value of the important_news cache
+    articles = [article(i) for i in range(n_articles)]
+    return {
+        news_item['id']: {'importance': i, 'news': news_item}
+        for i, news_item in enumerate(articles)
+    }
+
+
+def time_per_run(func: Callable[[], Any], n_runs: int) -> float:
+    # seconds
+    return timeit.timeit(func, number=n_runs) / n_runs
+
+
+def bench(
+    name: str,
+    encode: Callable[[Any], str],
+    decode: Callable[[str], Any],
+    value: Any,
+    n_runs: int = 200,
+) -> None:
+    # prints a row of bytes stored, encode and decode time of a format
+    encoded = encode(value)
+    assert decode(encoded) == value
+    encode_time = time_per_run(lambda: encode(value), n_runs)
+    decode_time = time_per_run(lambda: decode(encoded), n_runs)
+    print(
+        f'{name:<24}{len(encoded.encode()):>10}'
+        f'{encode_time * 1e6:>14.1f}{decode_time * 1e6:>14.1f}'
+    )
@@ -0,0 +1,60 @@
+"""
+Compares the legacy JSON cache format with cache_codec on important_news
+payloads of 100 articles: bytes stored, encode and decode time.
+
+Run from the repository root: python -m benchmarks.cache_codec
+"""
+import json
+import random
+from unittest.mock import patch
+
+from benchmarks._common import bench, make_important_news
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc import cache_codec
+
+N_ARTICLES = 100
+
+
+def _legacy_decode(value: str):
+    # the legacy reader tried int and float before JSON
+    for cast in (int, float, json.loads):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def main() -> None:
+    random.seed(0)
+    important_news = make_important_news(N_ARTICLES)
+
+    print(f'{"format":<24}{"bytes":>10}{"encode, us":>14}{"decode, us":>14}')
+    bench('json (legacy)', json.dumps, _legacy_decode, important_news)
+
+    min_size = cache_codec.COMPRESS_MIN_SIZE
+    cache_codec.COMPRESS_MIN_SIZE = float('inf')
+    try:
+        bench(
+            'codec, uncompressed',
+            cache_codec.encode,
+            cache_codec.decode,
+            important_news,
+        )
+    finally:
+        cache_codec.COMPRESS_MIN_SIZE = min_size
+
+    bench(
+        'codec, compressed',
+        cache_codec.encode,
+        cache_codec.decode,
+        important_news,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Compares the legacy multi-pass cleaning of newsapi articles with
+news_api._clean_news on 10k realistic articles.
+
+Run from the repository root: python -m benchmarks.clean_news
+"""
+import copy
+import html
+import random
+import re
+from unittest.mock import patch
+
+from benchmarks._common import WORDS, time_per_run
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.news import news_api
+
+N_ARTICLES = 10000
+N_RUNS = 5
+# markup newsapi leaves in descriptions and contents
+DECORATIONS = (
+    '<p>{}</p>',
+    '<b>{}</b>',
+    '<a href="https://example.com/x?a=1&amp;b=2">{}</a>',
+    '{} &amp;',
+    '&#8220;{}&#8221;',
+    '{}&nbsp;',
+    '{}  \t',
+    '<li>{}</li>\r\n',
+)
+
+
+def _text(n_words: int, decorated: float) -> str:
+    words = random.choices(WORDS, k=n_words)
+    return ' '.join(
+        random.choice(DECORATIONS).format(word)
+        if random.random() < decorated
+        else word
+        for word in words
+    )
+
+
+def _article() -> dict:
+    return {
+        'title': _text(10, 0.05) if random.random() < 0.99 else None,
+        'description': _text(30, 0.1) if random.random() < 0.9 else None,
+        'content': _text(40, 0.15) + f'… [+{random.randint(1, 9999)} chars]',
+    }
+
+
+def _clean_news_legacy(news: list[dict]) -> None:
+    keys = ['title', 'description', 'content']
+    for news_item in news:
+        for key in keys:
+            if news_item[key] is None:
+                news_item[key] = ''
+            else:
+                news_item[key] = re.sub(r'<[^<]+?>', ' ', news_item[key])
+                news_item[key] = html.unescape(news_item[key])
+                news_item[key] = re.sub(r'[ \t]+', ' ', news_item[key])
+        news_item['content'] = re.sub(
+            r'\s*\[\+\d+ chars\]\s*$', '', news_item['content']
+        )
+
+
+def _bench(name: str, clean, news: list[dict]) -> None:
+    copies = [copy.deepcopy(news) for _ in range(N_RUNS)]
+    seconds = time_per_run(lambda: clean(copies.pop()), N_RUNS)
+    print(f'{name:<12}{seconds * 1e3:>12.1f}')
+
+
+def main() -> None:
+    random.seed(0)
+    news = [_article() for _ in range(N_ARTICLES)]
+
+    expected, actual = copy.deepcopy(news), copy.deepcopy(news)
+    _clean_news_legacy(expected)
+    news_api._clean_news(actual)
+    assert actual == expected
+
+    print(f'{"version":<12}{"time, ms":>12}')
+    _bench('legacy', _clean_news_legacy, news)
+    _bench('current', news_api._clean_news, news)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Measures ranking time of get_important_news for newsapi-like articles.
+
+Run from the repository root: python -m benchmarks.important_news
+"""
+import random
+from unittest.mock import patch
+
+from benchmarks._common import article, time_per_run
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.news.important_news import get_important_news
+    from utils.news.news import IMPORTANT_NEWS_KEYS
+
+N_RUNS = 20
+SEARCH_QUERY = 'climate energy'
+# newsapi truncates content to 200 characters
+CONTENT_LENGTH = 200
+
+
+def _article(i: int) -> dict:
+    news_item = article(i)
+    news_item['content'] = news_item['content'][:CONTENT_LENGTH]
+    return news_item
+
+
+def main() -> None:
+    random.seed(0)
+
+    print(f'{"articles":>10}{"time, ms":>12}')
+    for n_articles in (100, 1000, 5000):
+        news = [_article(i) for i in range(n_articles)]
+        seconds = time_per_run(
+            lambda: get_important_news(
+                SEARCH_QUERY, news, IMPORTANT_NEWS_KEYS
+            ),
+            N_RUNS,
+        )
+        print(f'{n_articles:>10}{seconds * 1e3:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares important_news values of 100 full newsapi articles with values of
+the same articles projected by news_api._project_news: bytes stored in
+Redis, encode and decode time.
+
+Run from the repository root: python -m benchmarks.news_projection
+"""
+import random
+from unittest.mock import patch
+
+from benchmarks._common import bench, make_important_news
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc import cache_codec
+    from utils.news import news_api
+
+N_ARTICLES = 100
+CONTENT_LENGTH = 200
+
+
+def main() -> None:
+    random.seed(0)
+    important_news = make_important_news(N_ARTICLES)
+    # newsapi truncates content to 200 characters
+    for item in important_news.values():
+        item['news']['content'] = item['news']['content'][:CONTENT_LENGTH]
+    projected_news = news_api._project_news(
+        [item['news'] for item in important_news.values()]
+    )
+    projected_important_news = {
+        news_item['id']: {'importance': item['importance'], 'news': news_item}
+        for item, news_item in zip(important_news.values(), projected_news)
+    }
+
+    print(f'{"articles":<24}{"bytes":>10}{"encode, us":>14}{"decode, us":>14}')
+    for compressed in (False, True):
+        min_size = cache_codec.COMPRESS_MIN_SIZE
+        if not compressed:
+            cache_codec.COMPRESS_MIN_SIZE = float('inf')
+        suffix = ', compressed' if compressed else ''
+        try:
+            for name, value in (
+                ('full', important_news),
+                ('projected', projected_important_news),
+            ):
+                bench(
+                    name + suffix,
+                    cache_codec.encode,
+                    cache_codec.decode,
+                    value,
+                )
+        finally:
+            cache_codec.COMPRESS_MIN_SIZE = min_size
+
+
+if __name__ == '__main__':
+    main()
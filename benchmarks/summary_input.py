@@ -0,0 +1,84 @@
+"""
+Compares the legacy summary_input._join_news with the current one on large
+inputs, with the default SUMMARY_MAX_INPUT and with a budget fitting all
+news.
+
+Run from the repository root: python -m benchmarks.summary_input
+"""
+import random
+import re
+from unittest.mock import patch
+
+from benchmarks._common import WORDS, time_per_run
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.news import summary_input
+
+N_RUNS = 5
+
+
+def _description() -> str:
+    words = random.choices(WORDS, k=random.randint(20, 60))
+    return ' \t'.join(words) if random.random() < 0.2 else ' '.join(words)
+
+
+def _clean_news_text_legacy(text: str) -> str:
+    text = text.lstrip(' \n\r\t')
+    text = text.rstrip(' \n\r\t:;,-‐‑‒﹣－')
+    if not text.endswith(('!', '?', '…', '.')):
+        text += '.'
+    text = re.sub(r'[\t ]{2,}', ' ', text, flags=re.MULTILINE)
+
+    return text
+
+
+def _join_news_legacy(
+    news: list[dict], key: str, max_item_length: int, sep: str = '\n\n'
+) -> str:
+    result = ''
+    total_length = 0
+    for item in news:
+        item_text = _clean_news_text_legacy(item[key]) + sep
+        if len(item_text) > max_item_length:
+            continue
+        total_length += len(item_text)
+        if total_length > summary_input.SUMMARY_MAX_INPUT:
+            continue
+        result += item_text
+
+    return result
+
+
+def _bench(name: str, join_news, news: list[dict]) -> None:
+    seconds = time_per_run(
+        lambda: join_news(news, 'description', 1000), N_RUNS
+    )
+    print(f'{name:<32}{seconds * 1e3:>12.2f}')
+
+
+def main() -> None:
+    random.seed(0)
+
+    print(f'{"news, version":<32}{"time, ms":>12}')
+    for n_news in (1000, 10000, 100000):
+        news = [{'description': _description()} for _ in range(n_news)]
+        for max_input in (summary_input.SUMMARY_MAX_INPUT, float('inf')):
+            with patch.object(summary_input, 'SUMMARY_MAX_INPUT', max_input):
+                assert _join_news_legacy(
+                    news, 'description', 1000
+                ) == summary_input._join_news(news, 'description', 1000)
+
+                budget = 'all' if max_input == float('inf') else max_input
+                _bench(f'{n_news}, {budget}, legacy', _join_news_legacy, news)
+                _bench(
+                    f'{n_news}, {budget}, current',
+                    summary_input._join_news,
+                    news,
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Times textrank.get_summary, the local summary engine, on summary inputs of
+60 news repeated up to SUMMARY_MAX_INPUT characters.
+
+Run from the repository root: python -m benchmarks.textrank
+"""
+from pathlib import Path
+from unittest.mock import patch
+
+from benchmarks._common import time_per_run
+
+# importing utils connects to the database, it is not needed here
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils import textrank
+    from utils.news import summary_input
+
+N_RUNS = 20
+N_CHARACTERS = 500
+DATA_PATH = Path('tests/utils/news/data/60_news_summary_input.txt')
+
+
+def main() -> None:
+    text = DATA_PATH.read_text()
+    print(f'{"characters":<12}{"time, ms":>12}')
+    for n_characters in (5000, 15000, summary_input.SUMMARY_MAX_INPUT):
+        sample = (text * (n_characters // len(text) + 1))[:n_characters]
+        seconds = time_per_run(
+            lambda: textrank.get_summary(sample, N_CHARACTERS), N_RUNS
+        )
+        print(f'{n_characters:<12}{seconds * 1e3:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
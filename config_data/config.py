@@ -26,6 +26,33 @@ POSTGRES_USER = os.getenv('POSTGRES_USER')
 POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 DROP_TABLES = os.getenv('DROP_TABLES', 'False').lower() == 'true'
 
+NEWS_DAY_SHARDS = os.getenv('NEWS_DAY_SHARDS', 'False').lower() == 'true'
+QUERY_SORT_TOKENS = os.getenv('QUERY_SORT_TOKENS', 'False').lower() == 'true'
+NEWS_EXTRA_FIELDS = tuple(
+    field.strip()
+    for field in os.getenv('NEWS_EXTRA_FIELDS', '').split(',')
+    if field.strip()
+)
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+summary_engines = {'remote', 'local', 'auto'}
+SUMMARY_ENGINE = os.getenv('SUMMARY_ENGINE', 'auto').lower()
+SUMMARY_ENGINE = (
+    SUMMARY_ENGINE if SUMMARY_ENGINE in summary_engines else 'auto'
+)
+ARTICLE_SUMMARY_ENGINE = os.getenv('ARTICLE_SUMMARY_ENGINE', 'auto').lower()
+ARTICLE_SUMMARY_ENGINE = (
+    ARTICLE_SUMMARY_ENGINE
+    if ARTICLE_SUMMARY_ENGINE in summary_engines
+    else 'auto'
+)
+SUMMARY_API_TIMEOUT = int(os.getenv('SUMMARY_API_TIMEOUT', '10'))
+SUMMARY_CHUNK_SIZE = int(os.getenv('SUMMARY_CHUNK_SIZE', '8000'))
+
+LOCAL_CACHE_MAX_BYTES = int(os.getenv('LOCAL_CACHE_MAX_BYTES', '0'))
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', '0'))
+
 loguru_levels = set('TRACE DEBUG INFO SUCCESS WARNING ERROR CRITICAL'.split())
 LOG_LEVEL_APP = os.getenv('LOG_LEVEL_APP', 'INFO').upper()
 LOG_LEVEL_APP = LOG_LEVEL_APP if LOG_LEVEL_APP in loguru_levels else 'INFO'
@@ -44,6 +71,8 @@ NEWS_TITLE = 'title'
 NEWS_DESCRIPTION = 'description'
 NEWS_BODY = 'content'
 NEWS_URL = 'url'
+NEWS_PUBLISHED_AT = 'publishedAt'
+NEWS_SOURCE = 'source'
 
 DEFAULT_COMMANDS = (
     ('start', 'Start bot'),
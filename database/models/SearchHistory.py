@@ -63,7 +63,8 @@ class SearchHistory(Model):
         cls, user_id: str | int, query: str, date_from: date, date_to: date
     ) -> None:
         """
-        Adds or updates search history item
+        Adds or updates search history item. An item with an equivalent
+        query (see normalize_query) is updated instead of adding a new one.
 
         :param user_id: user id
         :type user_id: str | int
@@ -74,6 +75,7 @@ class SearchHistory(Model):
         :param date_to: date to
         :type date_to: date
         """
+        query = cls._get_saved_query(user_id, query, date_from, date_to)
         history_item, created = cls.get_or_create(
             user_id=str(user_id),
             query=query,
@@ -83,3 +85,35 @@ class SearchHistory(Model):
         if not created:
             history_item.entered_date = datetime.now()
             history_item.save()
+
+    @classmethod
+    def _get_saved_query(
+        cls, user_id: str | int, query: str, date_from: date, date_to: date
+    ) -> str:
+        """
+        Gets a saved query equivalent to query
+
+        :param user_id: user id
+        :type user_id: str | int
+        :param query: query
+        :type query: str
+        :param date_from: date from
+        :type date_from: date
+        :param date_to: date to
+        :type date_to: date
+        :return: saved query, query if there is no equivalent saved query
+        :rtype: str
+        """
+        # imported here as utils depend on the database being initialized
+        from utils.news.utils import normalize_query
+
+        normalized_query = normalize_query(query)
+        saved_queries = cls.select(cls.query).where(
+            (cls.user_id == str(user_id))
+            & (cls.date_from == date_from)
+            & (cls.date_to == date_to)
+        )
+        for history_item in saved_queries:
+            if normalize_query(history_item.query) == normalized_query:
+                return history_item.query
+        return query
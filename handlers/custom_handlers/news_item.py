@@ -7,8 +7,6 @@ from config_data import config
 from keyboards.reply import news_menu
 from loader import bot
 from utils import top_news
-from utils.misc import redis_cache as cache
-from utils.summary import get_summary
 
 
 @bot.callback_query_handler(
@@ -64,13 +62,7 @@ def bot_news_summary(call: CallbackQuery):
     if news_item:
         title = news_item[config.NEWS_TITLE]
 
-        summary = cache.get_set(
-            cache.key('article_summary', news_id),
-            ttl,
-            get_summary,
-            news_item[config.NEWS_BODY],
-        )
-        summary = ' '.join(summary)
+        summary = ' '.join(top_news.get_article_summary(news_item, ttl))
 
         text_msg = f'*Summary of article "{title}"*:\n{summary}'
         bot.send_message(chat_id, text_msg, parse_mode='Markdown')
@@ -1,15 +1,30 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
+from functools import partial
+from typing import Any
 
 import requests
 from loguru import logger
 
+from config_data import config
 from keyboards.reply import news_menu
 from loader import bot
 from states.news_state import NewsState
 from utils.misc import redis_cache as cache
 from utils.news.news import get_news_semimanufactures
 from utils.summary import get_summary
-from utils.top_news import cache_top_news_items, get_top_news
+from utils.top_news import (
+    cache_top_news_items,
+    get_top_news,
+    prefetch_article_summaries,
+)
+
+# max number of news summaries computed at once
+SUMMARY_WORKERS = 8
+
+_summary_executor = ThreadPoolExecutor(
+    max_workers=SUMMARY_WORKERS, thread_name_prefix='summary'
+)
 
 
 def get_results(
@@ -65,17 +80,23 @@ def get_results(
         bot.send_message(chat_id, text_msg, parse_mode='Markdown')
 
         summary, top_news = _get_summary_and_top_news(
-            search_query, date_from, date_to, summary_input, important_news
+            search_query,
+            date_from,
+            date_to,
+            summary_input,
+            important_news,
         )
 
-        if summary and top_news:
+        if top_news:
             bot.set_state(user_id, NewsState.got_news, chat_id)
-            _display_summary_and_top_news(chat_id, summary, top_news)
+            _display_top_news(chat_id, top_news)
+            prefetch_article_summaries(top_news, date_to)
+            _display_summary(chat_id, summary)
             bot.delete_state(user_id, chat_id)
         else:
             bot.delete_state(user_id, chat_id)
             logger.error(
-                f'Unable to get summary & top news for query: '
+                f'Unable to get top news for query: '
                 f'"{search_query}", period: {date_from_str} - {date_to_str}.'
             )
             bot.send_message(
@@ -111,9 +132,11 @@ def _get_summary_and_top_news(
     date_to: date,
     summary_input: str,
     important_news: dict,
-) -> tuple[list, list]:
+) -> tuple[Future, list]:
     """
-    Gets summary and top news and saves in cache if needed
+    Starts getting summary in the background and gets top news meanwhile,
+    saves them in cache if needed. Top news do not depend on summary, so
+    they can be displayed before the summary is ready.
 
     :param search_query: search query
     :type search_query: str
@@ -125,22 +148,41 @@ def _get_summary_and_top_news(
     :type summary_input: str
     :param important_news: important news
     :type important_news: dict
-    :return: summary and top news
-    :rtype: tuple[list, list]
+    :return: summary future and top news
+    :rtype: tuple[Future, list]
     """
-    summary = cache.get_set(
+    summary_entry, top_news_entry = cache.prefetch(
         cache.key_query('summary', search_query, date_from, date_to),
+        cache.key_query('top_news', search_query, date_from, date_to),
+    )
+    summary_input_key, important_news_key = (
+        cache.key_query(prefix, search_query, date_from, date_to)
+        for prefix in ('summary_input', 'important_news')
+    )
+
+    summary = _summary_executor.submit(
+        cache.get_set_entry,
+        summary_entry,
         cache.calc_ttl(date_to),
         get_summary,
         summary_input,
+        engine=config.SUMMARY_ENGINE,
+        refresh=partial(
+            _calc_from_cached_input,
+            summary_input_key,
+            get_summary,
+            engine=config.SUMMARY_ENGINE,
+        ),
     )
 
-    top_news = cache.get_set(
-        cache.key_query('top_news', search_query, date_from, date_to),
+    top_news = cache.get_set_entry(
+        top_news_entry,
         cache.calc_ttl(date_to),
         get_top_news,
-        summary,
         important_news,
+        refresh=partial(
+            _calc_from_cached_input, important_news_key, get_top_news
+        ),
     )
 
     cache_top_news_items(top_news, date_to)
@@ -148,23 +190,38 @@ def _get_summary_and_top_news(
     return summary, top_news
 
 
-def _display_summary_and_top_news(
-    chat_id: str, summary: list[str], top_news: list[dict]
-) -> None:
+def _calc_from_cached_input(input_key: str, func: callable, **kwargs) -> Any:
     """
-    Displays summary and top news
+    Calculates func result from its input read from cache again.
+    Summary and top news are refreshed this way: news read by the request
+    may be stale and be replaced by their background refresh meanwhile,
+    so the result is not calculated until the input is fresh.
+
+    :param input_key: key of func input
+    :type input_key: str
+    :param func: function for calculating result
+    :type func: callable
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :return: func result, None if the input is missing or stale
+    :rtype: Any
+    """
+    (value,), (stale,) = cache.get_fresh_many([input_key])
+    if value is None or stale:
+        logger.debug(f'{input_key} is not fresh, its results are kept')
+        return None
+    return func(value, **kwargs)
+
+
+def _display_top_news(chat_id: str, top_news: list[dict]) -> None:
+    """
+    Displays top news
 
     :param chat_id: chat id
     :type chat_id: str
-    :param summary: summary
-    :type summary: list[str]
     :param top_news: top news
     :type top_news: list[dict]
     """
-    text_msg = '*Here is summary of news for the chosen period:*\n'
-    text_msg = text_msg + ' '.join(summary)
-    bot.send_message(chat_id, text_msg, parse_mode='Markdown')
-
     text_msg = (
         '*Here are top news. You can choose one to get '
         'its summary or read the full article.*'
@@ -175,3 +232,31 @@ def _display_summary_and_top_news(
         reply_markup=news_menu.main(top_news),
         parse_mode='Markdown',
     )
+
+
+def _display_summary(chat_id: str, summary: Future) -> None:
+    """
+    Waits for summary and displays it. Top news are already displayed, so
+    errors of the summary are reported here.
+
+    :param chat_id: chat id
+    :type chat_id: str
+    :param summary: summary future
+    :type summary: Future
+    """
+    try:
+        summary = summary.result()
+    except Exception as exception:
+        logger.error(f'Summary failed for chat {chat_id}: {exception}')
+        summary = None
+
+    if not summary:
+        logger.error(f'Unable to get summary for chat {chat_id}.')
+        bot.send_message(
+            chat_id, '*Unable to get news summary.*', parse_mode='Markdown'
+        )
+        return
+
+    text_msg = '*Here is summary of news for the chosen period:*\n'
+    text_msg = text_msg + ' '.join(summary)
+    bot.send_message(chat_id, text_msg, parse_mode='Markdown')
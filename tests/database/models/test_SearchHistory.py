@@ -33,6 +33,9 @@ def test_get_recent(mocker, history_item):
 
 
 def test_add_or_update_new(mocker, history_item):
+    mocker.patch.object(
+        SearchHistory, '_get_saved_query', return_value=history_item.query
+    )
     mock_get_or_create = mocker.patch.object(SearchHistory, 'get_or_create')
     mock_get_or_create.return_value = (history_item, True)
     SearchHistory.add_or_update(
@@ -50,6 +53,9 @@ def test_add_or_update_new(mocker, history_item):
 
 
 def test_add_or_update_existing(mocker, history_item):
+    mocker.patch.object(
+        SearchHistory, '_get_saved_query', return_value=history_item.query
+    )
     mock_get_or_create = mocker.patch.object(SearchHistory, 'get_or_create')
     mock_save = mocker.patch.object(SearchHistory, 'save')
     mock_get_or_create.return_value = (history_item, False)
@@ -61,3 +67,52 @@ def test_add_or_update_existing(mocker, history_item):
     )
     assert isinstance(history_item.entered_date, datetime)
     mock_save.assert_called()
+
+
+def test_add_or_update_equivalent_query(mocker, history_item):
+    mock_get_saved_query = mocker.patch.object(
+        SearchHistory, '_get_saved_query', return_value='Test Query'
+    )
+    mock_get_or_create = mocker.patch.object(SearchHistory, 'get_or_create')
+    mock_get_or_create.return_value = (history_item, False)
+    mocker.patch.object(SearchHistory, 'save')
+    SearchHistory.add_or_update(
+        history_item.user_id,
+        ' test  query',
+        history_item.date_from,
+        history_item.date_to,
+    )
+    mock_get_saved_query.assert_called_once_with(
+        history_item.user_id,
+        ' test  query',
+        history_item.date_from,
+        history_item.date_to,
+    )
+    assert mock_get_or_create.call_args.kwargs['query'] == 'Test Query'
+
+
+@pytest.mark.parametrize(
+    'query, expected',
+    [
+        ('bitcoin  PRICE ', 'Bitcoin price'),
+        ('Ecology', 'Ecology'),
+    ],
+)
+def test__get_saved_query(mocker, history_item, query, expected):
+    mocker.patch('database.init_db.init_db')
+    mocker.patch('database.init_db.create_tables')
+    mock_select = mocker.patch(
+        'database.models.SearchHistory.SearchHistory.select'
+    )
+    mock_select.return_value.where.return_value = [
+        SearchHistory(query='Climate'),
+        SearchHistory(query='Bitcoin price'),
+    ]
+    actual = SearchHistory._get_saved_query(
+        history_item.user_id,
+        query,
+        history_item.date_from,
+        history_item.date_to,
+    )
+    assert actual == expected
+    mock_select.assert_called_once_with(SearchHistory.query)
@@ -109,22 +109,19 @@ def test_bot_click_news_item_error(
 
 @patch('handlers.custom_handlers.news_item.bot')
 @patch('handlers.custom_handlers.news_item.top_news')
-@patch('handlers.custom_handlers.news_item.cache')
-@patch('handlers.custom_handlers.news_item.get_summary')
 def test_bot_news_summary(
-    mock_get_summary,
-    mock_cache,
     mock_top_news,
     mock_bot,
     news_item,
     callback_query2,
 ):
     mock_top_news.get_cached_top_news_item.return_value = (news_item, 3600)
-    mock_cache.get_set.return_value = ['summary of article']
-    mock_get_summary.return_value = 'summary of article'
+    mock_top_news.get_article_summary.return_value = ['summary of article']
 
     bot_news_summary(callback_query2)
 
+    mock_top_news.get_article_summary.assert_called_once_with(news_item, 3600)
+
     mock_bot.send_message.assert_called_once()
     assert (
         mock_bot.send_message.call_args[0][0]
@@ -136,22 +133,18 @@ def test_bot_news_summary(
 
 @patch('handlers.custom_handlers.news_item.bot')
 @patch('handlers.custom_handlers.news_item.top_news')
-@patch('handlers.custom_handlers.news_item.cache')
-@patch('handlers.custom_handlers.news_item.get_summary')
 def test_bot_news_summary_error(
-    mock_get_summary,
-    mock_cache,
     mock_top_news,
     mock_bot,
     news_item,
     callback_query2,
 ):
     mock_top_news.get_cached_top_news_item.return_value = (None, 0)
-    mock_cache.get_set.return_value = []
-    mock_get_summary.return_value = 'summary of article'
 
     bot_news_summary(callback_query2)
 
+    mock_top_news.get_article_summary.assert_not_called()
+
     mock_bot.send_message.assert_called_once()
     assert (
         mock_bot.send_message.call_args[0][0]
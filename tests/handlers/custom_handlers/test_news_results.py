@@ -1,5 +1,6 @@
+from concurrent.futures import Future
 from datetime import date
-from unittest.mock import Mock, patch
+from unittest.mock import Mock, call, patch
 
 import pytest
 
@@ -37,11 +38,13 @@ def top_news():
     return [{'id': 1, 'title': 'title1'}]
 
 
+@patch('handlers.custom_handlers.news_results.prefetch_article_summaries')
 @patch('handlers.custom_handlers.news_results.get_news_semimanufactures')
 @patch('handlers.custom_handlers.news_results._get_summary_and_top_news')
 def test_get_results(
     get_summary_and_top_news_mock,
     get_news_semimanufactures_mock,
+    prefetch_article_summaries_mock,
     mock_bot,
     chat_and_user_id,
     date_range,
@@ -53,14 +56,35 @@ def test_get_results(
         'summary',
         important_news,
     )
-    get_summary_and_top_news_mock.return_value = ('summary', top_news)
+    summary = Future()
+    summary.set_result(['summary'])
+    get_summary_and_top_news_mock.return_value = (summary, top_news)
+    n_sent_before_prefetch = []
+    prefetch_article_summaries_mock.side_effect = (
+        lambda *args: n_sent_before_prefetch.append(
+            mock_bot.send_message.call_count
+        )
+    )
     with patch('handlers.custom_handlers.news_results.bot', mock_bot):
-        news_results.get_results(*chat_and_user_id, 'test_query', *date_range)
-    assert get_news_semimanufactures_mock.call_count == 1
+        news_results.get_results(*chat_and_user_id, 'Test Query', *date_range)
+    # API gets the query as entered, cache keys normalize it
+    get_news_semimanufactures_mock.assert_called_once_with(
+        'Test Query', *date_range
+    )
+    assert get_summary_and_top_news_mock.call_args[0][0] == 'Test Query'
     assert get_summary_and_top_news_mock.call_count == 1
     assert mock_bot.set_state.call_count == 1
     assert mock_bot.delete_state.call_count == 1
     assert mock_bot.send_message.call_count == 4
+    # top news are displayed before summary
+    messages = [args[0][1] for args in mock_bot.send_message.call_args_list]
+    assert messages[2].startswith('*Here are top news.')
+    assert messages[3].endswith('summary')
+    prefetch_article_summaries_mock.assert_called_once_with(
+        top_news, date_range[1]
+    )
+    # summaries are prefetched after top news are sent
+    assert n_sent_before_prefetch == [3]
 
 
 @patch('utils.misc.redis_cache.redis_connection')
@@ -78,25 +102,79 @@ def test_get_summary_and_top_news(
     top_news,
 ):
     mock_redis_connection.exists.return_value = False
+    pipeline = mock_redis_connection.pipeline.return_value
+    pipeline.execute.return_value = [
+        [None, None],
+        [None, None],
+        -2,
+        [None, None],
+        -2,
+    ]
     get_top_news_mock.return_value = top_news
     important_news = [
         {'id': 1, 'importance': 1, 'news': {'id': 1, 'title': 'title1'}},
         {'id': 2, 'importance': 2, 'news': {'id': 2, 'title': 'title2'}},
     ]
-    result = news_results._get_summary_and_top_news(
+    summary, top_news = news_results._get_summary_and_top_news(
         'test_query', *date_range, 'summary_input', important_news
     )
+    assert summary.result(timeout=5) == 'summary'
+    assert top_news == [{'id': 1, 'title': 'title1'}]
     assert get_summary_mock.call_count == 1
-    assert get_top_news_mock.call_count == 1
+    get_top_news_mock.assert_called_once_with(important_news)
     assert cache_top_news_items_mock.call_count == 1
-    assert result == ('summary', [{'id': 1, 'title': 'title1'}])
+    assert pipeline.mget.call_count == 1
+
+
+@pytest.mark.parametrize(
+    'value, stale, expected',
+    [('input', False, 'result'), ('input', True, None), (None, True, None)],
+)
+@patch('handlers.custom_handlers.news_results.cache.get_fresh_many')
+def test_calc_from_cached_input(get_fresh_many_mock, value, stale, expected):
+    get_fresh_many_mock.return_value = [value], [stale]
+    func = Mock(return_value='result')
+
+    result = news_results._calc_from_cached_input('summary_input:a', func, a=1)
 
+    assert result == expected
+    get_fresh_many_mock.assert_called_once_with(['summary_input:a'])
+    if expected is None:
+        func.assert_not_called()
+    else:
+        func.assert_called_once_with('input', a=1)
 
-def test_display_summary_and_top_news(mock_bot):
+
+def test_display_top_news(mock_bot):
+    top_news = [{'id': 1, 'title': 'title2'}, {'id': 2, 'title': 'title2'}]
     with patch('handlers.custom_handlers.news_results.bot', mock_bot):
-        news_results._display_summary_and_top_news(
-            '123',
+        news_results._display_top_news('123', top_news)
+    assert mock_bot.send_message.call_count == 1
+    assert mock_bot.send_message.call_args[1]['reply_markup'] is not None
+
+
+@pytest.mark.parametrize(
+    'summary, expected',
+    [
+        (
             ['summary1', 'summary2'],
-            [{'id': 1, 'title': 'title2'}, {'id': 2, 'title': 'title2'}],
-        )
-    assert mock_bot.send_message.call_count == 2
+            '*Here is summary of news for the chosen period:*\n'
+            'summary1 summary2',
+        ),
+        (None, '*Unable to get news summary.*'),
+        ([], '*Unable to get news summary.*'),
+        (ValueError('failed'), '*Unable to get news summary.*'),
+    ],
+)
+def test_display_summary(mock_bot, summary, expected):
+    future = Future()
+    if isinstance(summary, Exception):
+        future.set_exception(summary)
+    else:
+        future.set_result(summary)
+
+    with patch('handlers.custom_handlers.news_results.bot', mock_bot):
+        news_results._display_summary('123', future)
+    assert mock_bot.send_message.call_args_list == [
+        call('123', expected, parse_mode='Markdown')
+    ]
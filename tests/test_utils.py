@@ -1,6 +1,7 @@
 import json
 import os
 import re
+from unittest.mock import MagicMock
 
 from config_data import config
 
@@ -54,3 +55,59 @@ def create_news_index(news: list[dict]) -> dict:
         news_index[news_item[config.NEWS_ID]] = news_item
 
     return news_index
+
+
+class FakeResponse:
+    """
+    aiohttp response returning a fixed status and text
+
+    Args:
+        status (int): status code
+        text (str): response text
+    """
+
+    def __init__(self, status: int, text: str):
+        """
+        Constructor method
+
+        :param status: status code
+        :type status: int
+        :param text: response text
+        :type text: str
+        """
+        self.status = status
+        self._text = text
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def text(self) -> str:
+        return self._text
+
+
+def fake_session(
+    status: int = 200,
+    text: str = '{"result": "abc"}',
+    exception: Exception = None,
+) -> MagicMock:
+    """
+    Creates aiohttp session mock returning FakeResponse or raising exception
+
+    :param status: status code
+    :type status: int
+    :param text: response text
+    :type text: str
+    :param exception: exception to raise, defaults to None
+    :type exception: Exception
+    :return: session mock
+    :rtype: MagicMock
+    """
+    session = MagicMock()
+    if exception is not None:
+        session.request.side_effect = exception
+    else:
+        session.request.return_value = FakeResponse(status, text)
+    return session
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import aiohttp
+import pytest
+
+from tests.test_utils import fake_session
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc.async_api_query_scheduler import (
+        AsyncApiQuery,
+        AsyncApiQueryScheduler,
+        execute_many,
+        run,
+    )
+
+
+@pytest.mark.parametrize(
+    'method, status, text, expected_response',
+    [
+        ('GET', 200, '{"result": "abc"}', {'result': 'abc'}),
+        ('POST', 201, '{"result": "abc"}', {'result': 'abc'}),
+        ('GET', 200, 'not json', None),
+        ('GET', 400, '{"result": "abc"}', None),
+        ('POST', 500, '', None),
+    ],
+)
+def test_AsyncApiQuery_execute(method, status, text, expected_response):
+    session = fake_session(status, text)
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        query = AsyncApiQuery(method, 'http://test.com', {}, {'a': 'b'})
+        response = asyncio.run(query.execute())
+
+    assert response == expected_response
+    args, kwargs = session.request.call_args
+    assert args == (method, 'http://test.com')
+    assert kwargs['timeout'].total == 10
+    if method == 'GET':
+        assert kwargs['params'] == {'a': 'b'}
+    else:
+        assert kwargs['json'] == {'a': 'b'}
+
+
+@pytest.mark.parametrize(
+    'exception', [aiohttp.ClientError('failed'), asyncio.TimeoutError()]
+)
+def test_AsyncApiQuery_execute_error(exception):
+    session = fake_session(exception=exception)
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        query = AsyncApiQuery('GET', 'http://test.com', {}, {})
+        assert asyncio.run(query.execute()) is None
+
+
+def test_AsyncApiQuery_get_payload():
+    query = AsyncApiQuery('GET', 'url', None, {'a': 1, 'b': None})
+    assert query._get_payload() == {'params': {'a': 1}}
+
+    query = AsyncApiQuery('POST', 'url', None, {'a': 1, 'b': None})
+    assert query._get_payload() == {'json': {'a': 1, 'b': None}}
+
+
+@patch(
+    'utils.misc.async_api_query_scheduler.rate_limiter.acquire', return_value=0
+)
+def test_AsyncApiQueryScheduler_execute_concurrent(acquire_mock):
+    session = fake_session()
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        queries = [
+            AsyncApiQuery('GET', 'http://test.com', {}, {}) for _ in range(4)
+        ]
+
+        async def execute_all():
+            return await asyncio.gather(
+                *(AsyncApiQueryScheduler.execute(query) for query in queries)
+            )
+
+        start_time = datetime.utcnow()
+        results = asyncio.run(execute_all())
+        end_time = datetime.utcnow()
+
+    assert results == [{'result': 'abc'}] * 4
+    assert end_time - start_time < timedelta(seconds=0.5)
+
+
+def test_execute_many():
+    session = fake_session()
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        queries = [
+            AsyncApiQuery('GET', 'http://test.com', {}, {'page': i})
+            for i in range(3)
+        ]
+        results = execute_many(queries)
+
+    assert results == [{'result': 'abc'}] * 3
+    assert session.request.call_count == 3
+
+
+def test_run():
+    async def coroutine():
+        await asyncio.sleep(0)
+        return 42
+
+    assert run(coroutine()) == 42
+    assert run(coroutine()) == 42
+
+
+@patch('utils.misc.async_api_query_scheduler.rate_limiter.acquire')
+def test_AsyncApiQueryScheduler_execute_rate_limit(acquire_mock):
+    session = fake_session()
+    acquire_mock.return_value = 0.3
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        query = AsyncApiQuery('GET', 'http://test.com', {}, {})
+        start_time = datetime.utcnow()
+        asyncio.run(AsyncApiQueryScheduler.execute(query))
+
+    acquire_mock.assert_called_once_with('http://test.com')
+    assert datetime.utcnow() - start_time >= timedelta(seconds=0.3)
+
+
+@patch(
+    'utils.misc.async_api_query_scheduler.rate_limiter.acquire',
+    return_value=None,
+)
+def test_AsyncApiQueryScheduler_execute_refused(acquire_mock):
+    session = fake_session()
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        query = AsyncApiQuery('GET', 'http://test.com', {}, {})
+        assert asyncio.run(AsyncApiQueryScheduler.execute(query)) is None
+
+    session.request.assert_not_called()
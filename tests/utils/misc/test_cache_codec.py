@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import pytest
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc import cache_codec
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        '2024',
+        'NaN',
+        '',
+        'текст',
+        2024,
+        -1,
+        1.5,
+        float('inf'),
+        True,
+        None,
+        [1, 'a', None],
+        {'a': {'b': [1, 2.5]}},
+    ],
+)
+def test_encode_decode(value):
+    encoded = cache_codec.encode(value)
+    assert cache_codec.is_encoded(encoded)
+    decoded = cache_codec.decode(encoded)
+    assert decoded == value
+    assert type(decoded) is type(value)
+
+
+def test_encode_decode_nan():
+    value = cache_codec.decode(cache_codec.encode(float('nan')))
+    assert value != value
+
+
+def test_encode_tags():
+    assert cache_codec.encode('2024') == '\x00s2024'
+    assert cache_codec.encode(2024) == '\x00i2024'
+    assert cache_codec.encode({1: 'a'}) == '\x00j{"1":"a"}'
+
+
+def test_encode_compressed():
+    value = {str(i): {'title': 'news title ' * 10} for i in range(200)}
+    encoded = cache_codec.encode(value)
+    assert encoded.startswith('\x00zj')
+    assert encoded.isascii()
+    assert len(encoded) < len(cache_codec.encode({})) + 1000
+    assert cache_codec.decode(encoded) == value
+
+    value = 'a' * cache_codec.COMPRESS_MIN_SIZE
+    encoded = cache_codec.encode(value)
+    assert encoded.startswith('\x00zs')
+    assert cache_codec.decode(encoded) == value
+
+    value = 'a' * (cache_codec.COMPRESS_MIN_SIZE - 1)
+    assert cache_codec.encode(value) == '\x00s' + value
+
+
+def test_decode_errors():
+    with pytest.raises(ValueError):
+        cache_codec.decode('{"a": 1}')
+    with pytest.raises(ValueError):
+        cache_codec.decode('\x00')
+    with pytest.raises(ValueError):
+        cache_codec.decode('\x00?abc')
+
+
+def test_register():
+    class Point(tuple):
+        pass
+
+    with pytest.raises(ValueError):
+        cache_codec.register(cache_codec.Codec('zz', (), str, str))
+    with pytest.raises(ValueError):
+        cache_codec.register(cache_codec.Codec('z', (), str, str))
+
+    codec = cache_codec.Codec(
+        'p',
+        (Point,),
+        lambda point: ','.join(map(str, point)),
+        lambda payload: Point(map(int, payload.split(','))),
+    )
+    cache_codec.register(codec)
+    try:
+        encoded = cache_codec.encode(Point((1, 2)))
+        assert encoded == '\x00p1,2'
+        assert isinstance(cache_codec.decode(encoded), Point)
+    finally:
+        del cache_codec._codecs_by_tag['p']
+        del cache_codec._codecs_by_type[Point]
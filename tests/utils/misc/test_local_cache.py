@@ -0,0 +1,91 @@
+from unittest.mock import patch
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc.local_cache import ENTRY_OVERHEAD, LocalCache
+
+
+def test_LocalCache_get_put():
+    cache = LocalCache(10000, 10)
+    assert cache.enabled
+    assert cache.get('a') is None
+
+    cache.put('a', 'value', 5, 100, cache.epoch)
+    value, ttl_left = cache.get('a')
+    assert value == 'value'
+    assert 99 < ttl_left <= 100
+    assert len(cache) == 1
+    assert cache.n_bytes == 5 + 1 + ENTRY_OVERHEAD
+
+    cache.put('a', 'new value', 9, 100, cache.epoch)
+    assert cache.get('a')[0] == 'new value'
+    assert len(cache) == 1
+    assert cache.n_bytes == 9 + 1 + ENTRY_OVERHEAD
+
+
+def test_LocalCache_disabled():
+    for cache in (LocalCache(0, 10), LocalCache(10000, 0)):
+        assert not cache.enabled
+        cache.put('a', 'value', 5, 100, cache.epoch)
+        assert cache.get('a') is None
+
+
+def test_LocalCache_ttl():
+    cache = LocalCache(10000, 10)
+    cache.put('a', 'value', 5, 0, cache.epoch)
+    cache.put('b', 'value', 5, -1, cache.epoch)
+    assert len(cache) == 0
+
+    with patch('utils.misc.local_cache.time.monotonic', return_value=100):
+        cache.put('a', 'value', 5, 10, cache.epoch)
+    with patch('utils.misc.local_cache.time.monotonic', return_value=109):
+        assert cache.get('a') is not None
+    with patch('utils.misc.local_cache.time.monotonic', return_value=110):
+        assert cache.get('a') is None
+    assert len(cache) == 0
+    assert cache.n_bytes == 0
+
+
+def test_LocalCache_max_entries():
+    cache = LocalCache(10000, 2)
+    cache.put('a', 1, 1, 100, cache.epoch)
+    cache.put('b', 2, 1, 100, cache.epoch)
+    cache.get('a')
+    cache.put('c', 3, 1, 100, cache.epoch)
+    assert cache.get('b') is None
+    assert cache.get('a')[0] == 1
+    assert cache.get('c')[0] == 3
+
+
+def test_LocalCache_max_bytes():
+    entry_size = 100 + 1 + ENTRY_OVERHEAD
+    cache = LocalCache(entry_size * 2, 10)
+    cache.put('a', 1, 100, 100, cache.epoch)
+    cache.put('b', 2, 100, 100, cache.epoch)
+    cache.put('c', 3, 100, 100, cache.epoch)
+    assert cache.get('a') is None
+    assert cache.n_bytes == entry_size * 2
+
+    cache.put('d', 4, entry_size * 2, 100, cache.epoch)
+    assert cache.get('d') is None
+    assert len(cache) == 2
+
+
+def test_LocalCache_invalidate():
+    cache = LocalCache(10000, 10)
+    epoch = cache.epoch
+    cache.put('a', 1, 1, 100, epoch)
+    cache.put('b', 2, 1, 100, epoch)
+
+    cache.invalidate('a', 'c')
+    assert cache.get('a') is None
+    assert cache.get('b')[0] == 2
+    assert cache.epoch > epoch
+
+    cache.put('a', 1, 1, 100, epoch)
+    assert cache.get('a') is None
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.n_bytes == 0
@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc import rate_limiter
+
+
+@pytest.mark.parametrize(
+    'url, script_result, expected_result',
+    [
+        ('https://newsapi.org/v2/everything', '0', 0),
+        ('https://NewsAPI.org/v2/everything', '1.5', 1.5),
+        ('https://text-analysis12.p.rapidapi.com/summarize', '0.1', 0.1),
+        # the max wait is exceeded
+        ('https://newsapi.org/v2/everything', '-1', None),
+    ],
+)
+def test_acquire(url, script_result, expected_result):
+    script = MagicMock(return_value=script_result)
+    with patch('utils.misc.rate_limiter._get_script', return_value=script):
+        assert rate_limiter.acquire(url) == expected_result
+
+    host = url.split('/')[2].lower()
+    capacity, rate, max_wait = rate_limiter.RATE_LIMITS[host]
+    script.assert_called_once_with(
+        keys=[f'rate_limit:{host}'], args=[capacity, rate, 1, max_wait]
+    )
+
+
+def test_acquire_no_limit():
+    with patch('utils.misc.rate_limiter._get_script') as get_script_mock:
+        assert rate_limiter.acquire('http://test.com') == 0
+        get_script_mock.assert_not_called()
+
+
+def test_acquire_redis_error():
+    script = MagicMock(side_effect=redis.ConnectionError('no connection'))
+    with patch('utils.misc.rate_limiter._get_script', return_value=script):
+        assert rate_limiter.acquire('https://newsapi.org/v2/everything') == 0
+
+
+def test__get_script():
+    with patch(
+        'utils.misc.rate_limiter.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.rate_limiter._script', None
+    ):
+        script = rate_limiter._get_script()
+        assert rate_limiter._get_script() is script
+        redis_connection_mock.register_script.assert_called_once_with(
+            rate_limiter.TOKEN_BUCKET_SCRIPT
+        )
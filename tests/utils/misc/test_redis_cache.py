@@ -1,3 +1,4 @@
+import time
 from datetime import date, datetime, timedelta
 from unittest.mock import MagicMock, call, patch
 
@@ -7,6 +8,7 @@ with patch('database.init_db.init_db'), patch(
     'database.init_db.create_tables'
 ):
     import utils.misc.redis_cache as cache
+    from utils.misc import cache_codec
 
 
 def test_exists():
@@ -24,19 +26,17 @@ def test_all_exist():
     ) as redis_connection_mock:
         prefixes = ['1', '2', '3']
         query, date_from, date_to = 'text', date(2020, 1, 1), date(2020, 2, 27)
-        cache.all_exist(prefixes, query, date_from, date_to)
         tail = f'{query}:2020-01-01T00:00:00:2020-02-27T23:59:59'
-        redis_connection_mock.exists.assert_has_calls(
-            (
-                call(f'1:{tail}'),
-                call().__bool__(),
-                call(f'2:{tail}'),
-                call().__bool__(),
-                call(f'3:{tail}'),
-                call().__bool__(),
-            )
+
+        redis_connection_mock.exists.return_value = 3
+        assert cache.all_exist(prefixes, query, date_from, date_to)
+        redis_connection_mock.exists.assert_called_once_with(
+            f'1:{tail}', f'2:{tail}', f'3:{tail}'
         )
 
+        redis_connection_mock.exists.return_value = 2
+        assert not cache.all_exist(prefixes, query, date_from, date_to)
+
 
 def test_key():
     assert (
@@ -58,7 +58,7 @@ def test_key():
             'Ecology',
             date(2023, 4, 3),
             date(2023, 4, 9),
-            'prefix1:Ecology:2023-04-03T00:00:00:2023-04-09T23:59:59',
+            'prefix1:ecology:2023-04-03T00:00:00:2023-04-09T23:59:59',
         ),
         (
             'prefix2',
@@ -82,6 +82,27 @@ def test_key_query(
     assert cache.key_query(prefix, search_query, date_from, date_to) == result
 
 
+def test_key_query_normalized():
+    date_from, date_to = date(2023, 4, 3), date(2023, 4, 9)
+    key = cache.key_query('summary', 'bitcoin price', date_from, date_to)
+    for search_query in ('Bitcoin  price ', 'BITCOIN\tprice', 'ｂｉｔｃｏｉｎ price'):
+        assert (
+            cache.key_query('summary', search_query, date_from, date_to) == key
+        )
+
+    long_query = 'word ' * 30
+    key = cache.key_query('summary', long_query, date_from, date_to)
+    hashed_query = key.split(':')[1]
+    assert hashed_query.startswith('hash_')
+    assert len(hashed_query) == len('hash_') + 32
+    assert key == cache.key_query(
+        'summary', long_query.upper(), date_from, date_to
+    )
+    assert key != cache.key_query(
+        'summary', long_query + 'word', date_from, date_to
+    )
+
+
 def test_get():
     with patch(
         'utils.misc.redis_cache.redis_connection'
@@ -99,6 +120,14 @@ def test__cast_type():
     assert cache._cast_type('abc') == 'abc'
 
 
+def test__decode():
+    assert cache._decode(None) is None
+    assert cache._decode('2024') == 2024
+    assert cache._decode(cache_codec.encode('2024')) == '2024'
+    assert cache._decode(cache_codec.encode('NaN')) == 'NaN'
+    assert cache._decode(cache_codec.encode({'a': 1})) == {'a': 1}
+
+
 def test_get_ttl():
     with patch(
         'utils.misc.redis_cache.redis_connection'
@@ -140,30 +169,406 @@ def test_set(
     ) as redis_connection_mock:
         key = cache.key(prefix, search_query, date_from, date_to)
         cache.set(key, text, ex=ttl)
-        redis_connection_mock.set.assert_called_once_with(key, text, ex=ttl)
+        redis_connection_mock.set.assert_called_once_with(
+            key, cache_codec.encode(text), ex=ttl
+        )
 
 
-def test_get_set():
+def test_prefetch():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = [
+            ['5', None],
+            ['0.1', '100.5'],
+            1000,
+            [None, None],
+            -2,
+        ]
+        entries = cache.prefetch('a', 'b')
+        pipeline.mget.assert_called_once_with(['a', 'b'])
+        pipeline.hmget.assert_has_calls(
+            [
+                call('meta:a', 'delta', 'expiry'),
+                call('meta:b', 'delta', 'expiry'),
+            ]
+        )
+        pipeline.ttl.assert_has_calls([call('a'), call('b')])
+        pipeline.execute.assert_called_once()
+
+    assert entries == [
+        cache.CacheEntry('a', '5', '0.1', '100.5', 1000),
+        cache.CacheEntry('b', None, None, None, -2),
+    ]
+
+
+@patch('utils.misc.redis_cache.get_set_entry')
+@patch('utils.misc.redis_cache.prefetch')
+def test_get_set(prefetch_mock, get_set_entry_mock):
+    func = MagicMock()
+    entry = cache.CacheEntry('a:b', '5', None, None, 1000)
+    prefetch_mock.return_value = [entry]
+    get_set_entry_mock.return_value = 5
+
+    assert cache.get_set('a:b', 1000, func, 'text', a=1) == 5
+    prefetch_mock.assert_called_once_with('a:b')
+    get_set_entry_mock.assert_called_once_with(entry, 1000, func, 'text', a=1)
+
+
+def test_get_set_entry():
     func = MagicMock(return_value=3)
-    with patch('utils.misc.redis_cache.get') as get_mock, patch(
-        'utils.misc.redis_cache.set'
-    ) as set_mock, patch(
-        'utils.misc.redis_cache.redis_connection.exists'
-    ) as exists_mock:
-        key, ttl = 'a:b:c:d', 1000
-        cache.get_set(key, ttl, func, 'text')
-        exists_mock.assert_called_once_with(key)
-        get_mock.assert_called_once_with(key)
-
-    with patch('utils.misc.redis_cache.get') as get_mock, patch(
-        'utils.misc.redis_cache.set'
-    ) as set_mock, patch(
-        'utils.misc.redis_cache.redis_connection.exists', return_value=False
-    ) as exists_mock:
-        key, ttl = 'a:b:c:d', 1000
-        cache.get_set(key, ttl, func, 'text')
-        exists_mock.assert_called_once_with(key)
-        set_mock.assert_called_once_with(key, 3, ex=ttl)
+    key, ttl = 'a:b:c:d', 1000
+    with patch('utils.misc.redis_cache.set_fresh') as set_fresh_mock, patch(
+        'utils.misc.redis_cache.refresh_in_background'
+    ) as refresh_in_background_mock:
+        entry = cache.CacheEntry(key, '5', '0.1', None, 1000)
+        assert cache.get_set_entry(entry, ttl, func, 'text') == 5
+        func.assert_not_called()
+        set_fresh_mock.assert_not_called()
+
+        entry = cache.CacheEntry(key, None, None, None, -2)
+        assert cache.get_set_entry(entry, ttl, func, 'text') == 3
+        func.assert_called_once_with('text')
+        assert set_fresh_mock.call_args[0][:3] == (key, 3, ttl)
+        refresh_in_background_mock.assert_not_called()
+
+
+@patch('utils.misc.redis_cache.set_fresh')
+@patch('utils.misc.redis_cache._is_early_recompute', return_value=True)
+def test_get_set_entry_early_recompute(
+    is_early_recompute_mock, set_fresh_mock
+):
+    func = MagicMock(return_value={'a': 1})
+    key, ttl = 'a:b:c:d', 1000
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        expiry = str(time.time() + 3)
+        entry = cache.CacheEntry(key, '{"a": 0}', '2.5', expiry, 50)
+        redis_connection_mock.set.return_value = True
+        assert cache.get_set_entry(entry, ttl, func) == {'a': 1}
+        delta, fresh_ttl = is_early_recompute_mock.call_args[0]
+        assert delta == '2.5' and 2 < fresh_ttl <= 3
+        redis_connection_mock.set.assert_called_once_with(
+            f'recompute_lock:{key}',
+            1,
+            nx=True,
+            ex=cache.RECOMPUTE_LOCK_TTL,
+        )
+        assert set_fresh_mock.call_args[0][:3] == (key, {'a': 1}, ttl)
+        redis_connection_mock.delete.assert_called_once_with(
+            f'recompute_lock:{key}'
+        )
+
+    func.reset_mock()
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        entry = cache.CacheEntry(key, '{"a": 0}', '2.5', None, 3)
+        redis_connection_mock.set.return_value = None
+        assert cache.get_set_entry(entry, ttl, func) == {'a': 0}
+        func.assert_not_called()
+
+
+@pytest.mark.parametrize('result', [None, [], ''])
+@patch('utils.misc.redis_cache.set_fresh')
+def test_get_set_entry_empty_result(set_fresh_mock, result):
+    func = MagicMock(return_value=result)
+    key, ttl = 'a:b:c:d', 1000
+
+    entry = cache.CacheEntry(key, None, None, None, -2)
+    assert cache.get_set_entry(entry, ttl, func) == result
+    set_fresh_mock.assert_not_called()
+
+    # a failed early recomputation keeps the cached value
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.redis_cache._is_early_recompute', return_value=True
+    ):
+        redis_connection_mock.set.return_value = True
+        entry = cache.CacheEntry(key, '[1]', '2.5', str(time.time() + 3), 50)
+        assert cache.get_set_entry(entry, ttl, func) == [1]
+    set_fresh_mock.assert_not_called()
+
+
+@patch('utils.misc.redis_cache.refresh_in_background')
+def test_get_set_entry_stale(refresh_in_background_mock):
+    func = MagicMock(return_value='new')
+    key, ttl = 'a:b:c:d', 1000
+    expiry = str(time.time() - 1)
+    entry = cache.CacheEntry(key, 'old', '2.5', expiry, 3000)
+
+    assert cache.get_set_entry(entry, ttl, func, 'text', a=1) == 'old'
+
+    func.assert_not_called()
+    args = refresh_in_background_mock.call_args[0]
+    assert args[:4] == (key, cache._compute_set, key, ttl)
+    assert args[4]() == 'new'
+    func.assert_called_once_with('text', a=1)
+
+    refresh = MagicMock(return_value='refreshed')
+    refresh_in_background_mock.reset_mock()
+    assert cache.get_set_entry(entry, ttl, func, 'text', refresh=refresh) == (
+        'old'
+    )
+    refresh_in_background_mock.assert_called_once_with(
+        key, cache._compute_set, key, ttl, refresh
+    )
+
+
+def test_set_fresh():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.redis_cache.time.time', return_value=100
+    ):
+        pipeline = redis_connection_mock.pipeline.return_value
+        cache.set_fresh('a:b', {'a': 1}, 1000, 0.5)
+        hard_ttl = 1000 + cache.STALE_TTL
+        pipeline.set.assert_called_once_with(
+            'a:b', cache_codec.encode({'a': 1}), ex=hard_ttl
+        )
+        pipeline.hset.assert_called_once_with(
+            'meta:a:b', mapping={'delta': 0.5, 'expiry': 1100}
+        )
+        pipeline.expire.assert_called_once_with('meta:a:b', hard_ttl)
+        pipeline.execute.assert_called_once()
+
+
+def test_set_fresh_many():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.redis_cache.time.time', return_value=100
+    ):
+        pipeline = redis_connection_mock.pipeline.return_value
+        cache.set_fresh_many({'a': 1, 'b': [1, 2]}, 1000)
+        hard_ttl = 1000 + cache.STALE_TTL
+        pipeline.set.assert_has_calls(
+            [
+                call('a', cache_codec.encode(1), ex=hard_ttl),
+                call('b', cache_codec.encode([1, 2]), ex=hard_ttl),
+            ]
+        )
+        pipeline.hset.assert_has_calls(
+            [
+                call('meta:a', mapping={'delta': 0, 'expiry': 1100}),
+                call('meta:b', mapping={'delta': 0, 'expiry': 1100}),
+            ]
+        )
+        pipeline.execute.assert_called_once()
+
+
+def test_extend_fresh():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.redis_cache.time.time', return_value=100
+    ):
+        pipeline = redis_connection_mock.pipeline.return_value
+        cache.extend_fresh('a', 'b', ttl=1000)
+        hard_ttl = 1000 + cache.STALE_TTL
+        pipeline.expire.assert_has_calls(
+            [
+                call('a', hard_ttl),
+                call('meta:a', hard_ttl),
+                call('b', hard_ttl),
+                call('meta:b', hard_ttl),
+            ]
+        )
+        pipeline.hset.assert_has_calls(
+            [call('meta:a', 'expiry', 1100), call('meta:b', 'expiry', 1100)]
+        )
+        pipeline.set.assert_not_called()
+        pipeline.execute.assert_called_once()
+
+
+def test_get_fresh_many():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = [
+            ['5', '{"a": 1}', None],
+            str(time.time() + 100),
+            '0',
+            None,
+        ]
+        values, stale = cache.get_fresh_many(['a', 'b', 'c'])
+        pipeline.mget.assert_called_once_with(['a', 'b', 'c'])
+        pipeline.hget.assert_has_calls(
+            [
+                call('meta:a', 'expiry'),
+                call('meta:b', 'expiry'),
+                call('meta:c', 'expiry'),
+            ]
+        )
+        pipeline.execute.assert_called_once()
+
+    assert values == [5, {'a': 1}, None]
+    assert stale == [False, True, False]
+
+
+def test_get_many():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        redis_connection_mock.mget.return_value = ['1', None, '[1]']
+        assert cache.get_many(['a', 'b', 'c']) == [1, None, [1]]
+        redis_connection_mock.mget.assert_called_once_with(['a', 'b', 'c'])
+
+        redis_connection_mock.mget.reset_mock()
+        assert cache.get_many([]) == []
+        redis_connection_mock.mget.assert_not_called()
+
+
+def test_get_with_ttl():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = ['{"a": 1}', 100]
+        assert cache.get_with_ttl('a:b') == ({'a': 1}, 100)
+        pipeline.get.assert_called_once_with('a:b')
+        pipeline.ttl.assert_called_once_with('a:b')
+
+
+def test_set_many():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        cache.set_many({'a': {'b': 1}, 'c': 'd'}, ex=100)
+        pipeline.set.assert_has_calls(
+            [
+                call('a', cache_codec.encode({'b': 1}), ex=100, nx=False),
+                call('c', cache_codec.encode('d'), ex=100, nx=False),
+            ]
+        )
+        pipeline.execute.assert_called_once()
+
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        cache.set_many({'a': 1, 'c': 2}, ex={'a': 10, 'c': 20}, nx=True)
+        pipeline.set.assert_has_calls(
+            [
+                call('a', cache_codec.encode(1), ex=10, nx=True),
+                call('c', cache_codec.encode(2), ex=20, nx=True),
+            ]
+        )
+        pipeline.expire.assert_not_called()
+
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        script = redis_connection_mock.register_script.return_value
+        with patch('utils.misc.redis_cache._extend_ttl_script', None):
+            cache.set_many({'a': 1, 'c': 2}, ex=10, nx=True, extend_ttl=True)
+        redis_connection_mock.register_script.assert_called_once_with(
+            cache.EXTEND_TTL_SCRIPT
+        )
+        script.assert_has_calls(
+            [
+                call(keys=['a'], args=[10], client=pipeline),
+                call(keys=['c'], args=[10], client=pipeline),
+            ]
+        )
+        pipeline.expire.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    'expiry_delta, expected_result', [(None, False), (-1, True), (10, False)]
+)
+def test_is_stale(expiry_delta, expected_result):
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        if expiry_delta is None:
+            redis_connection_mock.hget.return_value = None
+        else:
+            expiry = str(time.time() + expiry_delta)
+            redis_connection_mock.hget.return_value = expiry
+        assert cache.is_stale('a:b') == expected_result
+        redis_connection_mock.hget.assert_called_once_with(
+            'meta:a:b', 'expiry'
+        )
+
+
+def test_mark_stale():
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = [1, 0]
+        cache.mark_stale('a', 'b')
+        pipeline.exists.assert_has_calls([call('meta:a'), call('meta:b')])
+        pipeline.hset.assert_called_once_with('meta:a', 'expiry', 0)
+
+
+def test_refresh_in_background():
+    func = MagicMock()
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        redis_connection_mock.set.return_value = True
+        future = cache.refresh_in_background('a:b', func, 1, b=2)
+        future.result(timeout=5)
+        func.assert_called_once_with(1, b=2)
+        redis_connection_mock.delete.assert_called_once_with(
+            'recompute_lock:a:b'
+        )
+
+    func.reset_mock()
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        redis_connection_mock.set.return_value = None
+        assert cache.refresh_in_background('a:b', func) is None
+        func.assert_not_called()
+
+
+def test_refresh_in_background_error():
+    func = MagicMock(side_effect=ValueError('failed'))
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        redis_connection_mock.set.return_value = True
+        future = cache.refresh_in_background('a:b', func)
+        future.result(timeout=5)
+        func.assert_called_once()
+        redis_connection_mock.delete.assert_called_once_with(
+            'recompute_lock:a:b'
+        )
+
+
+def test__get_fresh_ttl():
+    assert cache._get_fresh_ttl(None, 100) == 100
+    assert cache._get_fresh_ttl(None, -1) == 1
+    assert cache._get_fresh_ttl(None, None) == 1
+    assert 9 < cache._get_fresh_ttl(str(time.time() + 10), 3000) <= 10
+    assert cache._get_fresh_ttl('0', 3000) < 0
+
+
+def test__is_early_recompute():
+    assert not cache._is_early_recompute(None, 100)
+    assert not cache._is_early_recompute('1', -2)
+    assert not cache._is_early_recompute('0', 100)
+
+    with patch('utils.misc.redis_cache.random.random', return_value=0.5):
+        # 2 * 1 * ln(2) = 1.386
+        assert cache._is_early_recompute('2', 1)
+        assert not cache._is_early_recompute('2', 2)
+        assert cache._is_early_recompute('2', 2, beta=2)
+
+    n_recomputes = sum(cache._is_early_recompute(1, 3600) for _ in range(1000))
+    assert n_recomputes == 0
+    n_recomputes = sum(cache._is_early_recompute(10, 5) for _ in range(1000))
+    assert 500 < n_recomputes < 700
 
 
 def test__get_str_for_log():
@@ -185,3 +590,149 @@ def test_calc_ttl():
     datetime_to = datetime.utcnow()
     datetime_to -= timedelta(hours=2)
     assert cache.calc_ttl(datetime_to) == FRESH_RECORD_TTL
+
+
+@pytest.fixture
+def local_cache():
+    local_cache = cache.LocalCache(10000, 10)
+    with patch(
+        'utils.misc.redis_cache._get_local_cache', return_value=local_cache
+    ), patch('utils.misc.redis_cache._local_cache', local_cache):
+        yield local_cache
+
+
+def test_get_with_ttl_local(local_cache):
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = [cache_codec.encode({'a': 1}), 100]
+        key = 'top_news_item:1'
+        assert cache.get_with_ttl(key) == ({'a': 1}, 100)
+        value, ttl = cache.get_with_ttl(key)
+        assert value == {'a': 1} and 99 <= ttl <= 100
+        pipeline.execute.assert_called_once()
+
+        assert cache.get_with_ttl('important_news:a') == ({'a': 1}, 100)
+        assert cache.get_with_ttl('important_news:a') == ({'a': 1}, 100)
+        assert pipeline.execute.call_count == 3
+
+        pipeline.execute.return_value = [None, -2]
+        assert cache.get_with_ttl('top_news_item:2') == (None, -2)
+        assert local_cache.get('top_news_item:2') is None
+
+
+def test_prefetch_local(local_cache):
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        pipeline.execute.return_value = [
+            ['5', '6'],
+            ['0.1', '100.5'],
+            1000,
+            [None, None],
+            2000,
+        ]
+        entries = cache.prefetch('summary:a', 'summary_input:a')
+        assert entries[0] == cache.CacheEntry(
+            'summary:a', '5', '0.1', '100.5', 1000
+        )
+
+        pipeline.execute.return_value = [['6'], [None, None], 2000]
+        entries = cache.prefetch('summary:a', 'summary_input:a')
+        pipeline.mget.assert_called_with(['summary_input:a'])
+        assert entries[0].value == '5' and entries[0].expiry == '100.5'
+        assert 999 <= entries[0].ttl <= 1000
+        assert entries[1] == cache.CacheEntry(
+            'summary_input:a', '6', None, None, 2000
+        )
+
+
+def test_set_invalidates_local(local_cache):
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock:
+        pipeline = redis_connection_mock.pipeline.return_value
+        for key in ('summary:a', 'top_news:a', 'top_news_item:1'):
+            local_cache.put(key, 'value', 5, 100, local_cache.epoch)
+
+        cache.set('summary:a', 'text', ex=100)
+        assert local_cache.get('summary:a') is None
+        redis_connection_mock.publish.assert_called_once_with(
+            cache.LOCAL_CACHE_CHANNEL, '["summary:a"]'
+        )
+
+        cache.set_many({'top_news_item:1': 1, 'news_count:a': 2}, ex=100)
+        assert local_cache.get('top_news_item:1') is None
+        pipeline.publish.assert_called_once_with(
+            cache.LOCAL_CACHE_CHANNEL, '["top_news_item:1"]'
+        )
+
+        pipeline.execute.return_value = [1]
+        cache.mark_stale('top_news:a')
+        assert local_cache.get('top_news:a') is None
+
+        pipeline.reset_mock()
+        cache.set_fresh_many({'news_count:a': 2}, 100)
+        pipeline.publish.assert_not_called()
+
+
+def test__listen_invalidations():
+    local_cache = cache.LocalCache(10000, 10)
+    local_cache.put('summary:a', 'value', 5, 100, local_cache.epoch)
+    local_cache.put('summary:b', 'value', 5, 100, local_cache.epoch)
+    ready = cache.Event()
+
+    def listen():
+        yield {'type': 'subscribe', 'data': 1}
+        assert ready.is_set()
+        assert len(local_cache) == 0
+        local_cache.put('summary:a', 'value', 5, 100, local_cache.epoch)
+        local_cache.put('summary:b', 'value', 5, 100, local_cache.epoch)
+        yield {'type': 'message', 'data': '["summary:a"]'}
+        assert local_cache.get('summary:a') is None
+        assert local_cache.get('summary:b') is not None
+        raise cache.redis.ConnectionError('connection lost')
+
+    with patch(
+        'utils.misc.redis_cache.redis_connection'
+    ) as redis_connection_mock, patch(
+        'utils.misc.redis_cache._local_cache', local_cache
+    ), patch(
+        'utils.misc.redis_cache._local_cache_ready', ready
+    ), patch(
+        'utils.misc.redis_cache.time.sleep', side_effect=StopIteration
+    ):
+        pubsub = redis_connection_mock.pubsub.return_value
+        pubsub.listen.side_effect = listen
+        with pytest.raises(StopIteration):
+            cache._listen_invalidations()
+
+        pubsub.subscribe.assert_called_once_with(cache.LOCAL_CACHE_CHANNEL)
+        pubsub.close.assert_called_once()
+    assert not ready.is_set()
+    assert len(local_cache) == 0
+
+
+def test__get_local_cache():
+    assert cache._get_local_cache() is None
+
+    local_cache = cache.LocalCache(10000, 10)
+    ready = cache.Event()
+    with patch('utils.misc.redis_cache._local_cache', local_cache), patch(
+        'utils.misc.redis_cache._local_cache_ready', ready
+    ), patch('utils.misc.redis_cache.Thread') as thread_mock, patch(
+        'utils.misc.redis_cache._local_cache_listener', None
+    ):
+        assert cache._get_local_cache() is None
+        ready.set()
+        assert cache._get_local_cache() is local_cache
+        thread_mock.return_value.start.assert_called_once()
+
+
+def test__is_local():
+    assert cache._is_local('summary:a:b')
+    assert cache._is_local('top_news_item:1')
+    assert not cache._is_local('summary_input:a')
+    assert not cache._is_local('important_news:a')
@@ -0,0 +1,82 @@
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc.session_pool import AsyncSessionPool
+
+
+def test_AsyncSessionPool():
+    with pytest.raises(ValueError):
+        AsyncSessionPool(0)
+
+    pool = AsyncSessionPool(3)
+    assert pool.pool_size == 3
+
+    async def get_sessions():
+        session1 = await pool.get('https://newsapi.org/v2/everything')
+        session2 = await pool.get('https://NEWSAPI.org/v2/top-headlines')
+        session3 = await pool.get('https://text-analysis12.p.rapidapi.com/')
+        assert session1 is session2
+        assert session1 is not session3
+        assert session1.connector.limit_per_host == 3
+        await pool.close()
+        assert session1.closed
+        return session1
+
+    session = asyncio.run(get_sessions())
+
+    async def get_session():
+        new_session = await pool.get('https://newsapi.org/v2/everything')
+        await pool.close()
+        return new_session
+
+    assert asyncio.run(get_session()) is not session
+
+
+def test_AsyncSessionPool_loop_change():
+    pool = AsyncSessionPool(3)
+    url = 'https://newsapi.org/v2/everything'
+
+    async def get_session():
+        return await pool.get(url)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        session = asyncio.run(get_session())
+        assert not session.closed
+
+        new_session = asyncio.run(get_session())
+        assert session.closed
+        assert new_session is not session
+        assert not new_session.closed
+        asyncio.run(pool.close())
+        assert new_session.closed
+
+
+def test_AsyncSessionPool_loop_change_running_loop():
+    pool = AsyncSessionPool(3)
+    url = 'https://newsapi.org/v2/everything'
+    loop = asyncio.new_event_loop()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        executor.submit(loop.run_forever)
+        session = asyncio.run_coroutine_threadsafe(
+            pool.get(url), loop
+        ).result()
+
+        async def get_session():
+            return await pool.get(url)
+
+        # sessions of the loop running in another thread are closed there
+        new_session = asyncio.run(get_session())
+        assert session.closed
+        assert new_session is not session
+
+        loop.call_soon_threadsafe(loop.stop)
+    loop.close()
+    asyncio.run(pool.close())
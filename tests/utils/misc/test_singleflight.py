@@ -0,0 +1,202 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import sleep
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+import requests
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.misc import singleflight
+
+
+@patch(
+    'utils.misc.singleflight._do_shared',
+    side_effect=lambda key, func, *args: func(*args),
+)
+def test_do(do_shared_mock):
+    n_calls = 0
+    lock = Lock()
+
+    def func(value):
+        nonlocal n_calls
+        with lock:
+            n_calls += 1
+        sleep(0.3)
+        return value * 2
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(
+            executor.map(lambda _: singleflight.do('key', func, 21), range(8))
+        )
+
+    assert results == [42] * 8
+    assert n_calls == 1
+    assert singleflight._calls == {}
+
+    assert singleflight.do('key', func, 1) == 2
+    assert n_calls == 2
+
+
+@patch(
+    'utils.misc.singleflight._do_shared',
+    side_effect=lambda key, func, *args: func(*args),
+)
+def test_do_exception(do_shared_mock):
+    def func():
+        sleep(0.2)
+        raise ValueError('failed')
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(singleflight.do, 'key', func) for _ in range(4)
+        ]
+
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result()
+    assert singleflight._calls == {}
+
+
+@patch(
+    'utils.misc.singleflight._do_shared',
+    side_effect=lambda key, func, *args: func(*args),
+)
+def test_do_wait_timeout(do_shared_mock):
+    def func(delay):
+        sleep(delay)
+        return delay
+
+    with patch('utils.misc.singleflight.WAIT_TIMEOUT', 0.1):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(singleflight.do, 'key', func, 0.5)
+            sleep(0.05)
+            follower = executor.submit(singleflight.do, 'key', func, 0)
+            # the follower stops waiting and computes the result itself
+            assert follower.result(timeout=0.3) == 0
+            assert leader.result() == 0.5
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__do_shared_leader(redis_connection_mock):
+    lock = redis_connection_mock.lock.return_value
+    lock.acquire.return_value = True
+    pipeline = redis_connection_mock.pipeline.return_value
+    func = MagicMock(return_value={'a': 1})
+
+    assert singleflight._do_shared('key', func, 'arg') == {'a': 1}
+
+    func.assert_called_once_with('arg')
+    payload = json.dumps({'result': {'a': 1}})
+    pipeline.set.assert_called_once_with(
+        'singleflight_result:key', payload, ex=singleflight.RESULT_TTL
+    )
+    pipeline.publish.assert_called_once_with('singleflight:key', payload)
+    lock.release.assert_called_once()
+    redis_connection_mock.delete.assert_called_once_with(
+        'singleflight_result:key'
+    )
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__do_shared_leader_error(redis_connection_mock):
+    lock = redis_connection_mock.lock.return_value
+    lock.acquire.return_value = True
+    pipeline = redis_connection_mock.pipeline.return_value
+    func = MagicMock(side_effect=ValueError('failed'))
+
+    with pytest.raises(ValueError):
+        singleflight._do_shared('key', func)
+
+    payload = json.dumps({'error': 'failed', 'error_type': 'ValueError'})
+    pipeline.publish.assert_called_once_with('singleflight:key', payload)
+    lock.release.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    'wait_result, func_calls, expected_result',
+    [((True, [1, 2]), 0, [1, 2]), ((False, None), 1, 'computed')],
+)
+@patch('utils.misc.singleflight._wait')
+@patch('utils.misc.singleflight.redis_connection')
+def test__do_shared_follower(
+    redis_connection_mock,
+    wait_mock,
+    wait_result,
+    func_calls,
+    expected_result,
+):
+    redis_connection_mock.lock.return_value.acquire.return_value = False
+    wait_mock.return_value = wait_result
+    func = MagicMock(return_value='computed')
+
+    assert singleflight._do_shared('key', func) == expected_result
+    wait_mock.assert_called_once_with('key')
+    assert func.call_count == func_calls
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__do_shared_no_redis(redis_connection_mock):
+    lock = redis_connection_mock.lock.return_value
+    lock.acquire.side_effect = redis.ConnectionError()
+    func = MagicMock(return_value='computed')
+
+    assert singleflight._do_shared('key', func) == 'computed'
+    func.assert_called_once()
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__wait_message(redis_connection_mock):
+    redis_connection_mock.get.return_value = None
+    pubsub = redis_connection_mock.pubsub.return_value
+    pubsub.get_message.side_effect = [
+        None,
+        {'type': 'message', 'data': json.dumps({'result': [3, {'a': 1}]})},
+    ]
+
+    assert singleflight._wait('key') == (True, [3, {'a': 1}])
+    pubsub.subscribe.assert_called_once_with('singleflight:key')
+    pubsub.close.assert_called_once()
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__wait_stored_result(redis_connection_mock):
+    redis_connection_mock.get.return_value = json.dumps({'result': 5})
+
+    assert singleflight._wait('key') == (True, 5)
+    redis_connection_mock.get.assert_called_with('singleflight_result:key')
+
+
+@pytest.mark.parametrize(
+    'error_type, expected_class',
+    [
+        ('ValueError', ValueError),
+        ('ConnectTimeout', requests.ConnectTimeout),
+        # needs more arguments than a message
+        ('JSONDecodeError', requests.RequestException),
+        ('UnknownError', requests.RequestException),
+        (None, requests.RequestException),
+    ],
+)
+@patch('utils.misc.singleflight.redis_connection')
+def test__wait_error(redis_connection_mock, error_type, expected_class):
+    redis_connection_mock.get.return_value = json.dumps(
+        {'error': 'failed', 'error_type': error_type}
+    )
+
+    with pytest.raises(expected_class, match='failed') as exc_info:
+        singleflight._wait('key')
+    assert type(exc_info.value) is expected_class
+
+
+@patch('utils.misc.singleflight.redis_connection')
+def test__wait_leader_gone(redis_connection_mock):
+    redis_connection_mock.get.return_value = None
+    redis_connection_mock.exists.return_value = False
+    redis_connection_mock.pubsub.return_value.get_message.return_value = None
+
+    assert singleflight._wait('key') == (False, None)
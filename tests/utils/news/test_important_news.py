@@ -28,3 +28,74 @@ def test_get_important_news() -> None:
     assert actual['6049394458971597468'] == 30
     assert actual['5641607859976004885'] == 11
     assert actual['2046649311940024345'] == 3
+
+
+def _news_item(id, title='', source=None, published_at=None) -> dict:
+    return {
+        'id': id,
+        'title': title,
+        'description': '',
+        'content': '',
+        'source': source,
+        'publishedAt': published_at,
+    }
+
+
+def test_get_important_news_empty() -> None:
+    assert get_important_news('query', [], 'title') == []
+    assert get_important_news('query', [_news_item('a')], []) == []
+
+
+def test_get_important_news_relevance() -> None:
+    news = [
+        _news_item('a', 'Markets fall'),
+        _news_item('b', 'New climate policy'),
+        _news_item('c', 'Climate change: climate summit'),
+        _news_item('d', 'Sports'),
+    ]
+    important_news = get_important_news(
+        'Climate', news, ['title', 'description', 'content']
+    )
+
+    assert list(important_news) == ['c', 'b', 'a', 'd']
+    assert [item['importance'] for item in important_news.values()] == [
+        4,
+        3,
+        2,
+        1,
+    ]
+    assert important_news['c']['news'] is news[2]
+
+
+def test_get_important_news_relevance_whole_words() -> None:
+    news = [
+        _news_item('a', 'Art exhibition in the city'),
+        _news_item('b', 'Artificial intelligence startups, smart artists'),
+        _news_item('c', 'Street art: art festival'),
+    ]
+    important_news = get_important_news('art', news, 'title')
+
+    # 'art' does not match 'artificial', 'smart' or 'artists'
+    assert list(important_news) == ['c', 'a', 'b']
+
+
+def test_get_important_news_recency() -> None:
+    news = [
+        _news_item('a', published_at='2023-04-01T10:00:00Z'),
+        _news_item('b', published_at='2023-04-08T10:00:00Z'),
+        _news_item('c', published_at='invalid'),
+    ]
+    important_news = get_important_news('', news, 'title')
+    assert list(important_news) == ['b', 'a', 'c']
+
+
+def test_get_important_news_source_diversity() -> None:
+    news = [
+        _news_item('a', 'climate', source='BBC News'),
+        _news_item('b', 'climate', source={'id': 'bbc', 'name': 'BBC News'}),
+        _news_item('c', 'climate', source='CNN'),
+        _news_item('d', 'climate'),
+        _news_item('e', 'climate'),
+    ]
+    important_news = get_important_news('climate', news, 'title')
+    assert list(important_news) == ['a', 'c', 'd', 'e', 'b']
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import numpy as np
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils.news.near_duplicates import (
+        NUM_PERM,
+        get_signatures,
+        get_unique_news,
+    )
+
+TEXT = (
+    'The Tacoma Fire Department, the Coast Guard, the Environmental '
+    'Protection Agency and the Washington Department of Ecology are '
+    'continuing their response to the fishing vessel fire in Tacoma.'
+)
+REWORDED_TEXT = (
+    'SEATTLE - The Tacoma Fire Department, the U.S. Coast Guard, the '
+    'Environmental Protection Agency and the Washington Department of '
+    'Ecology are continuing their response to the fishing vessel fire.'
+)
+OTHER_TEXT = (
+    'How long is the present? The answer, researchers suggest in a new '
+    'study, depends on your heart and can change with each heartbeat.'
+)
+
+
+def test_get_signatures():
+    signatures = get_signatures([TEXT, TEXT.upper(), REWORDED_TEXT, ''])
+    assert signatures.shape == (4, NUM_PERM)
+
+    def similarity(i, j):
+        return np.count_nonzero(signatures[i] == signatures[j]) / NUM_PERM
+
+    assert similarity(0, 1) == 1
+    assert similarity(0, 2) > 0.6
+    assert similarity(0, 3) < 0.1
+    assert get_signatures([]).shape == (0, NUM_PERM)
+
+
+def test_get_signatures_short_texts():
+    signatures = get_signatures(['', 'a', 'a b', 'a b', 'a b c', ''])
+    assert (signatures[1] != signatures[2]).any()
+    assert (signatures[2] == signatures[3]).all()
+    assert (signatures[0] == signatures[5]).all()
+
+
+def test_get_unique_news():
+    news = [
+        {'text': TEXT, 'title': 'a'},
+        {'text': OTHER_TEXT, 'title': 'b'},
+        {'text': REWORDED_TEXT, 'title': 'c'},
+        {'text': OTHER_TEXT + ' Really.', 'title': 'd'},
+        {'text': None, 'title': 'e'},
+    ]
+
+    assert get_unique_news(news, 'text') == [news[0], news[1], news[4]]
+    assert get_unique_news(news, ['text'], 2) == news[:2]
+    assert get_unique_news(iter(news), ('title', 'text')) == [
+        news[0],
+        news[1],
+        news[4],
+    ]
+    assert get_unique_news([], 'text') == []
+
+
+def test_get_unique_news_many():
+    words = [f'word{i}' for i in range(5000)]
+    rng = np.random.default_rng(0)
+    news = [{'text': ' '.join(rng.choice(words, 40))} for _ in range(1000)]
+    duplicates = [
+        {'text': 'Updated: ' + news_item['text']} for news_item in news[:100]
+    ]
+
+    assert get_unique_news(news + duplicates, 'text') == news
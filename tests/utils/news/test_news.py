@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime, timedelta
 from unittest.mock import patch
 
 import pytest
@@ -44,6 +44,10 @@ with patch('database.init_db.init_db'), patch(
         (True, True, 0, '', {}),
     ],
 )
+@patch(
+    'utils.news.news.singleflight.do',
+    side_effect=lambda key, func, *args: func(*args),
+)
 @patch('utils.news.news.cache')
 @patch('utils.news.news.news_api')
 @patch('utils.news.news.get_important_news')
@@ -53,23 +57,22 @@ def test_get_news_semimanufactures(
     mock_get_important_news,
     mock_news_api,
     mock_cache,
+    mock_singleflight_do,
     all_cache_exist,
     cache_exists,
     news_count,
     summary_input,
     important_news,
 ):
-    mock_cache.all_exist.return_value = all_cache_exist
-    cache_get_values = {
-        'news_count': news_count,
-        'summary_input': summary_input,
-        'important_news': important_news,
-    }
-    mock_cache.get.side_effect = lambda key: cache_get_values[
-        key.split(':')[0]
-    ]
+    mock_cache.get_fresh_many.return_value = (
+        [
+            news_count if all_cache_exist else None,
+            important_news if all_cache_exist else None,
+            summary_input if cache_exists else None,
+        ],
+        [False, False, False],
+    )
     mock_cache.key_query.side_effect = lambda *args: args[0]
-    mock_cache.exists.return_value = cache_exists
     mock_get_summary_input.return_value = summary_input
     mock_get_important_news.return_value = important_news
     mock_news_api.get_news.return_value = (important_news, news_count)
@@ -89,27 +92,358 @@ def test_get_news_semimanufactures(
         return
 
     if not all_cache_exist:
+        mock_singleflight_do.assert_called_once()
+        assert mock_singleflight_do.call_args[0][0] == 'news'
         mock_news_api.get_news.assert_called_once_with(
             'Ecology', date(2020, 1, 1), date(2020, 1, 3)
         )
         mock_get_important_news.assert_called_once()
-        if cache_exists:
-            mock_get_summary_input.assert_not_called()
-            assert mock_cache.set.call_count == 2
-        else:
-            mock_get_summary_input.assert_called_once()
-            assert mock_cache.set.call_count == 3
+        mock_cache.set_fresh_many.assert_called_once()
+        mock_get_summary_input.assert_called_once()
+        mock_cache.set_fresh.assert_called_once()
     else:
+        mock_singleflight_do.assert_not_called()
         mock_news_api.get_news.assert_not_called()
         mock_get_important_news.assert_not_called()
         mock_get_summary_input.assert_not_called()
-        mock_cache.set.assert_not_called()
+        mock_cache.set_fresh_many.assert_not_called()
+        mock_cache.set_fresh.assert_not_called()
+
+    mock_cache.get_fresh_many.assert_called_once_with(
+        ['news_count', 'important_news', 'summary_input']
+    )
 
     assert actual_news_count == news_count
     assert actual_summary_input == summary_input
     assert actual_important_news == important_news
 
 
+@pytest.mark.parametrize('is_stale', [True, False])
+@patch('utils.news.news.cache')
+@patch('utils.news.news._refresh_news')
+def test_get_news_semimanufactures_stale(
+    mock_refresh_news, mock_cache, is_stale
+):
+    mock_cache.get_fresh_many.return_value = (
+        [5, {'a': {'importance': 1}}, 'summary input'],
+        [False, is_stale, False],
+    )
+    mock_cache.key_query.side_effect = lambda *args: args[0]
+
+    actual = news.get_news_semimanufactures(
+        'Ecology', date(2020, 1, 1), date(2020, 1, 3)
+    )
+
+    assert actual == (5, 'summary input', {'a': {'importance': 1}})
+    mock_refresh_news.assert_not_called()
+    if is_stale:
+        mock_cache.refresh_in_background.assert_called_once_with(
+            'important_news',
+            mock_refresh_news,
+            'Ecology',
+            date(2020, 1, 1),
+            date(2020, 1, 3),
+        )
+    else:
+        mock_cache.refresh_in_background.assert_not_called()
+
+
+@pytest.mark.parametrize('news_count', [0, 5])
+@patch('utils.news.news.cache')
+@patch('utils.news.news._update_news', return_value=None)
+@patch('utils.news.news._load_news')
+@patch('utils.news.news._calc_summary_input')
+def test__refresh_news(
+    mock_calc_summary_input,
+    mock_load_news,
+    mock_update_news,
+    mock_cache,
+    news_count,
+):
+    mock_load_news.return_value = (news_count, {'a': {'importance': 1}})
+    mock_cache.key_query.side_effect = lambda *args: args[0]
+
+    news._refresh_news('Ecology', date(2020, 1, 1), date(2020, 1, 3))
+
+    mock_load_news.assert_called_once_with(
+        'Ecology', date(2020, 1, 1), date(2020, 1, 3)
+    )
+    assert mock_calc_summary_input.call_count == (1 if news_count else 0)
+    mock_cache.mark_stale.assert_called_once_with('summary', 'top_news')
+
+
+@pytest.mark.parametrize('is_changed', [True, False])
+@patch('utils.news.news.cache')
+@patch('utils.news.news._update_news')
+@patch('utils.news.news._load_news')
+@patch('utils.news.news._cache_news')
+@patch('utils.news.news._calc_summary_input')
+def test__refresh_news_update(
+    mock_calc_summary_input,
+    mock_cache_news,
+    mock_load_news,
+    mock_update_news,
+    mock_cache,
+    is_changed,
+):
+    important_news = {'a': {'importance': 1}}
+    mock_update_news.return_value = (is_changed, 5, important_news)
+    mock_cache.key_query.side_effect = lambda *args: args[0]
+    mock_cache.calc_ttl.return_value = 100
+    args = ('Ecology', date(2020, 1, 1), date(2020, 1, 3))
+
+    news._refresh_news(*args)
+
+    mock_load_news.assert_not_called()
+    if is_changed:
+        mock_cache_news.assert_called_once_with(*args, 5, important_news)
+        mock_calc_summary_input.assert_called_once_with(*args, important_news)
+        mock_cache.mark_stale.assert_called_once_with('summary', 'top_news')
+        mock_cache.extend_fresh.assert_not_called()
+    else:
+        mock_cache_news.assert_not_called()
+        mock_calc_summary_input.assert_not_called()
+        mock_cache.mark_stale.assert_not_called()
+        mock_cache.extend_fresh.assert_called_once_with(
+            'news_count',
+            'important_news',
+            'summary_input',
+            'summary',
+            'top_news',
+            ttl=100,
+        )
+
+
+def _important_news(*news):
+    return {
+        news_item['id']: {'importance': len(news) - i, 'news': news_item}
+        for i, news_item in enumerate(news)
+    }
+
+
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__update_news(mock_news_api, mock_cache):
+    old_news = [
+        {'id': 'a', 'publishedAt': '2020-01-02T10:00:00Z'},
+        {'id': 'b', 'publishedAt': '2020-01-02T12:30:15Z'},
+    ]
+    new_news = [
+        {'id': 'c', 'publishedAt': '2020-01-03T10:00:00Z'},
+        {'id': 'b', 'publishedAt': '2020-01-02T12:30:15Z'},
+    ]
+    mock_cache.get_many.return_value = [10, _important_news(*old_news)]
+    mock_news_api.get_news.return_value = (new_news, 2)
+    date_from, date_to = date(2020, 1, 1), date(2020, 1, 3)
+
+    is_changed, n_news_total, important_news = news._update_news(
+        'Ecology', date_from, date_to
+    )
+
+    mock_news_api.get_news.assert_called_once_with(
+        'Ecology', datetime(2020, 1, 2, 12, 30, 15), date_to
+    )
+    assert is_changed
+    assert n_news_total == 11
+    # c is the newest news item
+    assert list(important_news) == ['c', 'a', 'b']
+    assert [item['importance'] for item in important_news.values()] == [
+        3,
+        2,
+        1,
+    ]
+
+    mock_news_api.get_news.return_value = ([new_news[1]], 1)
+    is_changed, n_news_total, important_news = news._update_news(
+        'Ecology', date_from, date_to
+    )
+    assert not is_changed
+    assert n_news_total == 10
+    assert list(important_news) == ['a', 'b']
+
+
+@pytest.mark.parametrize(
+    'cached',
+    [
+        [None, None],
+        [0, {}],
+        [5, _important_news({'id': 'a', 'publishedAt': None})],
+        [5, _important_news({'id': 'a', 'publishedAt': '2019-12-31T10:00'})],
+    ],
+)
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__update_news_no_cache(mock_news_api, mock_cache, cached):
+    mock_cache.get_many.return_value = cached
+    actual = news._update_news('Ecology', date(2020, 1, 1), date(2020, 1, 3))
+    assert actual is None
+    mock_news_api.get_news.assert_not_called()
+
+
+def test__merge_news():
+    actual = news._merge_news(
+        [{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}], [{'id': 5}, {'id': 6}]
+    )
+    assert [news_item['id'] for news_item in actual] == [1, 5, 2, 3, 6, 4]
+
+    actual = news._merge_news(
+        [{'id': 1}, {'id': 2}, {'id': 3}, {'id': 4}], [{'id': 5}, {'id': 6}], 4
+    )
+    assert [news_item['id'] for news_item in actual] == [1, 5, 2, 3]
+
+
+@pytest.mark.parametrize('day_shards', [True, False])
+@patch('utils.news.news._add_to_day_shards')
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__update_news_day_shards(
+    mock_news_api, mock_cache, mock_add_to_day_shards, day_shards
+):
+    old_news = [{'id': 'a', 'publishedAt': '2020-01-02T10:00:00Z'}]
+    new_news = [{'id': 'c', 'publishedAt': '2020-01-03T10:00:00Z'}]
+    mock_cache.get_many.return_value = [10, _important_news(*old_news)]
+    mock_news_api.get_news.return_value = (new_news, 1)
+
+    with patch('utils.news.news.config.NEWS_DAY_SHARDS', day_shards):
+        news._update_news('Ecology', date(2020, 1, 1), date(2020, 1, 3))
+
+    if day_shards:
+        mock_add_to_day_shards.assert_called_once_with('Ecology', new_news)
+    else:
+        mock_add_to_day_shards.assert_not_called()
+
+
+@patch('utils.news.news.cache')
+def test__add_to_day_shards(mock_cache):
+    mock_cache.key_query.side_effect = lambda prefix, query, day, _: day
+    mock_cache.calc_ttl.side_effect = lambda day: day.day
+    days = [date(2020, 1, i) for i in range(1, 4)]
+    mock_cache.get_many.return_value = [
+        {'news': [{'id': 'a'}], 'count': 10},
+        None,
+        {'news': [{'id': 'e'}], 'count': 1},
+    ]
+    new_news = [
+        {'id': 'b', 'publishedAt': '2020-01-01T10:00:00Z'},
+        {'id': 'c', 'publishedAt': '2020-01-02T10:00:00Z'},
+        {'id': 'd', 'publishedAt': None},
+        {'id': 'e', 'publishedAt': '2020-01-03T10:00:00Z'},
+    ]
+
+    news._add_to_day_shards('Ecology', new_news)
+
+    mock_cache.get_many.assert_called_once_with(days)
+    # days without cached news are not cached partially
+    mock_cache.set_many.assert_called_once_with(
+        {days[0]: {'news': [{'id': 'a'}, new_news[0]], 'count': 11}},
+        ex={days[0]: 1},
+    )
+
+
+@pytest.mark.parametrize('day_shards', [True, False])
+@patch('utils.news.news._get_news_by_days')
+@patch('utils.news.news.news_api')
+def test__get_news(mock_news_api, mock_get_news_by_days, day_shards):
+    mock_news_api.get_news.return_value = ([{'id': 1}], 1)
+    mock_get_news_by_days.return_value = ([{'id': 2}], 2)
+    with patch('utils.news.news.config.NEWS_DAY_SHARDS', day_shards):
+        actual = news._get_news('Ecology', date(2020, 1, 1), date(2020, 1, 3))
+
+    if day_shards:
+        assert actual == ([{'id': 2}], 2)
+        mock_news_api.get_news.assert_not_called()
+    else:
+        assert actual == ([{'id': 1}], 1)
+        mock_get_news_by_days.assert_not_called()
+
+
+@patch('utils.news.news.MAX_NEWS_COUNT', 8)
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__get_news_by_days(mock_news_api, mock_cache):
+    mock_cache.key_query.side_effect = lambda prefix, query, day, _: day
+    mock_cache.calc_ttl.side_effect = lambda day: day.day
+    mock_cache.get_many.return_value = [
+        # cached without max_news by a full load, only 2 news are used
+        {'news': [{'id': 1}, {'id': 11}, {'id': 12}], 'count': 10},
+        None,
+        {'news': [{'id': 3}, {'id': 4}], 'count': 30, 'max_news': 2},
+        # cached for a longer range, it has less news than needed
+        {'news': [{'id': 40}], 'count': 1, 'max_news': 1},
+    ]
+    mock_news_api.get_news_of_days.side_effect = lambda query, days, _: [
+        ([{'id': day.day}], day.day * 10) for day in days
+    ]
+    days = [date(2020, 1, i) for i in range(1, 5)]
+
+    actual = news._get_news_by_days('Ecology', days[0], days[-1])
+
+    assert actual == (
+        [{'id': 4}, {'id': 3}, {'id': 2}, {'id': 1}, {'id': 4}, {'id': 11}],
+        100,
+    )
+    mock_cache.get_many.assert_called_once_with(days)
+    # 8 news are split across 4 days, missing days are requested at once
+    mock_news_api.get_news_of_days.assert_called_once_with(
+        'Ecology', [days[1], days[3]], 2
+    )
+    mock_cache.set_many.assert_called_once_with(
+        {
+            days[1]: {'news': [{'id': 2}], 'count': 20, 'max_news': 2},
+            days[3]: {'news': [{'id': 4}], 'count': 40, 'max_news': 2},
+        },
+        ex={days[1]: 2, days[3]: 4},
+    )
+
+
+@patch('utils.news.news.MAX_NEWS_COUNT', 9)
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__get_news_by_days_order(mock_news_api, mock_cache):
+    mock_cache.key_query.side_effect = lambda prefix, query, day, _: day
+    mock_cache.get_many.return_value = [
+        {'news': [{'id': '1a'}, {'id': '1b'}, {'id': '1c'}], 'count': 3},
+        {'news': [{'id': '2a'}], 'count': 1},
+        {'news': [{'id': '3a'}, {'id': '3b'}], 'count': 2},
+    ]
+
+    actual, _ = news._get_news_by_days(
+        'Ecology', date(2020, 1, 1), date(2020, 1, 3)
+    )
+
+    # the first news of every day come first, the newest day leads
+    assert [news_item['id'] for news_item in actual] == [
+        '3a',
+        '2a',
+        '1a',
+        '3b',
+        '1b',
+        '1c',
+    ]
+    mock_news_api.get_news_of_days.assert_not_called()
+
+
+@patch('utils.news.news.cache')
+@patch('utils.news.news.news_api')
+def test__get_news_by_days_future(mock_news_api, mock_cache):
+    today = datetime.utcnow().date()
+    mock_cache.key_query.side_effect = lambda prefix, query, day, _: day
+    mock_cache.get_many.side_effect = lambda keys: [
+        {'news': [], 'count': 1} for _ in keys
+    ]
+
+    actual = news._get_news_by_days(
+        'Ecology', today - timedelta(days=1), today + timedelta(days=5)
+    )
+
+    assert actual == ([], 2)
+    mock_cache.get_many.assert_called_once_with(
+        [today - timedelta(days=1), today]
+    )
+    mock_news_api.get_news_of_days.assert_not_called()
+    mock_cache.set_many.assert_not_called()
+
+
 def test_important_news_to_iterator():
     important_news = {'a': {'news': 'a'}, 'b': {'news': 'b'}}
     actual = news.important_news_to_iterator(important_news)
@@ -1,14 +1,25 @@
+import html
 import os
+import random
+import re
 from datetime import date, datetime, timedelta
-from unittest.mock import patch
+import json
+from unittest.mock import AsyncMock, patch
+from urllib.parse import urlsplit
 
-from tests.test_utils import load_news_from_dir
+import pytest
+
+from tests.test_utils import fake_session, load_news_from_dir
 
 with patch('database.init_db.init_db'), patch(
     'database.init_db.create_tables'
 ):
     from utils.news import news_api
-    from utils.news.utils import date_from_to_str, date_to_to_str
+    from utils.news.utils import (
+        date_from_to_str,
+        date_to_to_str,
+        get_news_id,
+    )
 
 
 def mock_news_page(news, page_num, page_size):
@@ -34,15 +45,15 @@ def get_news_test_data(n_pages: int) -> tuple[list[dict], int]:
     return news, page_size
 
 
+@patch('utils.news.news_api.MAX_NEWS', 10)
 @patch('utils.news.news_api.PAGE_SIZE', 10)
-@patch('utils.news.news_api._get_news_page')
-def test_get_news(mock_get_news_page):
+@patch('utils.news.news_api._get_news_pages')
+def test_get_news(mock_get_news_pages):
     news, page_size = get_news_test_data(3)
-    mock_get_news_page.side_effect = (
-        lambda q, page_number, s, f, t: mock_news_page(
-            news, page_number, page_size
-        )
-    )
+    mock_get_news_pages.side_effect = lambda pages_args: [
+        mock_news_page(news, page_number, page_size)
+        for _, page_number, *_ in pages_args
+    ]
     actual, news_total = news_api.get_news(
         'Ecology', date(2020, 1, 1), date(2020, 1, 3)
     )
@@ -50,15 +61,44 @@ def test_get_news(mock_get_news_page):
     assert actual == news[:page_size]
 
 
-@patch('utils.news.news_api._get_news_page')
-def test_add_first_page_of_news(mock_get_news_page):
-    news_test_data, page_size = get_news_test_data(3)
-    mock_get_news_page.side_effect = (
-        lambda q, page_number, s, f, t: mock_news_page(
-            news_test_data, page_number, page_size
+@pytest.mark.parametrize(
+    'max_news, expected_page_size, expected_pages',
+    [(None, 100, [1]), (15, 15, [1]), (5, 10, [1]), (300, 100, [1, 2, 3])],
+)
+@patch('utils.news.news_api._get_random_page_numbers')
+@patch('utils.news.news_api._add_news', return_value=1000)
+def test_get_news_max_news(
+    mock_add_news,
+    mock_get_random_page_numbers,
+    max_news,
+    expected_page_size,
+    expected_pages,
+):
+    mock_get_random_page_numbers.side_effect = (
+        lambda start_chunk, n_pages_total, n_chunks: list(
+            range(start_chunk + 1, n_chunks + 1)
         )
     )
 
+    news_api.get_news('Ecology', date(2020, 1, 1), date(2020, 1, 3), max_news)
+
+    pages = [
+        page for args in mock_add_news.call_args_list for page in args[0][4]
+    ]
+    assert pages == expected_pages
+    assert {args[0][5] for args in mock_add_news.call_args_list} == {
+        expected_page_size
+    }
+
+
+@patch('utils.news.news_api._get_news_pages')
+def test_add_first_page_of_news(mock_get_news_pages):
+    news_test_data, page_size = get_news_test_data(3)
+    mock_get_news_pages.side_effect = lambda pages_args: [
+        mock_news_page(news_test_data, page_number, page_size)
+        for _, page_number, *_ in pages_args
+    ]
+
     news = []
     n_news_total, query_time = news_api.add_first_page_of_news(
         news, 'Ecology', date(2020, 1, 1), date(2020, 1, 3), 10
@@ -80,6 +120,9 @@ def test__get_queries_count():
     assert 0 == news_api._get_queries_count(0.1, 100, 1, -1)
     assert 1 == news_api._get_queries_count(1, 100, 1, 7)
     assert 0 == news_api._get_queries_count(10.2, 5, 1, 100)
+    assert 7 == news_api._get_queries_count(1, 100, 1, 7, 7)
+    assert 6 == news_api._get_queries_count(2, 100, 6, 7, 2)
+    assert 3 == news_api._get_queries_count(0.5, 3, 6, 7, 7)
 
 
 def test__get_random_page_numbers():
@@ -101,9 +144,9 @@ def test__get_random_page_numbers():
     )
 
 
-@patch('utils.news.news_api._get_news_page')
+@patch('utils.news.news_api._get_news_pages')
 @patch('utils.news.news_api.get_json_value')
-def test_add_news(mock_get_json_value, mock_get_news_page):
+def test_add_news(mock_get_json_value, mock_get_news_pages):
     news = []
     search_query = 'test'
     date_from = date(2023, 1, 1)
@@ -111,7 +154,9 @@ def test_add_news(mock_get_json_value, mock_get_news_page):
     page_numbers = [1, 2, 3]
     news_per_page = 10
     mock_page = {'articles': [{'id': 1}, {'id': 2}], 'totalResults': '2'}
-    mock_get_news_page.return_value = mock_page
+    mock_get_news_pages.side_effect = lambda pages_args: [mock_page] * len(
+        list(pages_args)
+    )
     mock_get_json_value.side_effect = lambda json_obj, keys: json_obj[keys[0]]
 
     result = news_api._add_news(
@@ -120,19 +165,85 @@ def test_add_news(mock_get_json_value, mock_get_news_page):
 
     assert len(news) == 6
     assert result == 6
-    mock_get_news_page.n_calls == 3
-    mock_get_news_page.assert_called_with(
-        search_query, page_numbers[-1], news_per_page, date_from, date_to
-    )
+    mock_get_news_pages.assert_called_once()
     mock_get_json_value.assert_called_with(mock_page, ['totalResults'])
 
 
+def _article(url: str) -> dict:
+    return {'title': 'title', 'description': '', 'content': '', 'url': url}
+
+
+@patch('utils.news.news_api.async_api_query_scheduler.execute_many')
+def test_add_news_concurrent(mock_execute_many):
+    mock_execute_many.side_effect = lambda queries: [
+        {
+            'status': 'ok',
+            'totalResults': 10,
+            'articles': [_article(f'https://test.com/{query.body["page"]}')],
+        }
+        for query in queries
+    ]
+
+    news = []
+    result = news_api._add_news(
+        news, 'test', date(2023, 1, 1), date(2023, 1, 7), [5, 3, 9, 7], 10
+    )
+
+    # all pages are requested at once and added in order of page numbers
+    mock_execute_many.assert_called_once()
+    queries = mock_execute_many.call_args.args[0]
+    assert [query.body['page'] for query in queries] == [5, 3, 9, 7]
+    assert [news_item['url'] for news_item in news] == [
+        'https://test.com/5',
+        'https://test.com/3',
+        'https://test.com/9',
+        'https://test.com/7',
+    ]
+    assert result == 40
+
+
+@patch('utils.news.news_api.async_api_query_scheduler.execute_many')
+def test_add_news_failed_page(mock_execute_many):
+    mock_execute_many.return_value = [
+        {'status': 'ok', 'totalResults': 10, 'articles': []},
+        None,
+    ]
+
+    with pytest.raises(ValueError, match='Unknown error'):
+        news_api._add_news(
+            [], 'test', date(2023, 1, 1), date(2023, 1, 7), [1, 2], 10
+        )
+
+
+@patch('utils.news.news_api.async_api_query_scheduler.execute_many')
+def test_get_news_of_days(mock_execute_many):
+    mock_execute_many.side_effect = lambda queries: [
+        {
+            'status': 'ok',
+            'totalResults': i_query + 1,
+            'articles': [_article(query.body['from'])],
+        }
+        for i_query, query in enumerate(queries)
+    ]
+    days = [date(2023, 1, 2), date(2023, 1, 3)]
+
+    actual = news_api.get_news_of_days('test', days, 5)
+
+    assert [
+        ([news_item['url'] for news_item in news], count)
+        for news, count in actual
+    ] == [([date_from_to_str(days[0])], 1), ([date_from_to_str(days[1])], 2)]
+    queries = mock_execute_many.call_args.args[0]
+    assert [query.body['pageSize'] for query in queries] == [10, 10]
+    assert [query.body['to'] for query in queries] == [
+        date_to_to_str(day) for day in days
+    ]
+
+
 @patch('utils.news.news_api.config.NEWS_API_KEY', new='1234567890')
 @patch('utils.news.news_api.config.NEWS_ID', new='id')
-@patch('uuid.uuid4')
-def test__get_news_page(uuid4_mock, requests_mock):
-    uuid4_mock.return_value.hex = '1234567890'
-
+@patch('utils.misc.rate_limiter.acquire', return_value=0)
+def test__get_news_page(acquire_mock):
     url = 'https://newsapi.org/v2/everything'
     method = 'GET'
     search_query = 'test'
@@ -147,42 +258,218 @@ def test__get_news_page(uuid4_mock, requests_mock):
         'language': 'en',
         'from': date_from_to_str(date_from, True),
         'to': date_to_to_str(date_to, True),
-        'sort': 'relevancy',
+        'sortBy': 'relevancy',
         'page': page_number,
         'pageSize': page_size,
     }
 
+    article = {
+        'source': {'id': None, 'name': 'Test'},
+        'author': 'Author',
+        'title': 'test',
+        'description': 'test',
+        'url': 'https://test.com',
+        'urlToImage': 'https://test.com/image.jpg',
+        'publishedAt': '2020-01-01T00:00:00Z',
+        'content': 'test',
+    }
     expected_response = {
         'status': 'ok',
         'totalResults': 1,
         'articles': [
             {
-                'id': '1234567890',
+                'id': get_news_id({'url': 'https://test.com'}),
                 'title': 'test',
                 'description': 'test',
-                'url': 'https://test.com',
-                'datePublished': '2020-01-01T00:00:00.000Z',
                 'content': 'test',
+                'url': 'https://test.com',
+                'publishedAt': '2020-01-01T00:00:00Z',
+                'source': 'Test',
             }
         ],
     }
 
-    requests_mock.register_uri(
-        method, url, json=expected_response, status_code=200
+    session = fake_session(
+        200,
+        json.dumps({'status': 'ok', 'totalResults': 1, 'articles': [article]}),
     )
 
-    start_time = datetime.utcnow()
-    response = news_api._get_news_page(
-        search_query, page_number, page_size, date_from, date_to
-    )
-    end_time = datetime.utcnow()
+    with patch(
+        'utils.misc.async_api_query_scheduler.async_session_pool.get',
+        new=AsyncMock(return_value=session),
+    ):
+        start_time = datetime.utcnow()
+        response = news_api._get_news_page(
+            search_query, page_number, page_size, date_from, date_to
+        )
+        end_time = datetime.utcnow()
 
     assert response == expected_response
-    assert end_time - start_time >= timedelta(seconds=1)
-    assert requests_mock.call_count == 1
-    assert requests_mock.last_request.method == method
-    assert requests_mock.last_request.url.startswith(url)
-    assert set(map(str.lower, request.keys())).issubset(
-        set(requests_mock.last_request.qs.keys())
+    # the rate limiter has tokens, so nothing is waited for
+    assert end_time - start_time < timedelta(seconds=1)
+    session.request.assert_called_once()
+    args, kwargs = session.request.call_args
+    assert args == (method, url)
+    assert urlsplit(args[1]).netloc == 'newsapi.org'
+    assert kwargs['params'] == request
+    assert kwargs['timeout'].total == 60
+    acquire_mock.assert_called_once_with(url)
+
+
+@patch('utils.news.news_api.async_api_query_scheduler.execute_many')
+def test__get_news_page_datetime_from(mock_execute_many):
+    mock_execute_many.return_value = [{'status': 'ok', 'articles': []}]
+    news_api._get_news_page(
+        'test', 1, 10, datetime(2020, 1, 1, 10, 5, 7), date(2020, 1, 2)
     )
-    assert requests_mock.last_request.timeout == 60
+    query = mock_execute_many.call_args[0][0][0]
+    assert query._body['from'] == '2020-01-01T10:05:07'
+    assert query._body['to'] == '2020-01-02T23:59:59'
+
+
+@pytest.mark.parametrize(
+    'extra_fields, expected',
+    [
+        (
+            (),
+            {
+                'id': '1',
+                'title': 'title',
+                'description': 'description',
+                'content': 'content',
+                'url': 'https://test.com',
+                'publishedAt': '2020-01-01T00:00:00Z',
+                'source': 'Test',
+            },
+        ),
+        (
+            ('author', 'missing'),
+            {
+                'id': '1',
+                'title': 'title',
+                'description': 'description',
+                'content': 'content',
+                'url': 'https://test.com',
+                'publishedAt': '2020-01-01T00:00:00Z',
+                'source': 'Test',
+                'author': 'Author',
+            },
+        ),
+    ],
+)
+def test__project_news(extra_fields, expected):
+    news_item = {
+        'id': '1',
+        'source': {'id': 'test', 'name': 'Test'},
+        'author': 'Author',
+        'title': 'title',
+        'description': 'description',
+        'url': 'https://test.com',
+        'urlToImage': 'https://test.com/image.jpg',
+        'publishedAt': '2020-01-01T00:00:00Z',
+        'content': 'content',
+    }
+    with patch(
+        'utils.news.news_api.config.NEWS_EXTRA_FIELDS', new=extra_fields
+    ):
+        assert news_api._project_news([news_item]) == [expected]
+
+
+def test__project_news_all_fields():
+    news = [{'id': '1', 'title': 'title', 'author': 'Author'}]
+    with patch('utils.news.news_api.config.NEWS_EXTRA_FIELDS', new=('*',)):
+        assert news_api._project_news(news) is news
+
+
+def _clean_news_legacy(news: list[dict]) -> None:
+    keys = ['title', 'description', 'content']
+    for news_item in news:
+        for key in keys:
+            if news_item[key] is None:
+                news_item[key] = ''
+            else:
+                news_item[key] = re.sub(r'<[^<]+?>', ' ', news_item[key])
+                news_item[key] = html.unescape(news_item[key])
+                news_item[key] = re.sub(r'[ \t]+', ' ', news_item[key])
+        news_item['content'] = re.sub(
+            r'\s*\[\+\d+ chars\]\s*$', '', news_item['content']
+        )
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        (None, ''),
+        ('', ''),
+        ('plain text', 'plain text'),
+        ('<p>Hello</p>\t<b>world</b>', ' Hello world '),
+        ('a  <br/> \t b', 'a b'),
+        ('AT&amp;T &lt;3 &#8217;s &nbsp', 'AT&T <3 ’s \xa0'),
+        ('a &#32; b', 'a b'),
+        ('a &#xb; b', 'a b'),
+        ('a < b > c', 'a c'),
+        ('a << b', 'a << b'),
+    ],
+)
+def test__clean_text(text, expected):
+    assert news_api._clean_text(text) == expected
+
+
+def test__clean_news():
+    news = [
+        {
+            'title': None,
+            'description': '<ul><li>One</li></ul>',
+            'content': 'Text &amp; more… [+1234 chars]',
+        }
+    ]
+    news_api._clean_news(news)
+    assert news == [
+        {
+            'title': '',
+            'description': ' One ',
+            'content': 'Text & more…',
+        }
+    ]
+
+
+def test__clean_news_same_as_legacy():
+    pieces = [
+        ' ',
+        '  ',
+        '\t',
+        '\n',
+        'a',
+        '<',
+        '>',
+        '<b>',
+        '</p>',
+        '&',
+        '#',
+        ';',
+        '&amp;',
+        '&lt;',
+        '&#32;',
+        '&#32',
+        '&#x20;',
+        '&#9;',
+        '&Tab;',
+        '&nbsp',
+        '&#xb;',
+        '&#',
+        '&amp;#32;',
+        '&notit;',
+        ' [+123 chars]',
+        'chars]',
+    ]
+    rand = random.Random(0)
+    for _ in range(5000):
+        news_item = {
+            key: ''.join(rand.choices(pieces, k=rand.randint(0, 10)))
+            for key in ('title', 'description', 'content')
+        }
+        expected = [dict(news_item)]
+        _clean_news_legacy(expected)
+        news = [dict(news_item)]
+        news_api._clean_news(news)
+        assert news == expected, news_item
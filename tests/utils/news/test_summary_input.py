@@ -1,4 +1,6 @@
 import os
+import random
+from itertools import combinations
 from unittest.mock import patch
 
 import pytest
@@ -13,6 +15,8 @@ with patch('database.init_db.init_db'), patch(
         _get_average_length,
         _get_unique_news,
         _join_news,
+        _select_news,
+        _solve_knapsack,
         get_summary_input,
     )
 
@@ -53,6 +57,14 @@ def test__join_news():
     pytest.raises(KeyError, _join_news, news, '', 8)
 
 
+@patch('utils.news.summary_input.SUMMARY_MAX_INPUT', 14)
+@patch('utils.news.summary_input._clean_news_text', side_effect=lambda t: t)
+def test__join_news_stops_at_budget(mock_clean_news_text):
+    news = [{'text': 'text1'}, {'text': 'text2'}, {'text': 'a'}] * 100
+    assert _join_news(news, 'text', 8) == 'text1\n\ntext2\n\n'
+    assert mock_clean_news_text.call_count == 3
+
+
 def test__get_average_length():
     news = [{'text': 'text1'}, {'text': 'text123'}, {'text': 'text12345'}]
     assert _get_average_length(news, 'text') == 7
@@ -110,3 +122,67 @@ def test_get_summary_input():
     ) as f:
         excepted = f.read()
     assert actual == excepted
+
+
+def test__solve_knapsack():
+    assert sorted(_solve_knapsack([5, 4, 3, 2], [10, 8, 5, 3], 7)) == [1, 2]
+    assert _solve_knapsack([8, 9], [1, 1], 7) == []
+    assert _solve_knapsack([], [], 7) == []
+
+
+@pytest.mark.parametrize(
+    'lengths, values, max_length, max_count, expected',
+    [
+        # the most valuable news fit
+        ([10, 10, 10], [3, 2, 1], 30, 2, [0, 1]),
+        # a long valuable news item is replaced with shorter ones
+        ([30, 10, 10, 10], [5, 4, 3, 2], 30, 3, [1, 2, 3]),
+        # the count limit is kept
+        ([30, 10, 10, 10], [5, 4, 3, 2], 30, 2, [1, 2]),
+        ([30, 10, 10, 10], [9, 4, 3, 2], 30, 2, [0]),
+        # news without value or too long are skipped
+        ([10, 40, 10], [0, 5, 1], 30, 3, [2]),
+        ([], [], 30, 3, []),
+    ],
+)
+def test__select_news(lengths, values, max_length, max_count, expected):
+    assert _select_news(lengths, values, max_length, max_count) == expected
+
+
+def test__select_news_optimal():
+    rand = random.Random(0)
+    for _ in range(200):
+        n_news = rand.randint(1, 8)
+        lengths = [rand.randint(50, 500) for _ in range(n_news)]
+        values = [rand.randint(1, 20) for _ in range(n_news)]
+        max_count = rand.randint(1, 5)
+
+        best_value = max(
+            sum(values[i] for i in selected)
+            for n_selected in range(max_count + 1)
+            for selected in combinations(range(n_news), n_selected)
+            if sum(lengths[i] for i in selected) <= 1000
+        )
+        selected = _select_news(lengths, values, 1000, max_count)
+
+        assert len(selected) <= max_count
+        assert sum(lengths[i] for i in selected) <= 1000
+        assert sum(values[i] for i in selected) == best_value
+
+
+@patch('utils.news.summary_input.SUMMARY_MAX_INPUT', 20)
+@patch('utils.news.summary_input.UNIQUE_KEY', 'text')
+def test_get_summary_input_importances():
+    news = [
+        {'id': 'a', 'text': 'long text of a.'},
+        {'id': 'b', 'text': 'text b'},
+        {'id': 'c', 'text': 'text c'},
+        {'id': 'd', 'text': 'text d'},
+    ]
+    importances = {'a': 4, 'b': 3, 'c': 2, 'd': 1}
+
+    actual = get_summary_input(news, 'text', importances)
+
+    assert actual == 'text b.\n\ntext c.\n\n'
+    with pytest.raises(ValueError):
+        get_summary_input([], 'text', importances)
@@ -1,6 +1,8 @@
 from datetime import date
 from unittest.mock import patch
 
+import pytest
+
 with patch('database.init_db.init_db'), patch(
     'database.init_db.create_tables'
 ):
@@ -154,3 +156,81 @@ def test_date_to_to_str() -> str:
 
     expected = date_to.strftime('%Y-%m-%d 23:59:59')
     assert news_utils.date_to_to_str(date_to, False) == expected
+
+
+@pytest.mark.parametrize(
+    'url, expected',
+    [
+        ('https://example.com/news/1', 'example.com/news/1'),
+        ('http://WWW.Example.com/news/1/', 'example.com/news/1'),
+        ('https://example.com:443/news/1#comments', 'example.com/news/1'),
+        ('https://example.com:8080/news/1', 'example.com:8080/news/1'),
+        (
+            'https://example.com/news?id=1&utm_source=x&fbclid=y&a=2',
+            'example.com/news?a=2&id=1',
+        ),
+        ('https://example.com/News/1', 'example.com/News/1'),
+        ('https://example.com', 'example.com'),
+    ],
+)
+def test_normalize_url(url, expected):
+    assert news_utils.normalize_url(url) == expected
+
+
+def test_get_news_id():
+    news_item = {
+        'url': 'https://www.example.com/news/1?utm_source=rss',
+        'title': 'Title',
+        'source': {'id': None, 'name': 'Example'},
+    }
+    news_id = news_utils.get_news_id(news_item)
+    assert len(news_id) == news_utils.NEWS_ID_LENGTH
+    assert int(news_id, 16) >= 0
+
+    same_item = {**news_item, 'url': 'http://example.com/news/1/'}
+    assert news_utils.get_news_id(same_item) == news_id
+
+    other_item = {**news_item, 'url': 'https://example.com/news/2'}
+    assert news_utils.get_news_id(other_item) != news_id
+
+
+def test_get_news_id_without_url():
+    news_item = {
+        'url': None,
+        'title': 'Some  Title ',
+        'source': {'id': None, 'name': 'Example'},
+    }
+    news_id = news_utils.get_news_id(news_item)
+    same_item = {**news_item, 'title': 'some title'}
+    assert news_utils.get_news_id(same_item) == news_id
+
+    other_item = {**news_item, 'source': {'id': None, 'name': 'Other'}}
+    assert news_utils.get_news_id(other_item) != news_id
+
+    no_source_item = {'title': 'Some title'}
+    assert len(news_utils.get_news_id(no_source_item)) == 32
+
+    assert news_utils.get_news_id({}) != news_utils.get_news_id({})
+
+
+@pytest.mark.parametrize(
+    'search_query, sort_tokens, expected',
+    [
+        ('Bitcoin', False, 'bitcoin'),
+        (' bitcoin  PRICE\n', False, 'bitcoin price'),
+        ('ＢＩＴＣＯＩＮ', False, 'bitcoin'),
+        ('Straße', False, 'strasse'),
+        ('price Bitcoin', False, 'price bitcoin'),
+        ('price  Bitcoin', True, 'bitcoin price'),
+        ('', True, ''),
+    ],
+)
+def test_normalize_query(search_query, sort_tokens, expected):
+    assert news_utils.normalize_query(search_query, sort_tokens) == expected
+
+
+def test_normalize_query_config():
+    with patch('utils.news.utils.config.QUERY_SORT_TOKENS', True):
+        assert news_utils.normalize_query('b a') == 'a b'
+    with patch('utils.news.utils.config.QUERY_SORT_TOKENS', False):
+        assert news_utils.normalize_query('b a') == 'b a'
@@ -1,11 +1,29 @@
 from unittest.mock import Mock, patch
 
+import pytest
+
 with patch('database.init_db.init_db'), patch(
     'database.init_db.create_tables'
 ):
+    from utils import summary
     from utils.summary import get_summary, get_summary_percent
 
 
+@pytest.fixture(autouse=True)
+def reset_remote_cooldown():
+    summary._remote_failed_until = 0.0
+    yield
+    summary._remote_failed_until = 0.0
+
+
+@pytest.fixture(autouse=True)
+def mocked_cache():
+    with patch('utils.summary.cache.get', return_value=None), patch(
+        'utils.summary.cache.set'
+    ):
+        yield summary.cache
+
+
 @patch('utils.summary.config')
 @patch('utils.summary.get_json_value')
 @patch('utils.summary.ApiQueryScheduler')
@@ -20,7 +38,7 @@ def test_get_summary_percent(
     }
     mocked_json_value.return_value = ['This is a summary.']
 
-    result = get_summary_percent('This is a test string.', 50)
+    result = get_summary_percent('This is a test string.', 50, 5)
 
     mocked_apiquery.assert_called_once_with(
         'POST',
@@ -35,7 +53,7 @@ def test_get_summary_percent(
             'summary_percent': 50,
             'text': 'This is a test string.',
         },
-        interval=0.005,
+        timeout=5,
     )
     mocked_scheduler.execute.assert_called_once()
     mocked_json_value.assert_called_once_with(
@@ -51,13 +69,208 @@ def test_get_summary_less_than_n_characters():
     assert result == [test_string]
 
 
+@patch('utils.summary.config')
 @patch('utils.summary.get_summary_percent')
-def test_get_summary_more_than_n_characters(mocked_summary_percent):
+def test_get_summary_more_than_n_characters(
+    mocked_summary_percent, mocked_config
+):
+    mocked_config.SUMMARY_ENGINE = 'auto'
+    mocked_config.SUMMARY_API_TIMEOUT = 5
+    mocked_config.SUMMARY_CHUNK_SIZE = 0
     test_string = 'This is a test string.'
     mocked_summary_percent.return_value = ['This is a summary.']
 
     result = get_summary(test_string, 10)
 
     percent = round(10 / len(test_string) * 100, 3)
-    mocked_summary_percent.assert_called_once_with(test_string, percent)
+    mocked_summary_percent.assert_called_once_with(test_string, percent, 5)
     assert result == ['This is a summary.']
+
+
+@patch('utils.summary.textrank.get_summary', return_value=['Local.'])
+@patch('utils.summary.get_summary_percent')
+def test_get_summary_local(mocked_summary_percent, mocked_textrank):
+    test_string = 'This is a test string.'
+
+    result = get_summary(test_string, 10, engine='local')
+
+    mocked_summary_percent.assert_not_called()
+    mocked_textrank.assert_called_once_with(test_string, 10)
+    assert result == ['Local.']
+
+
+@pytest.mark.parametrize('remote_summary', [None, []])
+@patch('utils.summary.textrank.get_summary', return_value=['Local.'])
+@patch('utils.summary.get_summary_percent')
+def test_get_summary_remote(
+    mocked_summary_percent, mocked_textrank, remote_summary
+):
+    mocked_summary_percent.return_value = remote_summary
+
+    result = get_summary('This is a test string.', 10, engine='remote')
+
+    mocked_summary_percent.assert_called_once()
+    mocked_textrank.assert_not_called()
+    assert result == remote_summary
+
+
+@patch('utils.summary.time.monotonic')
+@patch('utils.summary.textrank.get_summary', return_value=['Local.'])
+@patch('utils.summary.get_summary_percent', return_value=None)
+def test_get_summary_auto_fallback(
+    mocked_summary_percent, mocked_textrank, mocked_monotonic
+):
+    test_string = 'This is a test string.'
+    mocked_monotonic.return_value = 1000.0
+
+    assert get_summary(test_string, 10, engine='auto') == ['Local.']
+    assert mocked_summary_percent.call_count == 1
+    assert mocked_textrank.call_count == 1
+
+    # the API is not queried during cooldown
+    mocked_monotonic.return_value = 1000.0 + summary.REMOTE_COOLDOWN - 1
+    assert get_summary(test_string, 10, engine='auto') == ['Local.']
+    assert mocked_summary_percent.call_count == 1
+    assert mocked_textrank.call_count == 2
+
+    mocked_monotonic.return_value = 1000.0 + summary.REMOTE_COOLDOWN
+    mocked_summary_percent.return_value = ['Remote.']
+    assert get_summary(test_string, 10, engine='auto') == ['Remote.']
+    assert mocked_summary_percent.call_count == 2
+    assert mocked_textrank.call_count == 2
+
+
+@patch('utils.summary.textrank.get_summary', return_value=['Local.'])
+@patch('utils.summary.get_summary_percent')
+def test_get_summary_auto_cooldown_cached(
+    mocked_summary_percent, mocked_textrank, mocked_cache
+):
+    test_string = 'This is a test string.'
+    remote_key = summary._key_summary('remote', test_string, 10)
+    mocked_cache.get.side_effect = lambda key: (
+        ['Cached remote.'] if key == remote_key else None
+    )
+    summary._remote_failed_until = float('inf')
+
+    # cached API summaries are used during cooldown
+    assert get_summary(test_string, 10, engine='auto') == ['Cached remote.']
+    assert get_summary(test_string, 11, engine='auto') == ['Local.']
+    mocked_summary_percent.assert_not_called()
+    mocked_textrank.assert_called_once_with(test_string, 11)
+
+
+@patch('utils.summary.get_summary_percent', return_value=['Remote.'])
+def test_get_summary_cached(mocked_summary_percent, mocked_cache):
+    test_string = 'This is a test string.'
+    cached = {}
+    mocked_cache.get.side_effect = cached.get
+    mocked_cache.set.side_effect = lambda key, value, ex: cached.update(
+        {key: value}
+    )
+
+    for _ in range(2):
+        assert get_summary(test_string, 10, engine='remote') == ['Remote.']
+        assert get_summary(test_string, 10, engine='local') != ['Remote.']
+
+    assert mocked_summary_percent.call_count == 1
+    assert len(cached) == 2
+    assert {key.split(':')[1] for key in cached} == {'remote', 'local'}
+    ex = {call.kwargs['ex'] for call in mocked_cache.set.call_args_list}
+    assert ex == {summary.SUMMARY_CACHE_TTL}
+
+    get_summary(test_string + ' ', 10, engine='remote')
+    get_summary(test_string, 11, engine='remote')
+    assert mocked_summary_percent.call_count == 3
+
+
+@pytest.mark.parametrize('remote_summary', [None, []])
+@patch('utils.summary.textrank.get_summary', return_value=['Local.'])
+@patch('utils.summary.get_summary_percent')
+def test_get_summary_failure_not_cached(
+    mocked_summary_percent, mocked_textrank, mocked_cache, remote_summary
+):
+    mocked_summary_percent.return_value = remote_summary
+
+    get_summary('This is a test string.', 10, engine='auto')
+
+    assert mocked_cache.set.call_count == 1
+    assert mocked_cache.set.call_args.args[0].startswith('text_summary:local')
+
+
+@pytest.mark.parametrize(
+    'text, chunk_size, expected',
+    [
+        ('aaa\n\nbbb', 0, ['aaa\n\nbbb']),
+        ('aaa\n\nbbb', 8, ['aaa\n\nbbb']),
+        ('aaa\n\nbbb', 7, ['aaa', 'bbb']),
+        ('aaa\n\nbb\n\ncccccc\n\nd', 7, ['aaa\n\nbb', 'cccccc', 'd']),
+        ('aaaaaaaaaa\n\nb', 5, ['aaaaaaaaaa', 'b']),
+    ],
+)
+def test__split_chunks(text, chunk_size, expected):
+    assert summary._split_chunks(text, chunk_size) == expected
+
+
+@pytest.fixture
+def chunked_config():
+    with patch('utils.summary.config') as mocked_config:
+        mocked_config.SUMMARY_API_TIMEOUT = 5
+        mocked_config.SUMMARY_CHUNK_SIZE = 30
+        yield mocked_config
+
+
+CHUNKED_TEXT = 'First news item text.\n\nSecond news item text.'
+
+
+@patch('utils.summary.get_summary_percent', return_value=['Final.'])
+@patch('utils.summary.async_api_query_scheduler.execute_many')
+def test_get_summary_chunked(
+    mocked_execute_many, mocked_summary_percent, chunked_config
+):
+    mocked_execute_many.return_value = [
+        {'sentences': ['First summary.']},
+        {'sentences': ['Second summary.']},
+    ]
+
+    result = get_summary(CHUNKED_TEXT, 20, engine='remote')
+
+    queries = list(mocked_execute_many.call_args.args[0])
+    assert [query._body['text'] for query in queries] == [
+        'First news item text.',
+        'Second news item text.',
+    ]
+    assert all(isinstance(query, summary.ApiQuery) for query in queries)
+    reduce_input = 'First summary.\n\nSecond summary.'
+    mocked_summary_percent.assert_called_once_with(
+        reduce_input, round(20 / len(reduce_input) * 100, 3), 5
+    )
+    assert result == ['Final.']
+
+
+@patch('utils.summary.get_summary_percent')
+@patch('utils.summary.async_api_query_scheduler.execute_many')
+def test_get_summary_chunked_fits(
+    mocked_execute_many, mocked_summary_percent, chunked_config
+):
+    mocked_execute_many.return_value = [
+        {'sentences': ['First.']},
+        {'sentences': ['Second.']},
+    ]
+
+    result = get_summary(CHUNKED_TEXT, 20, engine='remote')
+
+    mocked_summary_percent.assert_not_called()
+    assert result == ['First.', 'Second.']
+
+
+@patch('utils.summary.get_summary_percent')
+@patch('utils.summary.async_api_query_scheduler.execute_many')
+def test_get_summary_chunked_failed(
+    mocked_execute_many, mocked_summary_percent, chunked_config
+):
+    mocked_execute_many.return_value = [{'sentences': ['First.']}, None]
+
+    result = get_summary(CHUNKED_TEXT, 20, engine='remote')
+
+    mocked_summary_percent.assert_not_called()
+    assert result is None
@@ -0,0 +1,82 @@
+from unittest.mock import patch
+
+import pytest
+
+with patch('database.init_db.init_db'), patch(
+    'database.init_db.create_tables'
+):
+    from utils import textrank
+
+TEXT = (
+    'The central bank raised interest rates again on Tuesday. '
+    'Markets fell after the central bank raised interest rates. '
+    'Analysts expect the bank to keep rates high for months. '
+    'It rained. '
+    'Investors moved money from stocks to bonds after the rates decision. '
+    'A local football team won the cup final on Sunday evening.'
+)
+
+
+def test_get_summary():
+    result = textrank.get_summary(TEXT, 200)
+
+    assert result
+    assert len(' '.join(result)) <= 200
+    sentences = textrank._split_sentences(TEXT)
+    positions = [sentences.index(sentence) for sentence in result]
+    assert positions == sorted(positions)
+    assert 'It rained.' not in result
+    # a sentence sharing no words with others is ranked lowest
+    assert sentences[-1] not in result
+
+
+def test_get_summary_short_text():
+    assert textrank.get_summary(TEXT, len(TEXT)) == [TEXT]
+
+
+def test_get_summary_skips_duplicates():
+    sentence = 'The central bank raised interest rates again on Tuesday.'
+    text = ' '.join([sentence] * 3 + ['Markets fell after the decision.'])
+
+    result = textrank.get_summary(text, len(sentence) * 2 + 1)
+
+    assert result.count(sentence) == 1
+
+
+def test_get_summary_shortens_sentence():
+    result = textrank.get_summary(TEXT, 20)
+
+    assert len(result) == 1
+    assert len(result[0]) <= 20
+    assert result[0].endswith('…')
+
+
+@pytest.mark.parametrize('n_characters', [-1, 0, 1, 3])
+def test_get_summary_no_word_fits(n_characters):
+    assert textrank.get_summary(TEXT, n_characters) == []
+
+
+@pytest.mark.parametrize(
+    'text, expected',
+    [
+        ('', []),
+        ('One. Two!  Three?\nFour', ['One.', 'Two!', 'Three?', 'Four']),
+        ('Mr.Smith is here. Ok', ['Mr.Smith is here.', 'Ok']),
+        ('  Line one\n\n  line two  ', ['Line one', 'line two']),
+    ],
+)
+def test__split_sentences(text, expected):
+    assert textrank._split_sentences(text) == expected
+
+
+def test__rank_sentences():
+    similarities = textrank._get_tfidf(textrank._split_sentences(TEXT))
+    similarities = similarities @ similarities.T
+    for i in range(len(similarities)):
+        similarities[i, i] = 0
+
+    scores = textrank._rank_sentences(similarities)
+
+    assert scores.sum() == pytest.approx(1)
+    assert scores.argmax() in (0, 1)
+    assert scores[3] == scores.min()
@@ -1,78 +1,299 @@
 from datetime import date
-from unittest.mock import patch
+from unittest.mock import Mock, patch
+
+import pytest
 
 with patch('database.init_db.init_db'), patch(
     'database.init_db.create_tables'
 ):
+    from utils import top_news as top_news_module
+    from utils.misc.redis_cache import CacheEntry
     from utils.top_news import (
         cache_top_news_items,
+        get_article_summary,
         get_cached_top_news_item,
         get_top_news,
+        prefetch_article_summaries,
     )
 
 
 def test_get_top_news():
-    sentences = []
     important_news = {
-        'news_id1': {'news': 'news 1'},
-        'news_id2': {'news': 'news 2'},
-        'news_id3': {'news': 'news 3'},
-        'news_id4': {'news': 'news 4'},
+        f'news_id{i}': {'news': {'title': f'news {i}', 'content': text}}
+        for i, text in enumerate(
+            [
+                'Coast Guard responds to a vessel fire in Tacoma',
+                'A new study links heartbeats to perception of time',
+                'Plastic bags are not recyclable in curbside programs',
+                'Stocks rallied as technology companies beat forecasts',
+            ]
+        )
     }
 
     assert [item['news'] for item in important_news.values()][
         :3
-    ] == get_top_news(sentences, important_news, 3)
+    ] == get_top_news(important_news, 3)
 
     assert [item['news'] for item in important_news.values()][
         :1
-    ] == get_top_news(sentences, important_news, 1)
+    ] == get_top_news(important_news, 1)
 
 
-@patch('utils.top_news.cache.key')
-@patch('utils.top_news.cache.exists')
-@patch('utils.top_news.cache.set')
+def test_get_top_news_near_duplicates():
+    text = (
+        'The government announced a new climate policy on Monday aimed at '
+        'cutting emissions by half by 2030, officials said'
+    )
+    important_news = {
+        'news_id1': {'news': {'title': 'Climate policy', 'content': text}},
+        'news_id2': {
+            'news': {'title': 'Climate policy', 'content': text + ' today'}
+        },
+        'news_id3': {'news': {'title': 'Sports', 'content': 'Team wins'}},
+    }
+
+    assert get_top_news(important_news, 2) == [
+        important_news['news_id1']['news'],
+        important_news['news_id3']['news'],
+    ]
+
+
+@patch('utils.top_news.cache.key', side_effect=lambda *args: args[1])
+@patch('utils.top_news.cache.set_many')
 @patch('utils.top_news.cache.calc_ttl')
-def test_cache_top_news_items(mock_calc_ttl, mock_set, mock_exists, mock_key):
+def test_cache_top_news_items(mock_calc_ttl, mock_set_many, mock_key):
     top_news = [{'id': 1, 'news': 'news 1'}, {'id': 2, 'news': 'news 2'}]
     date_to = date.today()
-    mock_key.return_value = 'key'
-    mock_exists.return_value = False
+    mock_calc_ttl.return_value = 100
 
     cache_top_news_items(top_news, date_to)
 
-    mock_calc_ttl.assert_called_with(date_to)
-    mock_calc_ttl.call_count == len(top_news)
-    assert mock_set.call_count == len(top_news)
+    mock_calc_ttl.assert_called_once_with(date_to)
+    mock_set_many.assert_called_once_with(
+        {1: top_news[0], 2: top_news[1]}, ex=100, nx=True, extend_ttl=True
+    )
 
 
 @patch('utils.top_news.cache.key')
-@patch('utils.top_news.cache.exists')
-@patch('utils.top_news.cache.get')
-@patch('utils.top_news.cache.get_ttl')
-def test_get_cached_top_news_exists(
-    mock_get_ttl, mock_get, mock_exists, mock_key
-):
+@patch('utils.top_news.cache.get_with_ttl')
+def test_get_cached_top_news_exists(mock_get_with_ttl, mock_key):
     id = '1'
     mock_key.return_value = 'key'
-    mock_exists.return_value = True
-    mock_get.return_value = {'id': id, 'news': 'news 1'}
-    mock_get_ttl.return_value = 100
+    mock_get_with_ttl.return_value = ({'id': id, 'news': 'news 1'}, 100)
 
     news_item, ttl = get_cached_top_news_item(id)
 
+    mock_get_with_ttl.assert_called_once_with('key')
     assert news_item == {'id': id, 'news': 'news 1'}
     assert ttl == 100
 
 
 @patch('utils.top_news.cache.key')
-@patch('utils.top_news.cache.exists')
-def test_get_cached_top_news_not_exists(mock_exists, mock_key):
+@patch('utils.top_news.cache.get_with_ttl')
+def test_get_cached_top_news_not_exists(mock_get_with_ttl, mock_key):
     id = '1'
     mock_key.return_value = 'key'
-    mock_exists.return_value = False
+    mock_get_with_ttl.return_value = (None, -2)
 
     news_item, ttl = get_cached_top_news_item(id)
 
     assert news_item is None
     assert ttl == 0
+
+
+@patch('utils.top_news.config')
+@patch('utils.top_news.cache.get_set_entry')
+@patch('utils.top_news.cache.prefetch')
+@patch('utils.top_news.singleflight.do', return_value=['summary'])
+def test_get_article_summary(
+    mock_do, mock_prefetch, mock_get_set_entry, mock_config
+):
+    mock_config.NEWS_ID = 'id'
+    mock_config.NEWS_BODY = 'content'
+    mock_config.ARTICLE_SUMMARY_ENGINE = 'local'
+    key = 'article_summary:1'
+    mock_prefetch.return_value = [_entry(key, None)]
+
+    result = get_article_summary({'id': '1', 'content': 'text'}, 100)
+
+    mock_prefetch.assert_called_once_with(key)
+    mock_get_set_entry.assert_not_called()
+    mock_do.assert_called_once_with(
+        key,
+        top_news_module.cache.get_set,
+        key,
+        100,
+        top_news_module.get_summary,
+        'text',
+        engine='local',
+    )
+    assert result == ['summary']
+
+
+@patch('utils.top_news.config')
+@patch('utils.top_news.cache.get_set_entry', return_value=['cached'])
+@patch('utils.top_news.cache.prefetch')
+@patch('utils.top_news.singleflight.do')
+def test_get_article_summary_cached(
+    mock_do, mock_prefetch, mock_get_set_entry, mock_config
+):
+    mock_config.NEWS_ID = 'id'
+    mock_config.NEWS_BODY = 'content'
+    mock_config.ARTICLE_SUMMARY_ENGINE = 'local'
+    entry = _entry('article_summary:1', '["cached"]')
+    mock_prefetch.return_value = [entry]
+
+    result = get_article_summary({'id': '1', 'content': 'text'}, 100)
+
+    # a cached summary does not go through singleflight
+    mock_do.assert_not_called()
+    mock_get_set_entry.assert_called_once_with(
+        entry, 100, top_news_module.get_summary, 'text', engine='local'
+    )
+    assert result == ['cached']
+
+
+def _entry(key: str, value: str | None) -> CacheEntry:
+    return CacheEntry(key, value, None, None, -2 if value is None else 100)
+
+
+@pytest.fixture(autouse=True)
+def clear_prefetch_jobs():
+    top_news_module._prefetch_jobs.clear()
+    yield
+    top_news_module._prefetch_jobs.clear()
+
+
+def _job(running: bool = False, done: bool = False) -> Mock:
+    job = Mock()
+    job.running.return_value = running
+    job.done.return_value = done
+    return job
+
+
+@patch('utils.top_news._article_summary_executor')
+@patch('utils.top_news.cache.calc_ttl', return_value=100)
+@patch('utils.top_news.cache.prefetch')
+def test_prefetch_article_summaries(
+    mock_prefetch, mock_calc_ttl, mock_executor
+):
+    top_news = [{'id': '1'}, {'id': '2'}, {'id': '3'}, {'id': '4'}]
+    mock_prefetch.return_value = [
+        _entry('article_summary:1', None),
+        _entry('article_summary:2', '["cached"]'),
+        _entry('article_summary:3', None),
+        _entry('article_summary:4', None),
+    ]
+    mock_executor.submit.side_effect = lambda *args: _job()
+    # jobs of earlier top news are kept, their buttons are still shown
+    old_job = _job()
+    top_news_module._prefetch_jobs['0'] = old_job
+    running_job = _job(running=True)
+    top_news_module._prefetch_jobs['4'] = running_job
+
+    jobs = prefetch_article_summaries(top_news, date.today())
+
+    mock_prefetch.assert_called_once_with(
+        'article_summary:1',
+        'article_summary:2',
+        'article_summary:3',
+        'article_summary:4',
+    )
+    assert [call.args for call in mock_executor.submit.call_args_list] == [
+        (top_news_module._prefetch_article_summary, top_news[0], 100),
+        (top_news_module._prefetch_article_summary, top_news[2], 100),
+    ]
+    old_job.cancel.assert_not_called()
+    assert list(top_news_module._prefetch_jobs) == ['0', '4', '1', '3']
+    assert top_news_module._prefetch_jobs['1'] is jobs[0]
+    assert top_news_module._prefetch_jobs['3'] is jobs[1]
+
+
+@patch('utils.top_news.MAX_PENDING_PREFETCH_JOBS', 2)
+@patch('utils.top_news._article_summary_executor')
+@patch('utils.top_news.cache.calc_ttl', return_value=100)
+@patch('utils.top_news.cache.prefetch')
+def test_prefetch_article_summaries_pending_limit(
+    mock_prefetch, mock_calc_ttl, mock_executor
+):
+    mock_prefetch.return_value = [_entry('article_summary:3', None)]
+    mock_executor.submit.side_effect = lambda *args: _job()
+    old_jobs = [_job(running=True), _job(), _job()]
+    top_news_module._prefetch_jobs.update(zip('012', old_jobs))
+
+    prefetch_article_summaries([{'id': '3'}], date.today())
+
+    # only the oldest job waiting for a worker is cancelled
+    old_jobs[0].cancel.assert_not_called()
+    old_jobs[1].cancel.assert_called_once()
+    old_jobs[2].cancel.assert_not_called()
+    assert list(top_news_module._prefetch_jobs) == ['0', '2', '3']
+
+
+@patch('utils.top_news.get_summary', return_value=['summary'])
+@patch(
+    'utils.top_news.cache.get_set', side_effect=lambda k, t, f, *a, **kw: f(*a)
+)
+@patch(
+    'utils.top_news.singleflight.do',
+    side_effect=lambda k, f, *a, **kw: f(*a, **kw),
+)
+@patch('utils.top_news.cache.exists', return_value=True)
+@patch('utils.top_news.cache.calc_ttl', return_value=100)
+@patch('utils.top_news.cache.prefetch')
+def test_prefetch_article_summaries_jobs(
+    mock_prefetch,
+    mock_calc_ttl,
+    mock_exists,
+    mock_do,
+    mock_get_set,
+    mock_get_summary,
+):
+    top_news = [{'id': '1', 'content': 'text 1'}]
+    mock_prefetch.return_value = [_entry('article_summary:1', None)]
+
+    jobs = prefetch_article_summaries(top_news, date.today())
+    for job in jobs:
+        job.result(timeout=5)
+
+    mock_exists.assert_called_once_with('top_news_item:1')
+    assert mock_get_set.call_args.args[:2] == ('article_summary:1', 100)
+    mock_get_summary.assert_called_once_with('text 1')
+
+
+@patch('utils.top_news._get_article_summary', return_value=['summary'])
+def test_get_article_summary_cancels_prefetch(mock_get_article_summary):
+    job = _job()
+    top_news_module._prefetch_jobs['1'] = job
+
+    assert get_article_summary({'id': '1'}, 100) == ['summary']
+
+    job.cancel.assert_called_once()
+    mock_get_article_summary.assert_called_once_with({'id': '1'}, 100)
+
+
+def test__forget_prefetch_job():
+    job = Mock()
+    top_news_module._prefetch_jobs['1'] = job
+
+    top_news_module._forget_prefetch_job('1', Mock())
+    assert top_news_module._prefetch_jobs['1'] is job
+
+    top_news_module._forget_prefetch_job('1', job)
+    assert '1' not in top_news_module._prefetch_jobs
+
+
+@patch('utils.top_news._get_article_summary')
+@patch('utils.top_news.cache.exists', return_value=False)
+def test__prefetch_article_summary_expired(mock_exists, mock_get_summary):
+    top_news_module._prefetch_article_summary({'id': '1'}, 100)
+
+    mock_get_summary.assert_not_called()
+
+
+@patch('utils.top_news._get_article_summary', side_effect=ValueError('failed'))
+@patch('utils.top_news.cache.exists', return_value=True)
+def test__prefetch_article_summary_error(mock_exists, mock_get_summary):
+    top_news_module._prefetch_article_summary({'id': '1'}, 100)
+
+    mock_get_summary.assert_called_once_with({'id': '1'}, 100)
@@ -0,0 +1,253 @@
+import asyncio
+import json
+from threading import Lock, Thread
+from typing import Any, Coroutine, Iterable
+
+import aiohttp
+from loguru import logger
+
+from utils.misc import rate_limiter
+from utils.misc.session_pool import async_session_pool
+
+_loop = None
+_loop_lock = Lock()
+
+
+class AsyncApiQuery:
+    """
+    Query to API executed with aiohttp
+
+    Args:
+        method (str): method type (must be POST or GET)
+        url (str): API url
+        headers (dict): request headers
+        body (dict): request body
+        timeout (int): request timeout
+
+    Attributes:
+        _method (str): method type (POST or GET)
+        _url (str): API url
+        _headers (dict): request headers
+        _body (dict): request body if method is POST, else request params
+        _timeout (int): request timeout
+
+    Raises:
+        ValueError: if method is not POST or GET
+    """
+
+    def __init__(
+        self,
+        method: str,
+        url: str,
+        headers: dict,
+        body: dict,
+        timeout: int = 10,
+    ):
+        """
+        Constructor method
+
+        :param method: method type (must be POST or GET)
+        :type method: str
+        :param url: API url
+        :type url: str
+        :param headers: request headers
+        :type headers: dict
+        :param body: request body
+        :type body: dict
+        :param timeout: request timeout, defaults to 10
+        :type timeout: int
+        :raises ValueError: if method is not POST or GET
+        """
+        self._method = method.upper()
+        if self._method not in ('POST', 'GET'):
+            raise ValueError('Method must be POST or GET')
+        self._url = url
+        self._headers = headers
+        self._body = body
+        self._timeout = timeout
+
+    @property
+    def url(self) -> str:
+        """
+        API url
+
+        :return: API url
+        :rtype: str
+        """
+        return self._url
+
+    @property
+    def body(self) -> dict:
+        """
+        Request body or params
+
+        :return: request body or params
+        :rtype: dict
+        """
+        return self._body
+
+    async def execute(self) -> Any:
+        """
+        Executes the query
+
+        :return: result of the query
+        :rtype: Any
+        """
+        logger.debug(f'Sending request to {self._url}')
+
+        session = await async_session_pool.get(self._url)
+        try:
+            async with session.request(
+                self._method,
+                self._url,
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                **self._get_payload(),
+            ) as response:
+                text = await response.text()
+
+            if 200 <= response.status < 300:
+                self._log_success(text)
+                try:
+                    return json.loads(text)
+                except json.JSONDecodeError:
+                    logger.error('JSON decoding failed')
+            else:
+                self._log_failure(response.status)
+        except asyncio.TimeoutError:
+            logger.error('Request failed: timeout')
+        except aiohttp.ClientError as exc:
+            logger.error('Request failed: ' + (str(exc) or 'Unknown error'))
+
+        return None
+
+    def _get_payload(self) -> dict:
+        """
+        Gets request payload: JSON body for POST, query params for GET.
+        Params with None values are dropped, aiohttp does not accept them.
+
+        :return: keyword arguments with payload for a request
+        :rtype: dict
+        """
+        if self._method == 'POST':
+            return {'json': self._body}
+        if not self._body:
+            return {'params': self._body}
+        return {
+            'params': {
+                key: value
+                for key, value in self._body.items()
+                if value is not None
+            }
+        }
+
+    def _log_success(self, text: str) -> None:
+        """
+        Logs a successful response
+
+        :param text: response text
+        :type text: str
+        """
+        logger.success(
+            'Got answer({}) from {} , answer={}'.format(
+                len(text), self._url, text[:100]
+            )
+        )
+
+    def _log_failure(self, status_code: int) -> None:
+        """
+        Logs a response with an unsuccessful status code
+
+        :param status_code: response status code
+        :type status_code: int
+        """
+        logger.error(f'Request failed. Got status code {status_code}')
+
+
+class AsyncApiQueryScheduler:
+    """
+    API query scheduler for AsyncApiQuery. Queries wait only for the rate
+    limiter of their API, see rate_limiter, without blocking the event loop.
+    Queries refused by the rate limiter are not sent.
+    """
+
+    @classmethod
+    def _acquire(cls, query: AsyncApiQuery) -> float | None:
+        """
+        Takes a token from the rate limiter of the query API
+
+        :param query: query
+        :type query: AsyncApiQuery
+        :return: time to wait before sending the query, None if the query
+            must not be sent
+        :rtype: float | None
+        """
+        return rate_limiter.acquire(query.url)
+
+    @classmethod
+    async def execute(cls, query: AsyncApiQuery) -> Any:
+        """
+        Executes query
+
+        :param query: query
+        :type query: AsyncApiQuery
+        :return: result of the query, None if it is refused by the rate
+            limiter
+        :rtype: Any
+        """
+        wait_time = await asyncio.to_thread(cls._acquire, query)
+        if wait_time is None:
+            return None
+        if wait_time > 0:
+            logger.debug(f'Waiting for rate limit for {wait_time} seconds')
+            await asyncio.sleep(wait_time)
+
+        return await query.execute()
+
+
+def run(coroutine: Coroutine) -> Any:
+    """
+    Runs a coroutine in the background event loop and waits for its result.
+    Lets synchronous code (bot handlers) use the async engine while keeping
+    aiohttp sessions alive between calls.
+
+    :param coroutine: coroutine
+    :type coroutine: Coroutine
+    :return: result of the coroutine
+    :rtype: Any
+    """
+    future = asyncio.run_coroutine_threadsafe(coroutine, _get_loop())
+    return future.result()
+
+
+def execute_many(queries: Iterable[AsyncApiQuery]) -> list[Any]:
+    """
+    Executes queries concurrently, blocks until all of them are done
+
+    :param queries: queries
+    :type queries: Iterable[AsyncApiQuery]
+    :return: results of the queries in the same order
+    :rtype: list[Any]
+    """
+
+    async def gather() -> list[Any]:
+        return await asyncio.gather(
+            *(AsyncApiQueryScheduler.execute(query) for query in queries)
+        )
+
+    return run(gather())
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Gets the background event loop, starts it in a daemon thread if needed
+
+    :return: event loop
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            Thread(target=_loop.run_forever, daemon=True).start()
+    return _loop
@@ -0,0 +1,133 @@
+import base64
+import zlib
+from typing import Any, Callable, NamedTuple
+
+import orjson
+
+# encoded values start with MARKER and a type tag, values without MARKER
+# were written before the codec was introduced
+MARKER = '\x00'
+COMPRESSED_TAG = 'z'
+# payloads at least this long are compressed if it makes them shorter.
+# Compression costs more than JSON encoding, so only large values written
+# seldom, like news, are compressed, hot summaries and top news are not.
+COMPRESS_MIN_SIZE = 16 * 1024
+# the fastest level, higher ones take several times longer for ~20% less
+COMPRESS_LEVEL = 1
+
+
+class Codec(NamedTuple):
+    """
+    Codec for values of specific types
+
+    Attributes:
+        tag (str): one character type tag written before the payload
+        types (tuple[type]): exact types of values encoded by the codec
+        encode (Callable[[Any], str]): converts a value to a payload
+        decode (Callable[[str], Any]): converts a payload to a value
+    """
+
+    tag: str
+    types: tuple[type, ...]
+    encode: Callable[[Any], str]
+    decode: Callable[[str], Any]
+
+
+def _encode_json(value: Any) -> str:
+    """
+    Encodes value to JSON
+
+    :param value: value
+    :type value: Any
+    :return: JSON
+    :rtype: str
+    """
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+_codecs_by_tag = {}
+_codecs_by_type = {}
+_default_codec = Codec('j', (), _encode_json, orjson.loads)
+
+
+def register(codec: Codec) -> None:
+    """
+    Registers codec, replaces codecs with the same tag or types
+
+    :param codec: codec
+    :type codec: Codec
+    :raises ValueError: if tag is not a single character or is reserved
+    """
+    if len(codec.tag) != 1 or codec.tag in (MARKER, COMPRESSED_TAG):
+        raise ValueError(f'Invalid codec tag: {codec.tag!r}')
+
+    _codecs_by_tag[codec.tag] = codec
+    for value_type in codec.types:
+        _codecs_by_type[value_type] = codec
+
+
+register(_default_codec)
+register(Codec('s', (str,), str, str))
+register(Codec('i', (int,), str, int))
+register(Codec('f', (float,), repr, float))
+
+
+def encode(value: Any) -> str:
+    """
+    Encodes value to a string stored in Redis: MARKER, type tag and
+    payload. Large payloads are compressed with zlib and base64 encoded
+    to keep values valid for a connection decoding responses.
+
+    :param value: value
+    :type value: Any
+    :return: encoded value
+    :rtype: str
+    """
+    codec = _codecs_by_type.get(type(value), _default_codec)
+    payload = codec.encode(value)
+
+    if len(payload) >= COMPRESS_MIN_SIZE:
+        compressed = base64.b64encode(
+            zlib.compress(payload.encode(), COMPRESS_LEVEL)
+        ).decode()
+        if len(compressed) < len(payload):
+            return MARKER + COMPRESSED_TAG + codec.tag + compressed
+
+    return MARKER + codec.tag + payload
+
+
+def is_encoded(value: Any) -> bool:
+    """
+    Checks if value was encoded by the codec
+
+    :param value: value read from Redis
+    :type value: Any
+    :return: True if value was encoded by the codec, False otherwise
+    :rtype: bool
+    """
+    return isinstance(value, str) and value.startswith(MARKER)
+
+
+def decode(value: str) -> Any:
+    """
+    Decodes value encoded by encode
+
+    :param value: encoded value
+    :type value: str
+    :raises ValueError: if value is not encoded or its tag is unknown
+    :return: value
+    :rtype: Any
+    """
+    if not is_encoded(value) or len(value) < 2:
+        raise ValueError('Value is not encoded')
+
+    tag, payload = value[1], value[2:]
+    if tag == COMPRESSED_TAG:
+        compressed = base64.b64decode(payload[1:])
+        tag, payload = payload[:1], zlib.decompress(compressed).decode()
+
+    codec = _codecs_by_tag.get(tag)
+    if codec is None:
+        raise ValueError(f'Unknown codec tag: {tag!r}')
+
+    return codec.decode(payload)
@@ -0,0 +1,168 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any
+
+# approximate memory taken by an entry besides its key and value
+ENTRY_OVERHEAD = 200
+
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU cache limited by size in bytes and number of
+    entries. Entries expire after their TTL.
+
+    Args:
+        max_bytes (int): max total size of entries, 0 disables the cache
+        max_entries (int): max number of entries, 0 disables the cache
+
+    Attributes:
+        _max_bytes (int): max total size of entries
+        _max_entries (int): max number of entries
+        _entries (OrderedDict): (value, size, deadline) by key, least
+            recently used first
+        _n_bytes (int): total size of entries
+        _epoch (int): number incremented on every invalidation
+        _lock (Lock): lock guarding entries
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        """
+        Constructor method
+
+        :param max_bytes: max total size of entries, 0 disables the cache
+        :type max_bytes: int
+        :param max_entries: max number of entries, 0 disables the cache
+        :type max_entries: int
+        """
+        self._max_bytes = max(0, max_bytes)
+        self._max_entries = max(0, max_entries)
+        self._entries = OrderedDict()
+        self._n_bytes = 0
+        self._epoch = 0
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Checks if the cache can hold entries
+
+        :return: True if the cache is enabled, False otherwise
+        :rtype: bool
+        """
+        return self._max_bytes > 0 and self._max_entries > 0
+
+    @property
+    def epoch(self) -> int:
+        """
+        Number incremented on every invalidation. A value read from the
+        source before an invalidation may be outdated, put skips it.
+
+        :return: epoch
+        :rtype: int
+        """
+        return self._epoch
+
+    @property
+    def n_bytes(self) -> int:
+        """
+        Total size of entries
+
+        :return: size in bytes
+        :rtype: int
+        """
+        return self._n_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> tuple[Any, float] | None:
+        """
+        Gets value and its remaining TTL
+
+        :param key: key
+        :type key: str
+        :return: value and TTL in seconds, None if key is not found
+        :rtype: tuple[Any, float] | None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, size, deadline = entry
+            ttl_left = deadline - time.monotonic()
+            if ttl_left <= 0:
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value, ttl_left
+
+    def put(
+        self, key: str, value: Any, size: int, ttl: float, epoch: int
+    ) -> None:
+        """
+        Puts value, evicts least recently used entries if limits are
+        exceeded
+
+        :param key: key
+        :type key: str
+        :param value: value
+        :type value: Any
+        :param size: size of value in bytes
+        :type size: int
+        :param ttl: TTL in seconds
+        :type ttl: float
+        :param epoch: epoch at the time value was read from the source
+        :type epoch: int
+        """
+        size += len(key) + ENTRY_OVERHEAD
+        if not self.enabled or ttl <= 0 or size > self._max_bytes:
+            return
+
+        with self._lock:
+            if epoch != self._epoch:
+                return
+
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._n_bytes += size
+
+            while (
+                self._n_bytes > self._max_bytes
+                or len(self._entries) > self._max_entries
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *keys: str) -> None:
+        """
+        Removes entries
+
+        :param keys: keys
+        :type keys: str
+        """
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """
+        Removes all entries
+        """
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._n_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        """
+        Removes entry if it exists, the lock must be held
+
+        :param key: key
+        :type key: str
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._n_bytes -= entry[1]
@@ -0,0 +1,97 @@
+from urllib.parse import urlsplit
+
+import redis
+from loguru import logger
+
+from loader import redis_connection
+
+# host: (burst capacity in requests, refill rate in requests per second,
+# max wait in seconds for a token, requests waiting longer are refused)
+RATE_LIMITS = {
+    'newsapi.org': (5, 1.0, 2.0),
+    'text-analysis12.p.rapidapi.com': (10, 10.0, 1.0),
+}
+
+# Takes tokens from a bucket stored in a hash. Tokens may go negative:
+# the caller has reserved its place in the queue and must wait for the
+# returned number of seconds before sending the request. A caller that
+# would wait longer than max wait gets -1 and the bucket is left unchanged.
+TOKEN_BUCKET_SCRIPT = '''
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+tokens = tokens - requested
+local wait = 0
+if tokens < 0 then
+    wait = -tokens / rate
+end
+if wait > max_wait then
+    return '-1'
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1)
+return tostring(wait)
+'''
+
+_script = None
+
+
+def acquire(url: str, n_tokens: int = 1) -> float | None:
+    """
+    Takes tokens from the bucket of the url host. Buckets are shared by all
+    bot processes through Redis. Hosts without a configured limit are not
+    limited. Tokens are not taken if they are not available within the
+    max wait of the host, so that callers fail fast instead of queueing.
+
+    :param url: API url
+    :type url: str
+    :param n_tokens: number of tokens to take
+    :type n_tokens: int
+    :return: time in seconds to wait before sending the request, None if
+        the request must not be sent
+    :rtype: float | None
+    """
+    host = urlsplit(url).netloc.lower()
+    if host not in RATE_LIMITS:
+        return 0
+
+    capacity, rate, max_wait = RATE_LIMITS[host]
+    try:
+        wait_time = float(
+            _get_script()(
+                keys=[f'rate_limit:{host}'],
+                args=[capacity, rate, n_tokens, max_wait],
+            )
+        )
+    except redis.RedisError as exc:
+        logger.warning(f'Rate limiter is unavailable for {host}: {exc}')
+        return 0
+
+    if wait_time < 0:
+        logger.warning(f'Rate limit of {host} exceeded, request refused')
+        return None
+    return wait_time
+
+
+def _get_script():
+    """
+    Gets the token bucket script registered in Redis
+
+    :return: script
+    :rtype: redis.commands.core.Script
+    """
+    global _script
+    if _script is None:
+        _script = redis_connection.register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
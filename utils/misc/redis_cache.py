@@ -1,17 +1,69 @@
+import hashlib
 import json
+import math
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime
-from typing import Any, Iterable
+from functools import partial
+from threading import Event, Lock, Thread
+from typing import Any, Iterable, NamedTuple, Sized
 
+import redis
 from loguru import logger
 
+from config_data import config
 from loader import redis_connection
-from utils.news.utils import date_from_to_str, date_to_to_str
+from utils.misc import cache_codec
+from utils.misc.local_cache import LocalCache
+from utils.news.utils import (
+    date_from_to_str,
+    date_to_to_str,
+    normalize_query,
+)
 
 FRESH_RECORD_TTL = 3600 * 3
 OLD_RECORD_TTL = 3600 * 24 * 7
 FRESH_OLD_THRESHOLD = 3600 * 24 * 2
-
-# prefixes: summary, summary_input, important_news, news_count
+# greater values make early recomputation in get_set happen earlier
+XFETCH_BETA = 1.0
+# lock letting only one worker recompute a key early, 0 disables it
+RECOMPUTE_LOCK_TTL = 30
+# expired values of set_fresh/get_set are served for STALE_TTL seconds more
+# while they are refreshed in the background, 0 disables it
+STALE_TTL = 3600 * 24
+REFRESH_WORKERS = 4
+
+# longer search queries are replaced with their hash in keys
+MAX_KEY_QUERY_LENGTH = 100
+# values with these prefixes are kept in the in-process cache too
+LOCAL_CACHE_PREFIXES = ('summary', 'top_news', 'top_news_item')
+LOCAL_CACHE_CHANNEL = 'local_cache_invalidation'
+LOCAL_CACHE_RECONNECT_INTERVAL = 1
+
+# Sets TTL of a key if it is longer than the current one, like EXPIRE GT,
+# which needs Redis 7. Keys without TTL or not existing are not changed.
+EXTEND_TTL_SCRIPT = '''
+local ttl = redis.call('TTL', KEYS[1])
+if ttl >= 0 and ttl < tonumber(ARGV[1]) then
+    return redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 0
+'''
+
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=REFRESH_WORKERS, thread_name_prefix='cache_refresh'
+)
+
+_local_cache = LocalCache(
+    config.LOCAL_CACHE_MAX_BYTES, config.LOCAL_CACHE_MAX_ENTRIES
+)
+_local_cache_ready = Event()
+_local_cache_listener = None
+_local_cache_listener_lock = Lock()
+_extend_ttl_script = None
+
+# prefixes: summary, summary_input, important_news, news_count, text_summary
 
 
 def exists(key: str) -> bool:
@@ -43,10 +95,11 @@ def all_exist(
     :return: True if all keys exist, False otherwise
     :rtype: bool
     """
-    return all(
-        exists(key_query(prefix, search_query, date_from, date_to))
+    keys = [
+        key_query(prefix, search_query, date_from, date_to)
         for prefix in prefixes
-    )
+    ]
+    return redis_connection.exists(*keys) == len(keys)
 
 
 def key(*key_parts) -> str:
@@ -65,7 +118,8 @@ def key_query(
     prefix: str, search_query: str, date_from: date, date_to: date
 ) -> str:
     """
-    Creates key for query
+    Creates key for query. The search query is normalized, so equivalent
+    queries share keys.
 
     :param prefix: prefix
     :type prefix: str
@@ -78,6 +132,11 @@ def key_query(
     :return: Redis key
     :rtype: str
     """
+    search_query = normalize_query(search_query)
+    if len(search_query) > MAX_KEY_QUERY_LENGTH:
+        digest = hashlib.blake2b(search_query.encode(), digest_size=16)
+        search_query = 'hash_' + digest.hexdigest()
+
     date_from = date_from_to_str(date_from)
     date_to = date_to_to_str(date_to)
     return key(prefix, search_query, date_from, date_to)
@@ -95,6 +154,66 @@ def get(key) -> Any:
     value = redis_connection.get(key)
     if value is None:
         logger.info(f'Key {key} not found in Redis')
+    return _decode(value)
+
+
+def get_many(keys: Iterable[str]) -> list[Any]:
+    """
+    Gets values from Redis in one round trip
+
+    :param keys: keys
+    :type keys: Iterable[str]
+    :return: values, None for keys not found
+    :rtype: list[Any]
+    """
+    keys = list(keys)
+    if not keys:
+        return []
+    return [_decode(value) for value in redis_connection.mget(keys)]
+
+
+def get_with_ttl(key: str) -> tuple[Any, int]:
+    """
+    Gets value and its TTL from Redis in one round trip
+
+    :param key: key
+    :type key: str
+    :return: value and TTL, None and a negative TTL if key is not found
+    :rtype: tuple[Any, int]
+    """
+    local_cache = _get_local_cache() if _is_local(key) else None
+    if local_cache is not None:
+        epoch = local_cache.epoch
+        cached = local_cache.get(key)
+        if cached is not None:
+            value, ttl_left = cached
+            if isinstance(value, CacheEntry):
+                value = value.value
+            return _decode(value), int(ttl_left)
+
+    pipeline = redis_connection.pipeline(transaction=False)
+    pipeline.get(key)
+    pipeline.ttl(key)
+    value, ttl = pipeline.execute()
+
+    if local_cache is not None and value is not None:
+        local_cache.put(key, value, len(value), ttl, epoch)
+
+    return _decode(value), ttl
+
+
+def _decode(value: Any) -> Any:
+    """
+    Decodes value read from Redis, values written before cache_codec was
+    introduced are cast by _cast_type
+
+    :param value: value
+    :type value: Any
+    :return: decoded value
+    :rtype: Any
+    """
+    if cache_codec.is_encoded(value):
+        return cache_codec.decode(value)
     return _cast_type(value)
 
 
@@ -151,18 +270,282 @@ def set(key: str, value: Any, ex: int = None) -> None:
     :param ex: TTL in seconds
     :type ex: int
     """
-    if isinstance(value, (dict, list)):
-        value = json.dumps(value)
-    redis_connection.set(key, value, ex=ex)
+    redis_connection.set(key, cache_codec.encode(value), ex=ex)
+    _invalidate_local(redis_connection, [key])
+
+
+def set_many(
+    values: dict[str, Any],
+    ex: int | dict[str, int] = None,
+    nx: bool = False,
+    extend_ttl: bool = False,
+) -> None:
+    """
+    Sets values to Redis in one round trip. MSET does not support TTL,
+    so SET commands are pipelined.
+
+    :param values: values by keys
+    :type values: dict[str, Any]
+    :param ex: TTL in seconds, the same for all keys or by keys
+    :type ex: int | dict[str, int]
+    :param nx: set only keys that do not exist
+    :type nx: bool
+    :param extend_ttl: extend TTL of existing keys to ex if it is shorter
+    :type extend_ttl: bool
+    """
+    pipeline = redis_connection.pipeline(transaction=False)
+    for value_key, value in values.items():
+        ttl = ex.get(value_key) if isinstance(ex, dict) else ex
+        pipeline.set(value_key, cache_codec.encode(value), ex=ttl, nx=nx)
+        if extend_ttl and ttl:
+            _get_extend_ttl_script()(
+                keys=[value_key], args=[ttl], client=pipeline
+            )
+    _invalidate_local(pipeline, values)
+    pipeline.execute()
+
+
+def _get_extend_ttl_script() -> redis.commands.core.Script:
+    """
+    Gets the script extending TTL registered in Redis
+
+    :return: script
+    :rtype: redis.commands.core.Script
+    """
+    global _extend_ttl_script
+    if _extend_ttl_script is None:
+        _extend_ttl_script = redis_connection.register_script(
+            EXTEND_TTL_SCRIPT
+        )
+    return _extend_ttl_script
+
+
+def set_fresh(key: str, value: Any, ttl: int, delta: float = 0) -> None:
+    """
+    Sets value to Redis. The value is fresh for ttl seconds and is kept
+    STALE_TTL seconds more to be served while it is refreshed.
+
+    :param key: key
+    :type key: str
+    :param value: value
+    :type value: Any
+    :param ttl: time in seconds the value is fresh
+    :type ttl: int
+    :param delta: time in seconds it took to compute the value
+    :type delta: float
+    """
+    set_fresh_many({key: value}, ttl, delta)
+
+
+def set_fresh_many(values: dict[str, Any], ttl: int, delta: float = 0) -> None:
+    """
+    Sets values to Redis in one round trip like set_fresh does
+
+    :param values: values by keys
+    :type values: dict[str, Any]
+    :param ttl: time in seconds the values are fresh
+    :type ttl: int
+    :param delta: time in seconds it took to compute the values
+    :type delta: float
+    """
+    expiry = time.time() + ttl
+    pipeline = redis_connection.pipeline(transaction=False)
+    for value_key, value in values.items():
+        pipeline.set(value_key, cache_codec.encode(value), ex=ttl + STALE_TTL)
+        pipeline.hset(
+            _key_meta(value_key), mapping={'delta': delta, 'expiry': expiry}
+        )
+        pipeline.expire(_key_meta(value_key), ttl + STALE_TTL)
+    _invalidate_local(pipeline, values)
+    pipeline.execute()
+
+
+def extend_fresh(*keys: str, ttl: int) -> None:
+    """
+    Makes values set by set_fresh fresh again for ttl seconds without
+    rewriting them, e.g. when their recomputation gave the same result
+
+    :param keys: keys
+    :type keys: str
+    :param ttl: time in seconds the values are fresh
+    :type ttl: int
+    """
+    expiry = time.time() + ttl
+    pipeline = redis_connection.pipeline(transaction=False)
+    for value_key in keys:
+        pipeline.expire(value_key, ttl + STALE_TTL)
+        pipeline.hset(_key_meta(value_key), 'expiry', expiry)
+        pipeline.expire(_key_meta(value_key), ttl + STALE_TTL)
+    _invalidate_local(pipeline, keys)
+    pipeline.execute()
+
+
+def get_fresh_many(keys: Iterable[str]) -> tuple[list[Any], list[bool]]:
+    """
+    Gets values set by set_fresh or get_set and their staleness in one
+    round trip
+
+    :param keys: keys
+    :type keys: Iterable[str]
+    :return: values (None for keys not found) and flags if they are stale
+    :rtype: tuple[list[Any], list[bool]]
+    """
+    keys = list(keys)
+    pipeline = redis_connection.pipeline(transaction=False)
+    pipeline.mget(keys)
+    for value_key in keys:
+        pipeline.hget(_key_meta(value_key), 'expiry')
+    values, *expiries = pipeline.execute()
+
+    values = [_decode(value) for value in values]
+    stale = [_get_fresh_ttl(expiry, None) <= 0 for expiry in expiries]
+
+    return values, stale
+
+
+def is_stale(key: str) -> bool:
+    """
+    Checks if a value set by set_fresh or get_set is not fresh anymore
+
+    :param key: key
+    :type key: str
+    :return: True if the value is stale
+    :rtype: bool
+    """
+    expiry = redis_connection.hget(_key_meta(key), 'expiry')
+    return _get_fresh_ttl(expiry, None) <= 0
+
+
+def mark_stale(*keys: str) -> None:
+    """
+    Makes values set by set_fresh or get_set stale, so they are refreshed
+    by the next get_set call
+
+    :param keys: keys
+    :type keys: str
+    """
+    meta_keys = [_key_meta(value_key) for value_key in keys]
+    pipeline = redis_connection.pipeline(transaction=False)
+    for meta_key in meta_keys:
+        pipeline.exists(meta_key)
+    meta_exist = pipeline.execute()
+
+    pipeline = redis_connection.pipeline(transaction=False)
+    for meta_key, meta_exists in zip(meta_keys, meta_exist):
+        if meta_exists:
+            pipeline.hset(meta_key, 'expiry', 0)
+    _invalidate_local(pipeline, keys)
+    pipeline.execute()
+
+
+def refresh_in_background(
+    key: str, func: callable, *args, **kwargs
+) -> Future | None:
+    """
+    Runs func refreshing the value of key in a background thread.
+    Only one worker holding the recompute lock of the key refreshes it.
+
+    :param key: key
+    :type key: str
+    :param func: function refreshing the value
+    :type func: callable
+    :param args: func arguments
+    :type args: Any
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :return: refresh future, None if the key is refreshed by another worker
+    :rtype: Future | None
+    """
+    if not _lock_recompute(key):
+        return None
+
+    def refresh() -> None:
+        try:
+            func(*args, **kwargs)
+            logger.debug(f'redis_cache: refreshed {key}')
+        except Exception as exc:
+            logger.error(f'redis_cache: unable to refresh {key}: {exc}')
+        finally:
+            redis_connection.delete(_key_recompute_lock(key))
+
+    logger.debug(f'redis_cache: refreshing stale {key} in the background')
+    return _refresh_executor.submit(refresh)
+
+
+class CacheEntry(NamedTuple):
+    """
+    Value read from Redis with its get_set metadata
+
+    Attributes:
+        key (str): key
+        value (str | None): raw value, None if key does not exist
+        delta (str | None): time in seconds it took to compute the value
+        expiry (str | None): timestamp the value stops being fresh at
+        ttl (int): Redis TTL of the value
+    """
+
+    key: str
+    value: str | None
+    delta: str | None
+    expiry: str | None
+    ttl: int
+
+
+def prefetch(*keys: str) -> list[CacheEntry]:
+    """
+    Reads values for get_set_entry in one round trip
+
+    :param keys: keys
+    :type keys: str
+    :return: entries in the order of keys
+    :rtype: list[CacheEntry]
+    """
+    local_cache = _get_local_cache()
+    entries = {}
+    if local_cache is not None:
+        epoch = local_cache.epoch
+        for value_key in filter(_is_local, keys):
+            cached = local_cache.get(value_key)
+            if cached is not None and isinstance(cached[0], CacheEntry):
+                entry, ttl_left = cached
+                entries[value_key] = entry._replace(ttl=int(ttl_left))
+
+    missing_keys = [
+        value_key for value_key in keys if value_key not in entries
+    ]
+    if missing_keys:
+        pipeline = redis_connection.pipeline(transaction=False)
+        pipeline.mget(missing_keys)
+        for value_key in missing_keys:
+            pipeline.hmget(_key_meta(value_key), 'delta', 'expiry')
+            pipeline.ttl(value_key)
+        values, *metadata = pipeline.execute()
+
+        for value_key, value, (delta, expiry), ttl in zip(
+            missing_keys, values, metadata[::2], metadata[1::2]
+        ):
+            entry = CacheEntry(value_key, value, delta, expiry, ttl)
+            entries[value_key] = entry
+            if local_cache is not None and value is not None:
+                if _is_local(value_key):
+                    local_cache.put(value_key, entry, len(value), ttl, epoch)
+
+    return [entries[value_key] for value_key in keys]
 
 
 def get_set(key: str, ttl: int, func: callable, *args, **kwargs) -> Any:
     """
-    Gets func result or its cache if cached
+    Gets func result or its cache if cached.
+    The time func takes is saved with the result, and the result is
+    recomputed before it expires with probability growing as expiration
+    gets closer (XFetch), so hot keys do not expire under load.
+    Only the worker holding a short recompute lock recomputes a key early,
+    the others get the cached result.
+    A stale result is returned at once and refreshed in the background.
 
     :param key: key
     :type key: str
-    :param ttl: TTL in seconds
+    :param ttl: time in seconds the result is fresh
     :type ttl: int
     :param func: function for caclculating results
     :type func: callable
@@ -173,18 +556,271 @@ def get_set(key: str, ttl: int, func: callable, *args, **kwargs) -> Any:
     :rtype: Any
     :return: result
     """
-    result = None
-    if redis_connection.exists(key):
-        result = get(key)
+    return get_set_entry(prefetch(key)[0], ttl, func, *args, **kwargs)
+
+
+def get_set_entry(
+    entry: CacheEntry,
+    ttl: int,
+    func: callable,
+    *args,
+    refresh: callable = None,
+    **kwargs,
+) -> Any:
+    """
+    Works like get_set for an entry read by prefetch.
+    A cached result is recomputed by refresh if it is given, e.g. when
+    func arguments are read from other keys that may be refreshed
+    meanwhile, so refresh reads them again.
+
+    :param entry: entry read by prefetch
+    :type entry: CacheEntry
+    :param ttl: time in seconds the result is fresh
+    :type ttl: int
+    :param func: function for caclculating results
+    :type func: callable
+    :param args: func arguments
+    :type args: Any
+    :param refresh: function without arguments recomputing a cached
+        result, None results are not cached, defaults to func with args
+    :type refresh: callable
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :rtype: Any
+    :return: result
+    """
+    key = entry.key
+    if entry.value is not None:
+        result = _decode(entry.value)
+        fresh_ttl = _get_fresh_ttl(entry.expiry, entry.ttl)
+        if refresh is None:
+            refresh = partial(func, *args, **kwargs)
+        if fresh_ttl <= 0:
+            refresh_in_background(key, _compute_set, key, ttl, refresh)
+        elif _is_early_recompute(entry.delta, fresh_ttl):
+            if _lock_recompute(key):
+                logger.debug(f'redis_cache: recomputing {key} before expiry')
+                new_result = _compute_set(key, ttl, refresh)
+                redis_connection.delete(_key_recompute_lock(key))
+                if not _is_empty(new_result):
+                    result = new_result
     else:
-        result = func(*args, **kwargs)
-        set(key, result, ex=ttl)
+        result = _compute_set(key, ttl, func, *args, **kwargs)
 
     logger.debug(f'redis_cache: got {key}: {_get_str_for_log(result)}')
 
     return result
 
 
+def _compute_set(key: str, ttl: int, func: callable, *args, **kwargs) -> Any:
+    """
+    Calculates func result and sets it to Redis with the time it took.
+    None and empty results are failures, they are not cached, so the
+    previous value of the key is kept.
+
+    :param key: key
+    :type key: str
+    :param ttl: time in seconds the result is fresh
+    :type ttl: int
+    :param func: function for caclculating results
+    :type func: callable
+    :param args: func arguments
+    :type args: Any
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :rtype: Any
+    :return: result
+    """
+    start_time = time.perf_counter()
+    result = func(*args, **kwargs)
+    if _is_empty(result):
+        logger.warning(f'redis_cache: got no result for {key}, not cached')
+    else:
+        set_fresh(key, result, ttl, time.perf_counter() - start_time)
+
+    return result
+
+
+def _is_empty(value: Any) -> bool:
+    """
+    Checks if value is None or an empty collection or string
+
+    :param value: value
+    :type value: Any
+    :return: True if value is empty
+    :rtype: bool
+    """
+    return value is None or isinstance(value, Sized) and len(value) == 0
+
+
+def _get_fresh_ttl(expiry: str | float | None, ttl_left: int | None) -> float:
+    """
+    Gets time in seconds a value stays fresh. Values without expiry in
+    metadata are fresh for their Redis TTL.
+
+    :param expiry: timestamp the value stops being fresh at
+    :type expiry: str | float | None
+    :param ttl_left: Redis TTL of the value
+    :type ttl_left: int | None
+    :return: time left in seconds, 0 or less if the value is stale
+    :rtype: float
+    """
+    if expiry is None:
+        return 1 if ttl_left is None or ttl_left < 0 else ttl_left
+    return float(expiry) - time.time()
+
+
+def _is_early_recompute(
+    delta: str | float | None, ttl_left: float, beta: float = None
+) -> bool:
+    """
+    Decides whether a cached value should be recomputed before it expires:
+    delta * beta * -ln(random) >= time left to expiration
+
+    :param delta: time in seconds it took to compute the value
+    :type delta: str | float | None
+    :param ttl_left: time left to expiration in seconds
+    :type ttl_left: float
+    :param beta: greater values make recomputation happen earlier,
+        defaults to XFETCH_BETA
+    :type beta: float
+    :return: True if the value should be recomputed
+    :rtype: bool
+    """
+    if delta is None or ttl_left is None or ttl_left < 0:
+        return False
+
+    beta = XFETCH_BETA if beta is None else beta
+    gap = float(delta) * beta * -math.log(1 - random.random())
+
+    return gap >= ttl_left
+
+
+def _lock_recompute(key: str) -> bool:
+    """
+    Tries to take the lock for recomputing a key
+
+    :param key: key
+    :type key: str
+    :return: True if the lock is taken or locking is disabled
+    :rtype: bool
+    """
+    if RECOMPUTE_LOCK_TTL <= 0:
+        return True
+    return bool(
+        redis_connection.set(
+            _key_recompute_lock(key), 1, nx=True, ex=RECOMPUTE_LOCK_TTL
+        )
+    )
+
+
+def _key_meta(value_key: str) -> str:
+    """
+    Creates key for metadata of a get_set value
+
+    :param value_key: key of the value
+    :type value_key: str
+    :return: Redis key
+    :rtype: str
+    """
+    return key('meta', value_key)
+
+
+def _key_recompute_lock(value_key: str) -> str:
+    """
+    Creates key for the recompute lock of a get_set value
+
+    :param value_key: key of the value
+    :type value_key: str
+    :return: Redis key
+    :rtype: str
+    """
+    return key('recompute_lock', value_key)
+
+
+def _is_local(value_key: str) -> bool:
+    """
+    Checks if value is kept in the in-process cache
+
+    :param value_key: key of value
+    :type value_key: str
+    :return: True if value is kept in the in-process cache, False otherwise
+    :rtype: bool
+    """
+    return value_key.split(':', 1)[0] in LOCAL_CACHE_PREFIXES
+
+
+def _get_local_cache() -> LocalCache | None:
+    """
+    Gets the in-process cache, starts listening to invalidations on the
+    first call. The cache is not used while invalidations can be missed.
+
+    :return: in-process cache, None if it is disabled or not ready
+    :rtype: LocalCache | None
+    """
+    global _local_cache_listener
+    if not _local_cache.enabled:
+        return None
+
+    with _local_cache_listener_lock:
+        if _local_cache_listener is None:
+            _local_cache_listener = Thread(
+                target=_listen_invalidations,
+                name='local_cache_invalidation',
+                daemon=True,
+            )
+            _local_cache_listener.start()
+
+    if not _local_cache_ready.is_set():
+        return None
+    return _local_cache
+
+
+def _listen_invalidations() -> None:
+    """
+    Removes values changed by any bot process from the in-process cache.
+    Resubscribes if the connection is lost, the cache is cleared as it may
+    have missed invalidations.
+    """
+    while True:
+        pubsub = redis_connection.pubsub()
+        try:
+            pubsub.subscribe(LOCAL_CACHE_CHANNEL)
+            for message in pubsub.listen():
+                if message['type'] == 'subscribe':
+                    _local_cache.clear()
+                    _local_cache_ready.set()
+                elif message['type'] == 'message':
+                    _local_cache.invalidate(*json.loads(message['data']))
+        except redis.RedisError as exc:
+            logger.warning(f'redis_cache: invalidations are lost: {exc}')
+        finally:
+            _local_cache_ready.clear()
+            _local_cache.clear()
+            pubsub.close()
+        time.sleep(LOCAL_CACHE_RECONNECT_INTERVAL)
+
+
+def _invalidate_local(
+    client: redis.Redis | redis.client.Pipeline, keys: Iterable[str]
+) -> None:
+    """
+    Removes values from in-process caches of all bot processes
+
+    :param client: Redis connection or pipeline to publish invalidation with
+    :type client: redis.Redis | redis.client.Pipeline
+    :param keys: keys of changed values
+    :type keys: Iterable[str]
+    """
+    if not _local_cache.enabled:
+        return
+
+    keys = [value_key for value_key in keys if _is_local(value_key)]
+    if keys:
+        _local_cache.invalidate(*keys)
+        client.publish(LOCAL_CACHE_CHANNEL, json.dumps(keys))
+
+
 def _get_str_for_log(value: Any) -> str:
     """
     Gets string for logging
@@ -0,0 +1,117 @@
+import asyncio
+from typing import Iterable
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from config_data import config
+
+
+class AsyncSessionPool:
+    """
+    Pool of keep-alive aiohttp sessions, one session per host. aiohttp
+    sessions are bound to an event loop, so sessions of the previous loop
+    are closed and the pool is recreated when it is used from another loop.
+
+    Args:
+        pool_size (int): maximum number of connections kept open per host
+
+    Attributes:
+        _pool_size (int): maximum number of connections kept open per host
+        _sessions (dict[str, aiohttp.ClientSession]): sessions by host
+        _loop (asyncio.AbstractEventLoop | None): loop the sessions belong to
+    """
+
+    def __init__(self, pool_size: int):
+        """
+        Constructor method
+
+        :param pool_size: maximum number of connections kept open per host
+        :type pool_size: int
+        :raises ValueError: if pool size is less than 1
+        """
+        if pool_size < 1:
+            raise ValueError('Pool size must be greater than 0')
+        self._pool_size = pool_size
+        self._sessions = {}
+        self._loop = None
+
+    @property
+    def pool_size(self) -> int:
+        """
+        Maximum number of connections kept open per host
+
+        :return: pool size
+        :rtype: int
+        """
+        return self._pool_size
+
+    async def get(self, url: str) -> aiohttp.ClientSession:
+        """
+        Gets a session for the host of the url, creates it if needed.
+        Must be awaited in a running event loop.
+
+        :param url: url
+        :type url: str
+        :return: session
+        :rtype: aiohttp.ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            old_loop, self._loop = self._loop, loop
+            sessions, self._sessions = self._sessions, {}
+            await _close_sessions(sessions.values(), old_loop)
+
+        host = _get_host(url)
+        session = self._sessions.get(host)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self._pool_size)
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[host] = session
+
+        return session
+
+    async def close(self) -> None:
+        """
+        Closes all sessions and their connections
+        """
+        sessions, self._sessions = self._sessions, {}
+        await _close_sessions(sessions.values(), self._loop)
+
+
+async def _close_sessions(
+    sessions: Iterable[aiohttp.ClientSession],
+    loop: asyncio.AbstractEventLoop | None,
+) -> None:
+    """
+    Closes sessions. Sessions of a loop running in another thread are
+    closed in that loop.
+
+    :param sessions: sessions
+    :type sessions: Iterable[aiohttp.ClientSession]
+    :param loop: loop the sessions belong to
+    :type loop: asyncio.AbstractEventLoop | None
+    """
+    current_loop = asyncio.get_running_loop()
+    for session in sessions:
+        if loop is not None and loop is not current_loop and loop.is_running():
+            await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+            )
+        else:
+            await session.close()
+
+
+def _get_host(url: str) -> str:
+    """
+    Gets host part of the url in lower case
+
+    :param url: url
+    :type url: str
+    :return: host
+    :rtype: str
+    """
+    return urlsplit(url).netloc.lower()
+
+
+async_session_pool = AsyncSessionPool(config.HTTP_POOL_SIZE)
@@ -0,0 +1,232 @@
+import builtins
+import json
+import time
+from threading import Event, Lock
+from typing import Any
+
+import redis
+import requests
+from loguru import logger
+
+from loader import redis_connection
+
+LOCK_TTL = 60  # max time in seconds the leader may spend computing
+# max time in seconds to wait for the leader, then the result is computed
+WAIT_TIMEOUT = 60
+POLL_INTERVAL = 1
+RESULT_TTL = 10
+
+
+class _Call:
+    """
+    In-flight call
+
+    Attributes:
+        done (Event): set when the call is finished
+        result (Any): result of the call
+        exception (Exception | None): exception raised by the call
+    """
+
+    def __init__(self):
+        """
+        Constructor method
+        """
+        self.done = Event()
+        self.result = None
+        self.exception = None
+
+
+_calls = {}
+_calls_lock = Lock()
+
+
+def do(key: str, func: callable, *args, **kwargs) -> Any:
+    """
+    Executes func only once for concurrent callers with the same key.
+    Callers in the same process wait for the result of the first caller.
+    Callers in other processes wait for the result published to Redis by the
+    process holding the key lock. They get the result decoded from JSON, so
+    func must return a JSON serializable value. Callers waiting longer than
+    WAIT_TIMEOUT execute func on their own.
+
+    :param key: key of the call
+    :type key: str
+    :param func: function for calculating results
+    :type func: callable
+    :param args: func arguments
+    :type args: Any
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :return: result
+    :rtype: Any
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _Call()
+            _calls[key] = call
+
+    if not is_leader:
+        logger.debug(f'singleflight: waiting for {key}')
+        if not call.done.wait(WAIT_TIMEOUT):
+            logger.warning(f'singleflight: {key} timed out, computing it')
+            return func(*args, **kwargs)
+        if call.exception is not None:
+            raise call.exception
+        return call.result
+
+    try:
+        call.result = _do_shared(key, func, *args, **kwargs)
+    except Exception as exc:
+        call.exception = exc
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+    return call.result
+
+
+def _do_shared(key: str, func: callable, *args, **kwargs) -> Any:
+    """
+    Executes func if this process holds the key lock in Redis and publishes
+    its result, otherwise waits for the result of the lock holder.
+    Executes func on its own if Redis is unavailable or the lock holder
+    does not publish the result in time.
+
+    :param key: key of the call
+    :type key: str
+    :param func: function for calculating results
+    :type func: callable
+    :param args: func arguments
+    :type args: Any
+    :param kwargs: func keyword arguments
+    :type kwargs: Any
+    :return: result
+    :rtype: Any
+    """
+    lock = redis_connection.lock(
+        f'singleflight_lock:{key}', timeout=LOCK_TTL, blocking=False
+    )
+    try:
+        is_locked = lock.acquire()
+    except redis.RedisError as exc:
+        logger.warning(f'singleflight: Redis is unavailable: {exc}')
+        return func(*args, **kwargs)
+
+    if not is_locked:
+        found, result = _wait(key)
+        if found:
+            return result
+        return func(*args, **kwargs)
+
+    try:
+        # the result of the previous call must not be taken for this one
+        try:
+            redis_connection.delete(f'singleflight_result:{key}')
+        except redis.RedisError as exc:
+            logger.warning(f'singleflight: Redis is unavailable: {exc}')
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            _publish(
+                key, {'error': str(exc), 'error_type': type(exc).__name__}
+            )
+            raise
+        _publish(key, {'result': result})
+    finally:
+        try:
+            lock.release()
+        except redis.RedisError:
+            pass
+
+    return result
+
+
+def _publish(key: str, message: dict) -> None:
+    """
+    Publishes a result of the call for callers in other processes
+
+    :param key: key of the call
+    :type key: str
+    :param message: {'result': Any} or {'error': str, 'error_type': str}
+    :type message: dict
+    """
+    payload = json.dumps(message)
+    try:
+        pipeline = redis_connection.pipeline()
+        pipeline.set(f'singleflight_result:{key}', payload, ex=RESULT_TTL)
+        pipeline.publish(f'singleflight:{key}', payload)
+        pipeline.execute()
+    except redis.RedisError as exc:
+        logger.warning(f'singleflight: unable to publish {key}: {exc}')
+
+
+def _wait(key: str) -> tuple[bool, Any]:
+    """
+    Waits for a result of the call published by another process
+
+    :param key: key of the call
+    :type key: str
+    :raises Exception: exception of the call if it failed in another
+        process, see _get_error
+    :return: True and result if it is published, False and None otherwise
+    :rtype: tuple[bool, Any]
+    """
+    logger.debug(f'singleflight: waiting for {key} in another process')
+
+    payload = None
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+    try:
+        pubsub.subscribe(f'singleflight:{key}')
+        while payload is None and time.monotonic() < deadline:
+            payload = redis_connection.get(f'singleflight_result:{key}')
+            if payload is not None:
+                break
+            message = pubsub.get_message(timeout=POLL_INTERVAL)
+            if message is not None and message['type'] == 'message':
+                payload = message['data']
+            elif not redis_connection.exists(f'singleflight_lock:{key}'):
+                payload = redis_connection.get(f'singleflight_result:{key}')
+                break
+    except redis.RedisError as exc:
+        logger.warning(f'singleflight: Redis is unavailable: {exc}')
+    finally:
+        pubsub.close()
+
+    if payload is None:
+        return False, None
+
+    message = json.loads(payload)
+    if 'error' in message:
+        raise _get_error(message['error'], message.get('error_type'))
+    return True, message['result']
+
+
+def _get_error(error: str, error_type: str | None) -> Exception:
+    """
+    Recreates an exception raised by the call in another process.
+    Built-in and requests exceptions keep their class, others become
+    requests.RequestException.
+
+    :param error: exception message
+    :type error: str
+    :param error_type: exception class name
+    :type error_type: str | None
+    :return: exception
+    :rtype: Exception
+    """
+    error_class = getattr(requests.exceptions, error_type or '', None)
+    if error_class is None:
+        error_class = getattr(builtins, error_type or '', None)
+
+    if isinstance(error_class, type) and issubclass(error_class, Exception):
+        try:
+            return error_class(error)
+        except TypeError:
+            pass
+    return requests.RequestException(error)
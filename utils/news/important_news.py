@@ -1,14 +1,41 @@
+import re
+from datetime import datetime
 from typing import Iterable
 
+import numpy as np
+
 from config_data import config
 
+BM25_K1 = 1.2
+BM25_B = 0.75
+# weights of text fields in relevance, fields not listed have weight 1
+FIELD_WEIGHTS = {
+    config.NEWS_TITLE: 3.0,
+    config.NEWS_DESCRIPTION: 1.5,
+    config.NEWS_BODY: 1.0,
+}
+# score = relevance + RECENCY_WEIGHT * recency + API_ORDER_WEIGHT * api order,
+# every term is between 0 and 1
+RECENCY_WEIGHT = 0.3
+RECENCY_HALF_LIFE = 2 * 24 * 60 * 60  # seconds
+API_ORDER_WEIGHT = 0.2  # news are requested with sortBy=relevancy
+# score of the n-th news item of the same source is multiplied by
+# SOURCE_DIVERSITY_DECAY ** n
+SOURCE_DIVERSITY_DECAY = 0.7
+
+_TOKEN_REGEX = re.compile(r'\w+')
+
 
 def get_important_news(
     search_query: str, news: list[dict], text_keys: str | Iterable
 ) -> dict[dict]:
     """
     Returns most important news ordered by descending importance in format:
-    {id: {importance: float, news: dict}, ...}
+    {id: {importance: int, news: dict}, ...}. News are ranked by BM25
+    relevance of text_keys to search_query, recency and their order in API
+    response. News of the same source are penalized to make top news
+    diverse. Importance is n_news for the most important news item and 1
+    for the least important one.
 
     :param search_query: a search string
     :type search_query: str
@@ -26,11 +53,147 @@ def get_important_news(
         text_keys = [text_keys]
 
     n_news = len(news)
+    api_order = 1 - np.arange(n_news) / n_news
+    scores = (
+        _get_relevance(search_query, news, text_keys)
+        + RECENCY_WEIGHT * _get_recency(news)
+        + API_ORDER_WEIGHT * api_order
+    )
+    scores *= _get_diversity_penalty(news, scores)
+    order = np.argsort(-scores, kind='stable')
+
     important_news = {}
-    for i_item, news_item in enumerate(news):
+    for i_item, i_news in enumerate(order.tolist()):
+        news_item = news[i_news]
         important_news[news_item[config.NEWS_ID]] = {
             'importance': n_news - i_item,
             'news': news_item,
         }
 
     return important_news
+
+
+def _get_relevance(
+    search_query: str, news: list[dict], text_keys: Iterable[str]
+) -> np.ndarray:
+    """
+    Calculates BM25F relevance of news to search query: term frequencies
+    of fields are normalized by field lengths and summed with
+    FIELD_WEIGHTS. Only query terms are counted, as whole words, and
+    field lengths are counted in whitespace separated words.
+
+    :param search_query: a search string
+    :type search_query: str
+    :param news: news
+    :type news: list[dict]
+    :param text_keys: keys to get text from
+    :type text_keys: Iterable[str]
+    :return: relevance from 0 to 1 of every news item
+    :rtype: np.ndarray
+    """
+    n_news = len(news)
+    terms = list(dict.fromkeys(_tokenize(search_query)))
+    if not terms:
+        return np.zeros(n_news)
+
+    # a literal prefix is found fast, the word start is checked after it
+    term_regexes = [
+        re.compile(re.escape(term) + r'\b(?<!\w' + re.escape(term) + ')')
+        for term in terms
+    ]
+    weighted_tf = np.zeros((n_news, len(terms)))
+    for key in text_keys:
+        texts = [(news_item.get(key) or '').casefold() for news_item in news]
+        lengths = np.fromiter(map(len, map(str.split, texts)), float, n_news)
+        tf = np.empty((n_news, len(terms)))
+        for i_term, term_regex in enumerate(term_regexes):
+            tf[:, i_term] = np.fromiter(
+                map(len, map(term_regex.findall, texts)), float, n_news
+            )
+        avg_length = lengths.mean() or 1
+        norms = 1 - BM25_B + BM25_B * lengths / avg_length
+        weighted_tf += FIELD_WEIGHTS.get(key, 1.0) * tf / norms[:, None]
+
+    doc_freqs = np.count_nonzero(weighted_tf, axis=0)
+    idf = np.log(1 + (n_news - doc_freqs + 0.5) / (doc_freqs + 0.5))
+    relevance = (weighted_tf / (BM25_K1 + weighted_tf)) @ idf
+
+    max_relevance = relevance.max()
+    if max_relevance > 0:
+        relevance /= max_relevance
+    return relevance
+
+
+def _tokenize(text: str | None) -> list[str]:
+    """
+    Splits text to case folded words
+
+    :param text: text
+    :type text: str | None
+    :return: words
+    :rtype: list[str]
+    """
+    return _TOKEN_REGEX.findall((text or '').casefold())
+
+
+def _get_recency(news: list[dict]) -> np.ndarray:
+    """
+    Calculates recency of news: 1 for the newest news item, halves every
+    RECENCY_HALF_LIFE. News with unknown publication time get 0.
+
+    :param news: news
+    :type news: list[dict]
+    :return: recency from 0 to 1 of every news item
+    :rtype: np.ndarray
+    """
+    timestamps = np.full(len(news), np.nan)
+    for i, news_item in enumerate(news):
+        published_at = news_item.get(config.NEWS_PUBLISHED_AT)
+        if not published_at:
+            continue
+        try:
+            timestamps[i] = datetime.fromisoformat(
+                published_at[:19]
+            ).timestamp()
+        except ValueError:
+            pass
+
+    if np.isnan(timestamps).all():
+        return np.zeros(len(news))
+
+    ages = np.nanmax(timestamps) - timestamps
+    return np.nan_to_num(0.5 ** (ages / RECENCY_HALF_LIFE))
+
+
+def _get_diversity_penalty(news: list[dict], scores: np.ndarray) -> np.ndarray:
+    """
+    Calculates score multipliers penalizing news of the same source: the
+    n-th best news item of a source gets SOURCE_DIVERSITY_DECAY ** n.
+    News of unknown sources are not penalized.
+
+    :param news: news
+    :type news: list[dict]
+    :param scores: scores of news
+    :type scores: np.ndarray
+    :return: multiplier of every news item
+    :rtype: np.ndarray
+    """
+    source_ids = {}
+    sources = np.empty(len(news), dtype=int)
+    for i, news_item in enumerate(news):
+        source = news_item.get(config.NEWS_SOURCE)
+        if isinstance(source, dict):
+            source = source.get('name')
+        if source is None:
+            source = i  # a separate source for every news item
+        sources[i] = source_ids.setdefault(source, len(source_ids))
+
+    order = np.lexsort((-scores, sources))
+    sorted_sources = sources[order]
+    is_first = np.r_[True, sorted_sources[1:] != sorted_sources[:-1]]
+    positions = np.arange(len(news))
+    first_positions = np.maximum.accumulate(np.where(is_first, positions, 0))
+
+    penalty = np.empty(len(news))
+    penalty[order] = SOURCE_DIVERSITY_DECAY ** (positions - first_positions)
+    return penalty
@@ -0,0 +1,171 @@
+import re
+import zlib
+from typing import Iterable
+
+import numpy as np
+
+SHINGLE_SIZE = 3  # words
+NUM_PERM = 64
+# LSH finds candidates with similarity above ~(1 / BANDS) ** (1 / ROWS),
+# 0.5 for 16 bands of 4 rows
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# min estimated Jaccard similarity of shingles of near duplicates
+SIMILARITY_THRESHOLD = 0.6
+
+# permutations of 32-bit hashes: (a * x + b) mod 2 ** 32 with odd a,
+# 32-bit arithmetic is several times faster than 64-bit one
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint32) | 1
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint32)
+_SHINGLE_COEFFS = _rng.integers(0, 1 << 32, SHINGLE_SIZE, dtype=np.uint32)
+_BAND_COEFFS = _rng.integers(0, 1 << 64, ROWS, dtype=np.uint64) | 1
+_TOKEN_REGEX = re.compile(r'\w+')
+
+
+def get_unique_news(
+    news: Iterable[dict],
+    text_keys: str | Iterable[str],
+    n_max: int | None = None,
+) -> list[dict]:
+    """
+    Returns news without near duplicates, e.g. wire stories republished with
+    slightly different wording. The first news item of near duplicates is
+    kept. Candidates are found with MinHash LSH in near linear time.
+
+    :param news: news ordered by priority
+    :type news: Iterable[dict]
+    :param text_keys: keys to get text from
+    :type text_keys: str | Iterable[str]
+    :param n_max: max number of news to return, None for no limit
+    :type n_max: int | None
+    :return: unique news
+    :rtype: list[dict]
+    """
+    if isinstance(text_keys, str):
+        text_keys = [text_keys]
+    news = list(news)
+    texts = [
+        ' '.join(news_item.get(key) or '' for key in text_keys)
+        for news_item in news
+    ]
+    signatures = get_signatures(texts)
+
+    unique_news = []
+    buckets = [{} for _ in range(BANDS)]
+    all_band_keys = _get_band_keys(signatures).tolist()
+    for i_news, (news_item, band_keys) in enumerate(zip(news, all_band_keys)):
+        if n_max is not None and len(unique_news) >= n_max:
+            break
+
+        if _has_near_duplicate(i_news, band_keys, buckets, signatures):
+            continue
+
+        unique_news.append(news_item)
+        for bucket, band_key in zip(buckets, band_keys):
+            bucket.setdefault(band_key, []).append(i_news)
+
+    return unique_news
+
+
+def get_signatures(texts: list[str]) -> np.ndarray:
+    """
+    Calculates MinHash signatures of shingles of texts, a shingle is
+    SHINGLE_SIZE consecutive words. Words are hashed once, shingle hashes
+    are combined from word hashes with NumPy. A text shorter than
+    SHINGLE_SIZE words is a single shingle.
+
+    :param texts: texts
+    :type texts: list[str]
+    :return: signatures, a row of NUM_PERM hashes for every text
+    :rtype: np.ndarray
+    """
+    if not texts:
+        return np.empty((0, NUM_PERM), dtype=np.uint32)
+
+    # words of every text are followed by zero hashes, so shingles do not
+    # cross texts and short texts are padded
+    padding = (0,) * SHINGLE_SIZE
+    word_hashes, n_words = [], []
+    for text in texts:
+        words = _TOKEN_REGEX.findall(text.casefold())
+        n_words.append(len(words))
+        word_hashes.extend(map(zlib.crc32, map(str.encode, words)))
+        word_hashes.extend(padding)
+
+    word_hashes = np.array(word_hashes, dtype=np.uint32)
+    n_words = np.array(n_words)
+    text_starts = np.cumsum(n_words + len(padding)) - n_words - len(padding)
+    n_shingles = np.maximum(n_words - SHINGLE_SIZE + 1, 1)
+    shingle_offsets = np.cumsum(n_shingles) - n_shingles
+    shingle_starts = np.repeat(text_starts - shingle_offsets, n_shingles)
+    shingle_starts += np.arange(n_shingles.sum())
+
+    shingle_hashes = np.zeros(len(shingle_starts), dtype=np.uint32)
+    for i, coeff in enumerate(_SHINGLE_COEFFS):
+        shingle_hashes += coeff * word_hashes[shingle_starts + i]
+    _mix(shingle_hashes)
+
+    permuted = np.multiply.outer(_PERM_A, shingle_hashes)
+    permuted += _PERM_B[:, None]
+    return np.minimum.reduceat(permuted, shingle_offsets, axis=1).T
+
+
+def _mix(hashes: np.ndarray) -> None:
+    """
+    Mixes bits of 32-bit hashes in place, so that the high bits compared by
+    MinHash depend on all bits of the hashes
+
+    :param hashes: hashes
+    :type hashes: np.ndarray
+    """
+    hashes ^= hashes >> np.uint32(16)
+    hashes *= np.uint32(0x45D9F3B)
+    hashes ^= hashes >> np.uint32(16)
+
+
+def _get_band_keys(signatures: np.ndarray) -> np.ndarray:
+    """
+    Hashes every band of ROWS signature rows to a single key
+
+    :param signatures: signatures
+    :type signatures: np.ndarray
+    :return: keys, a row of BANDS keys for every signature
+    :rtype: np.ndarray
+    """
+    bands = signatures.reshape(len(signatures), BANDS, ROWS)
+    return (bands.astype(np.uint64) * _BAND_COEFFS).sum(axis=2)
+
+
+def _has_near_duplicate(
+    i_news: int,
+    band_keys: list[int],
+    buckets: list[dict],
+    signatures: np.ndarray,
+) -> bool:
+    """
+    Checks if a kept news item is similar to a news item
+
+    :param i_news: index of news item
+    :type i_news: int
+    :param band_keys: band keys of news item
+    :type band_keys: list[int]
+    :param buckets: lists of indexes of kept news by band key, a dict for
+        every band
+    :type buckets: list[dict]
+    :param signatures: signatures of news
+    :type signatures: np.ndarray
+    :return: True if there is a near duplicate, False otherwise
+    :rtype: bool
+    """
+    candidates = {
+        i
+        for bucket, band_key in zip(buckets, band_keys)
+        for i in bucket.get(band_key, ())
+    }
+    signature = signatures[i_news]
+    return any(
+        np.count_nonzero(signatures[i] == signature) / NUM_PERM
+        >= SIMILARITY_THRESHOLD
+        for i in candidates
+    )
@@ -1,8 +1,14 @@
-from datetime import date
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import zip_longest
 from typing import Iterable, Tuple
 
+from loguru import logger
+
 from config_data import config
 from utils.misc import redis_cache as cache
+from utils.misc import singleflight
 from utils.news import news_api
 from utils.news.important_news import get_important_news
 from utils.news.summary_input import get_summary_input
@@ -12,6 +18,10 @@ IMPORTANT_NEWS_KEYS = (
     config.NEWS_DESCRIPTION,
     config.NEWS_BODY,
 )
+# caches calculated from news count, important news and summary input
+DERIVED_KEY_PREFIXES = ('summary', 'top_news')
+# news count of a full load, news updated incrementally are capped at it
+MAX_NEWS_COUNT = news_api.MAX_NEWS
 
 
 def get_news_semimanufactures(
@@ -21,6 +31,9 @@ def get_news_semimanufactures(
     Loads news from API and calculates news count, summary input
     and new ordered by importance and caches them to Redis.
     If these entities are already cached loads them from Redis.
+    If they are stale they are returned at once and refreshed in the
+    background. API gets the search query as entered, caches are shared by
+    equivalent queries, see cache.key_query.
 
     :param search_query: search query
     :type search_query: str
@@ -31,53 +44,451 @@ def get_news_semimanufactures(
     :return: news count, summary input, important news ordered by importance
     :rtype: Tuple[int, str, dict[dict]]
     """
-    KEY_PREFIXES = ('news_count', 'important_news')
+    KEY_PREFIXES = ('news_count', 'important_news', 'summary_input')
 
-    news = None
-    if not cache.all_exist(KEY_PREFIXES, search_query, date_from, date_to):
-        news, n_news_total = news_api.get_news(
-            search_query, date_from, date_to
+    keys = [
+        cache.key_query(prefix, search_query, date_from, date_to)
+        for prefix in KEY_PREFIXES
+    ]
+    values, stale = cache.get_fresh_many(keys)
+    n_news_total, important_news, summary_input = values
+
+    if n_news_total is None or important_news is None:
+        n_news_total, important_news = singleflight.do(
+            cache.key_query('news', search_query, date_from, date_to),
+            _load_news,
+            search_query,
+            date_from,
+            date_to,
+        )
+        summary_input = None
+    elif stale[1]:
+        cache.refresh_in_background(
+            keys[1], _refresh_news, search_query, date_from, date_to
+        )
+
+    if n_news_total == 0:
+        return 0, '', {}
+
+    if summary_input is None:
+        summary_input = _calc_summary_input(
+            search_query, date_from, date_to, important_news
+        )
+
+    return n_news_total, summary_input, important_news
+
+
+def _load_news(
+    search_query: str, date_from: date, date_to: date
+) -> Tuple[int, dict[dict]]:
+    """
+    Loads news from API, orders them by importance and caches news count
+    and important news to Redis
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :return: news count, important news ordered by importance
+    :rtype: Tuple[int, dict[dict]]
+    """
+    news, n_news_total = _get_news(search_query, date_from, date_to)
+
+    important_news = get_important_news(
+        search_query, news, IMPORTANT_NEWS_KEYS
+    )
+    _cache_news(search_query, date_from, date_to, n_news_total, important_news)
+
+    return n_news_total, important_news
+
+
+def _cache_news(
+    search_query: str,
+    date_from: date,
+    date_to: date,
+    n_news_total: int,
+    important_news: dict[dict],
+) -> None:
+    """
+    Caches news count and important news to Redis
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :param n_news_total: news count
+    :type n_news_total: int
+    :param important_news: important news ordered by importance
+    :type important_news: dict[dict]
+    """
+    values = {
+        'news_count': n_news_total,
+        'important_news': important_news,
+    }
+    cache.set_fresh_many(
+        {
+            cache.key_query(prefix, search_query, date_from, date_to): value
+            for prefix, value in values.items()
+        },
+        cache.calc_ttl(date_to),
+    )
+
+
+def _update_news(
+    search_query: str, date_from: date, date_to: date
+) -> Tuple[bool, int, dict[dict]] | None:
+    """
+    Requests from API only news published after the newest cached news
+    item and merges them into cached important news. New news are added to
+    day shards too if config.NEWS_DAY_SHARDS is set.
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :return: True if there are new news, news count and important news;
+        None if there are no cached news to update
+    :rtype: Tuple[bool, int, dict[dict]] | None
+    """
+    n_news_total, important_news = cache.get_many(
+        cache.key_query(prefix, search_query, date_from, date_to)
+        for prefix in ('news_count', 'important_news')
+    )
+    if not important_news or n_news_total is None:
+        return None
+
+    published_after = _get_newest_published_at(important_news)
+    if published_after is None or published_after.date() < date_from:
+        return None
+
+    news, n_news_new = news_api.get_news(
+        search_query, published_after, date_to
+    )
+    new_news = [
+        news_item
+        for news_item in news
+        if news_item[config.NEWS_ID] not in important_news
+    ]
+    n_news_new -= len(news) - len(new_news)
+    logger.debug(
+        f'got {len(new_news)} new news of {len(news)} published after '
+        f'{published_after} for {search_query}'
+    )
+    if not new_news:
+        return False, n_news_total, important_news
+
+    if config.NEWS_DAY_SHARDS:
+        _add_to_day_shards(search_query, new_news)
+
+    news = _merge_news(
+        list(important_news_to_iterator(important_news)),
+        new_news,
+        MAX_NEWS_COUNT,
+    )
+    important_news = get_important_news(
+        search_query, news, IMPORTANT_NEWS_KEYS
+    )
+    n_news_total += max(0, n_news_new)
+
+    return True, n_news_total, important_news
+
+
+def _get_newest_published_at(important_news: dict[dict]) -> datetime | None:
+    """
+    Gets publication time of the newest news item
+
+    :param important_news: important news
+    :type important_news: dict[dict]
+    :return: publication time in UTC, None if it is unknown
+    :rtype: datetime | None
+    """
+    published_at = max(
+        (
+            news_item.get(config.NEWS_PUBLISHED_AT) or ''
+            for news_item in important_news_to_iterator(important_news)
+        ),
+        default='',
+    )
+    return _parse_published_at(published_at)
+
+
+def _parse_published_at(published_at: str | None) -> datetime | None:
+    """
+    Parses publication time of a news item
+
+    :param published_at: publication time in ISO 8601 format
+    :type published_at: str | None
+    :return: publication time in UTC, None if it is unknown
+    :rtype: datetime | None
+    """
+    try:
+        return datetime.strptime(
+            (published_at or '')[:19], '%Y-%m-%dT%H:%M:%S'
         )
+    except ValueError:
+        return None
 
-        cache.set(
-            cache.key_query('news_count', search_query, date_from, date_to),
-            n_news_total,
-            cache.calc_ttl(date_to),
+
+def _add_to_day_shards(search_query: str, news: list[dict]) -> None:
+    """
+    Adds news to cached news of their publication days, see
+    _get_news_by_days. Days without cached news are skipped, they are
+    requested from API in full when needed.
+
+    :param search_query: search query
+    :type search_query: str
+    :param news: news
+    :type news: list[dict]
+    """
+    news_by_day = defaultdict(list)
+    for news_item in news:
+        published_at = _parse_published_at(
+            news_item.get(config.NEWS_PUBLISHED_AT)
         )
+        if published_at is not None:
+            news_by_day[published_at.date()].append(news_item)
+    if not news_by_day:
+        return
+
+    days = list(news_by_day)
+    keys = [
+        cache.key_query('news_day', search_query, day, day) for day in days
+    ]
+    shards = {}
+    for day, day_key, shard in zip(days, keys, cache.get_many(keys)):
+        if shard is None:
+            continue
+        ids = {news_item[config.NEWS_ID] for news_item in shard['news']}
+        day_news = [
+            news_item
+            for news_item in news_by_day[day]
+            if news_item[config.NEWS_ID] not in ids
+        ]
+        if day_news:
+            shards[day_key] = {
+                **shard,
+                'news': shard['news'] + day_news,
+                'count': shard['count'] + len(day_news),
+            }
+            logger.debug(f'added {len(day_news)} news to {day_key}')
 
-        important_news = get_important_news(
-            search_query, news, IMPORTANT_NEWS_KEYS
+    if shards:
+        cache.set_many(
+            shards,
+            ex={
+                day_key: cache.calc_ttl(day)
+                for day, day_key in zip(days, keys)
+                if day_key in shards
+            },
         )
-        cache.set(
-            cache.key_query(
-                'important_news', search_query, date_from, date_to
-            ),
-            important_news,
-            cache.calc_ttl(date_to),
+
+
+def _merge_news(
+    news: list[dict], new_news: list[dict], max_count: int = None
+) -> list[dict]:
+    """
+    Merges cached news ordered by importance and new news in API order,
+    i.e. by newsapi relevancy. Each news item keeps its relative position
+    in its list, so the merged order is the API order for ranking.
+
+    :param news: news ordered by importance
+    :type news: list[dict]
+    :param new_news: new news in API order
+    :type new_news: list[dict]
+    :param max_count: max count of merged news, the least important ones
+        are dropped, defaults to no limit
+    :type max_count: int
+    :return: merged news
+    :rtype: list[dict]
+    """
+    positions = [
+        (i / len(news), news_item) for i, news_item in enumerate(news)
+    ]
+    positions += [
+        (i / len(new_news), news_item) for i, news_item in enumerate(new_news)
+    ]
+    positions.sort(key=lambda position: position[0])
+    return [news_item for _, news_item in positions[:max_count]]
+
+
+def _get_news(
+    search_query: str, date_from: date, date_to: date
+) -> Tuple[list[dict], int]:
+    """
+    Gets news from API, by day shards if config.NEWS_DAY_SHARDS is set
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :return: news and news count
+    :rtype: Tuple[list[dict], int]
+    """
+    if config.NEWS_DAY_SHARDS:
+        return _get_news_by_days(search_query, date_from, date_to)
+    return news_api.get_news(search_query, date_from, date_to)
+
+
+def _get_news_by_days(
+    search_query: str, date_from: date, date_to: date
+) -> Tuple[list[dict], int]:
+    """
+    Gets news for every day of the range and joins them. News of a day are
+    cached separately, so only days without cached news are requested
+    from API, all at once. Days past the threshold of calc_ttl are cached
+    for long, recent days are refreshed with the short TTL. Days in the
+    future are skipped. MAX_NEWS_COUNT is split across days, so the range
+    gets about as many news as it gets without shards. Cached days with
+    fewer news than their share are requested again. News of days are
+    interleaved by their API order within a day, newest day first, so that
+    the position of a news item means the same for ranking as in a load
+    without shards.
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :return: news interleaved by day and news count
+    :rtype: Tuple[list[dict], int]
+    """
+    date_to = min(date_to, datetime.utcnow().date())
+    days = [
+        date_from + timedelta(days=i)
+        for i in range((date_to - date_from).days + 1)
+    ]
+    keys = [
+        cache.key_query('news_day', search_query, day, day) for day in days
+    ]
+    shards = cache.get_many(keys)
+    max_day_news = math.ceil(MAX_NEWS_COUNT / max(1, len(days)))
+
+    missing = [
+        i
+        for i, shard in enumerate(shards)
+        if shard is None
+        or shard.get('max_news', MAX_NEWS_COUNT) < max_day_news
+    ]
+    if missing:
+        day_news = news_api.get_news_of_days(
+            search_query, [days[i_day] for i_day in missing], max_day_news
         )
-    else:
-        n_news_total = cache.get(
-            cache.key_query('news_count', search_query, date_from, date_to)
+        for i_day, (news, n_news_total) in zip(missing, day_news):
+            shards[i_day] = {
+                'news': news,
+                'count': n_news_total,
+                'max_news': max_day_news,
+            }
+        cache.set_many(
+            {keys[i_day]: shards[i_day] for i_day in missing},
+            ex={keys[i_day]: cache.calc_ttl(days[i_day]) for i_day in missing},
         )
 
-        important_news = cache.get(
-            cache.key_query('important_news', search_query, date_from, date_to)
+    news = [
+        news_item
+        for same_rank_news in zip_longest(
+            *(shard['news'][:max_day_news] for shard in reversed(shards))
         )
+        for news_item in same_rank_news
+        if news_item is not None
+    ]
+    return news, sum(shard['count'] for shard in shards)
 
-    if n_news_total == 0:
-        return 0, '', {}
 
-    key = cache.key_query('summary_input', search_query, date_from, date_to)
-    if cache.exists(key):
-        summary_input = cache.get(key)
+def _calc_summary_input(
+    search_query: str,
+    date_from: date,
+    date_to: date,
+    important_news: dict[dict],
+) -> str:
+    """
+    Calculates summary input and caches it to Redis
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :param important_news: important news ordered by importance
+    :type important_news: dict[dict]
+    :return: summary input
+    :rtype: str
+    """
+    news_for_summary = important_news_to_iterator(important_news)
+    importances = {
+        news_id: item['importance'] for news_id, item in important_news.items()
+    }
+    summary_input = get_summary_input(
+        news_for_summary, config.NEWS_DESCRIPTION, importances
+    )
+    cache.set_fresh(
+        cache.key_query('summary_input', search_query, date_from, date_to),
+        summary_input,
+        cache.calc_ttl(date_to),
+    )
+
+    return summary_input
+
+
+def _refresh_news(search_query: str, date_from: date, date_to: date) -> None:
+    """
+    Updates news with news published since the last load, or reloads them
+    from API if there are no cached news. If news changed, recalculates
+    summary input and makes caches calculated from them stale, so they are
+    refreshed on the next request. Otherwise the cached values, including
+    the ones calculated from them, are made fresh again.
+
+    :param search_query: search query
+    :type search_query: str
+    :param date_from: start date
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    """
+    update = _update_news(search_query, date_from, date_to)
+    if update is None:
+        n_news_total, important_news = _load_news(
+            search_query, date_from, date_to
+        )
     else:
-        news_for_summary = important_news_to_iterator(important_news)
-        summary_input = get_summary_input(
-            news_for_summary, config.NEWS_DESCRIPTION
+        is_changed, n_news_total, important_news = update
+        if not is_changed:
+            cache.extend_fresh(
+                *(
+                    cache.key_query(prefix, search_query, date_from, date_to)
+                    for prefix in (
+                        'news_count',
+                        'important_news',
+                        'summary_input',
+                        *DERIVED_KEY_PREFIXES,
+                    )
+                ),
+                ttl=cache.calc_ttl(date_to),
+            )
+            return
+        _cache_news(
+            search_query, date_from, date_to, n_news_total, important_news
         )
-        cache.set(key, summary_input, cache.calc_ttl(date_to))
 
-    return n_news_total, summary_input, important_news
+    if n_news_total > 0:
+        _calc_summary_input(search_query, date_from, date_to, important_news)
+
+    cache.mark_stale(
+        *(
+            cache.key_query(prefix, search_query, date_from, date_to)
+            for prefix in DERIVED_KEY_PREFIXES
+        )
+    )
 
 
 def important_news_to_iterator(important_news: dict[dict]) -> Iterable[dict]:
@@ -1,57 +1,99 @@
 import html
 import math
 import re
-import uuid
 from datetime import date, datetime
 from random import randint
-from typing import Iterable
+from typing import Iterable, TypedDict
 
 from loguru import logger
 
 from config_data import config
-from utils.misc import get_json_value
-from utils.misc.api_query_scheduler import ApiQuery, ApiQueryScheduler
-from utils.news.utils import date_from_to_str, date_to_to_str
+from utils.misc import async_api_query_scheduler, get_json_value
+from utils.misc.api_query_scheduler import ApiQuery
+from utils.news.utils import date_from_to_str, date_to_to_str, get_news_id
 
 MIN_REQUEST_INTERVAL = 1
 MAX_TOTAL_QUERIES_TIME = 6
 # MAX_QUERIES_COUNT = 7  # change to 2 for manual testing
 MAX_QUERIES_COUNT = 1  # 100 most relevant news from newsapi.org is enough
+MAX_WORKERS = 7  # pages expected to be fetched at once, see _get_queries_count
 PAGE_SIZE = 100
 MIN_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
+MAX_NEWS = MAX_QUERIES_COUNT * PAGE_SIZE  # news got by get_news by default
 JSON_NEWS_PATH = ['articles']
 JSON_TOTAL_COUNT_PATH = ['totalResults']
 
+_TAG_REGEX = re.compile(r'<[^<]+?>')
+# runs of spaces and tabs except single spaces
+_BLANKS_REGEX = re.compile(r' [ \t]+|\t[ \t]*')
+_TRUNCATION_REGEX = re.compile(r'\s*\[\+\d+ chars\]\s*$')
+
+
+class NewsItem(TypedDict):
+    """
+    Compact news item, the fields of a newsapi article used by the bot.
+    Fields from config.NEWS_EXTRA_FIELDS are kept too.
+
+    Attributes:
+        id (str): id, see get_news_id
+        title (str): title
+        description (str): description
+        content (str): truncated content
+        url (str): url
+        publishedAt (str | None): publication time in ISO 8601
+        source (str | None): source name
+    """
+
+    id: str
+    title: str
+    description: str
+    content: str
+    url: str
+    publishedAt: str | None
+    source: str | None
+
 
 def get_news(
-    search_query: str, date_from: date, date_to: date
+    search_query: str, date_from: date, date_to: date, max_news: int = None
 ) -> tuple[list[dict], int]:
     """
-    Gets news using WebSearch API
+    Gets news using WebSearch API. Smaller max_news make smaller pages,
+    but at least MIN_PAGE_SIZE news are requested.
 
     :param search_query: query to search
     :type search_query: str
-    :param date_from: start date
+    :param date_from: start date, or start time if it is a datetime
     :type date_from: date
     :param date_to: end date
     :type date_to: date
+    :param max_news: max number of news to get, defaults to MAX_NEWS
+    :type max_news: int
     :return: news
     :rtype: list[dict]
     """
+    if max_news is None:
+        max_news = MAX_NEWS
+    page_size = min(max(max_news, MIN_PAGE_SIZE), PAGE_SIZE)
+    max_queries_count = max(1, max_news // page_size)
+
     news = []
 
     n_news_total, query_time = add_first_page_of_news(
-        news, search_query, date_from, date_to, PAGE_SIZE
+        news, search_query, date_from, date_to, page_size
     )
-    n_pages_total = math.ceil(n_news_total / PAGE_SIZE)
+    n_pages_total = math.ceil(n_news_total / page_size)
     logger.success(
         f'got first page of news, count={len(news)}'
         f', total={n_news_total}, total_pages={n_pages_total}'
     )
 
     n_queries = _get_queries_count(
-        query_time, n_pages_total, MAX_TOTAL_QUERIES_TIME, MAX_QUERIES_COUNT
+        query_time,
+        n_pages_total,
+        MAX_TOTAL_QUERIES_TIME,
+        max_queries_count,
+        MAX_WORKERS,
     )
     logger.debug('planned {} more queries'.format(n_queries - 1))
 
@@ -61,13 +103,42 @@ def get_news(
         )
 
         _add_news(
-            news, search_query, date_from, date_to, page_numbers, PAGE_SIZE
+            news, search_query, date_from, date_to, page_numbers, page_size
         )
         logger.success(f'got rest of pages, news count={len(news)}')
 
     return news, n_news_total
 
 
+def get_news_of_days(
+    search_query: str, days: list[date], max_news: int
+) -> list[tuple[list[dict], int]]:
+    """
+    Gets news of every day with one page per day, the pages are requested
+    concurrently. At most PAGE_SIZE news of a day are got.
+
+    :param search_query: query to search
+    :type search_query: str
+    :param days: days
+    :type days: list[date]
+    :param max_news: max number of news of a day to get
+    :type max_news: int
+    :return: news and news count of every day
+    :rtype: list[tuple[list[dict], int]]
+    """
+    page_size = min(max(max_news, MIN_PAGE_SIZE), PAGE_SIZE)
+    pages = _get_news_pages(
+        (search_query, 1, page_size, day, day) for day in days
+    )
+    return [
+        (
+            get_json_value(page, JSON_NEWS_PATH) or [],
+            int(get_json_value(page, JSON_TOTAL_COUNT_PATH)),
+        )
+        for page in pages
+    ]
+
+
 def add_first_page_of_news(
     news: list[dict],
     search_query: str,
@@ -106,9 +177,12 @@ def _get_queries_count(
     n_pages_total: int,
     max_queries_time: float,
     max_queries_count: int,
+    n_workers: int = 1,
 ) -> int:
     """
-    Gets total number of queries planned to be sent (first page included)
+    Gets total number of queries planned to be sent (first page included).
+    Queries are sent by n_workers concurrently, so each round of n_workers
+    queries is expected to take query_time.
 
     :param query_time: expected time of a single query
     :type query_time: float
@@ -118,6 +192,8 @@ def _get_queries_count(
     :type max_queries_time: float
     :param max_queries_count: maximum number of queries to send
     :type max_queries_count: int
+    :param n_workers: number of queries sent concurrently
+    :type n_workers: int
     :return: number of queries planned to be sent
     :rtype: int
     """
@@ -127,7 +203,8 @@ def _get_queries_count(
     if query_time <= 0:
         query_time = MIN_REQUEST_INTERVAL
 
-    n_queries_planned = math.floor(max_queries_time / query_time)
+    n_rounds = math.floor(max_queries_time / query_time)
+    n_queries_planned = n_rounds * max(1, n_workers)
     n_queries_planned = min(n_queries_planned, max_queries_count)
     n_queries_planned = min(n_queries_planned, n_pages_total)
 
@@ -180,7 +257,8 @@ def _add_news(
     news_per_page: int,
 ) -> int:
     """
-    Gets news with API and adds it to news list
+    Gets news pages with API concurrently and adds them to news list
+    in order of page numbers
 
     :param news: news list
     :type news: list[dict]
@@ -197,11 +275,13 @@ def _add_news(
     :return: total news count for the query
     :rtype: int
     """
+    pages = _get_news_pages(
+        (search_query, page_number, news_per_page, date_from, date_to)
+        for page_number in page_numbers
+    )
+
     total_count = 0
-    for i_page in page_numbers:
-        page = _get_news_page(
-            search_query, i_page, news_per_page, date_from, date_to
-        )
+    for page in pages:
         news_portion = get_json_value(page, JSON_NEWS_PATH)
         total_count += int(get_json_value(page, JSON_TOTAL_COUNT_PATH))
         news.extend(news_portion if news_portion is not None else [])
@@ -211,13 +291,13 @@ def _add_news(
 
 def _add_id_field(news: list[dict]) -> None:
     """
-    Adds id field to news items
+    Adds id field to news items, see get_news_id
 
     :param news: news
     :type news: list[dict]
     """
     for news_item in news:
-        news_item[config.NEWS_ID] = uuid.uuid4().hex
+        news_item[config.NEWS_ID] = get_news_id(news_item)
 
 
 def _clean_news(news: list[dict]) -> None:
@@ -230,15 +310,70 @@ def _clean_news(news: list[dict]) -> None:
     keys = ['title', 'description', 'content']
     for news_item in news:
         for key in keys:
-            if news_item[key] is None:
-                news_item[key] = ''
-            else:
-                news_item[key] = re.sub(r'<[^<]+?>', ' ', news_item[key])
-                news_item[key] = html.unescape(news_item[key])
-                news_item[key] = re.sub(r'[ \t]+', ' ', news_item[key])
-        news_item['content'] = re.sub(
-            r'\s*\[\+\d+ chars\]\s*$', '', news_item['content']
+            news_item[key] = _clean_text(news_item[key])
+        content = news_item['content']
+        if content.rstrip().endswith(' chars]'):
+            news_item['content'] = _TRUNCATION_REGEX.sub('', content)
+
+
+def _clean_text(text: str | None) -> str:
+    """
+    Replaces html tags with spaces, unescapes html entities and collapses
+    spaces and tabs. Each step runs only if text contains characters it
+    changes.
+
+    :param text: text
+    :type text: str | None
+    :return: cleaned text, empty string if text is None
+    :rtype: str
+    """
+    if not text:
+        return ''
+
+    if '<' in text:
+        text = _TAG_REGEX.sub(' ', text)
+    if '&' in text:
+        text = html.unescape(text)
+    if '\t' in text or '  ' in text:
+        text = _BLANKS_REGEX.sub(' ', text)
+    return text
+
+
+def _project_news(news: list[dict]) -> list[NewsItem] | list[dict]:
+    """
+    Drops fields of newsapi articles not used by the bot, keeps fields from
+    config.NEWS_EXTRA_FIELDS. Keeps articles as they are if
+    config.NEWS_EXTRA_FIELDS contains '*'.
+
+    :param news: news
+    :type news: list[dict]
+    :return: projected news
+    :rtype: list[NewsItem] | list[dict]
+    """
+    if '*' in config.NEWS_EXTRA_FIELDS:
+        return news
+
+    projected_news = []
+    for news_item in news:
+        source = news_item.get(config.NEWS_SOURCE)
+        if isinstance(source, dict):
+            source = source.get('name')
+
+        projected_item = NewsItem(
+            id=news_item[config.NEWS_ID],
+            title=news_item[config.NEWS_TITLE],
+            description=news_item[config.NEWS_DESCRIPTION],
+            content=news_item[config.NEWS_BODY],
+            url=news_item.get(config.NEWS_URL),
+            publishedAt=news_item.get(config.NEWS_PUBLISHED_AT),
+            source=source,
         )
+        for field in config.NEWS_EXTRA_FIELDS:
+            if field in news_item:
+                projected_item[field] = news_item[field]
+        projected_news.append(projected_item)
+
+    return projected_news
 
 
 def _get_news_page(
@@ -247,26 +382,71 @@ def _get_news_page(
     page_size: int,
     date_from: date,
     date_to: date,
-) -> list[dict]:
+) -> dict:
     """
-    Gets a news page using WebSearch API
+    Gets a news page using WebSearch API, see _make_news_page_query
 
     :param search_query: query to search
     :type search_query: str
     :param page_number: page number, must be greater than 0
     :type page_number: int
-    :param page_size: news per page, must be between 10 and 50
+    :param page_size: news per page, must be between 10 and 100
     :type page_size: int
-    :param date_from: start date
+    :param date_from: start date, or start time if it is a datetime
+    :type date_from: date
+    :param date_to: end date
+    :type date_to: date
+    :return: news page
+    :rtype: dict
+    """
+    return _get_news_pages(
+        [(search_query, page_number, page_size, date_from, date_to)]
+    )[0]
+
+
+def _get_news_pages(pages_args: Iterable[tuple]) -> list[dict]:
+    """
+    Gets news pages using WebSearch API concurrently
+
+    :param pages_args: arguments of _make_news_page_query for every page
+    :type pages_args: Iterable[tuple]
+    :raises ValueError: raised when a request failed
+    :return: news pages in the order of pages_args
+    :rtype: list[dict]
+    """
+    queries = [_make_news_page_query(*page_args) for page_args in pages_args]
+    responses = async_api_query_scheduler.execute_many(queries)
+    return [
+        _process_news_page(query, response)
+        for query, response in zip(queries, responses)
+    ]
+
+
+def _make_news_page_query(
+    search_query: str,
+    page_number: int,
+    page_size: int,
+    date_from: date,
+    date_to: date,
+) -> ApiQuery:
+    """
+    Makes WebSearch API query to get a news page
+
+    :param search_query: query to search
+    :type search_query: str
+    :param page_number: page number, must be greater than 0
+    :type page_number: int
+    :param page_size: news per page, must be between 10 and 100
+    :type page_size: int
+    :param date_from: start date, or start time if it is a datetime
     :type date_from: date
     :param date_to: end date
     :type date_to: date
     :raises ValueError: raised when search query is less than 3 characters long
     :raises ValueError: raised when page_number is less than 1
     :raises ValueError: raised when page_size is out of [10, 100] range
-    :raises ValueError: raised when request failed
-    :return: news
-    :rtype: list[dict]
+    :return: query
+    :rtype: ApiQuery
     """
     if len(search_query.strip()) < 3:
         raise ValueError('Search query must be at least 3 characters long')
@@ -279,7 +459,10 @@ def _get_news_page(
             f'Page size must be between {MIN_PAGE_SIZE} and {MAX_PAGE_SIZE}'
         )
 
-    datetime_from = date_from_to_str(date_from)
+    if isinstance(date_from, datetime):
+        datetime_from = date_from.strftime('%Y-%m-%dT%H:%M:%S')
+    else:
+        datetime_from = date_from_to_str(date_from)
     datetime_to = date_to_to_str(date_to)
 
     url = 'https://newsapi.org/v2/everything'
@@ -290,21 +473,32 @@ def _get_news_page(
         'language': 'en',
         'from': datetime_from,
         'to': datetime_to,
-        'sort': 'relevancy',
+        'sortBy': 'relevancy',
         'page': page_number,
         'pageSize': page_size,
     }
 
-    query = ApiQuery(
+    return ApiQuery(
         'GET',
         url,
         headers=None,
         body=params,
-        interval=MIN_REQUEST_INTERVAL,
         timeout=60,
     )
-    response = ApiQueryScheduler.execute(query)
 
+
+def _process_news_page(query: ApiQuery, response: dict | None) -> dict:
+    """
+    Checks a news page response and cleans and projects its news
+
+    :param query: query of the page
+    :type query: ApiQuery
+    :param response: response
+    :type response: dict | None
+    :raises ValueError: raised when request failed
+    :return: news page
+    :rtype: dict
+    """
     if not response or (
         isinstance(response, dict) and response.get('status') != 'ok'
     ):
@@ -314,15 +508,15 @@ def _get_news_page(
             message = response.get('message')
         raise ValueError(
             'Request {q} from {from_} to {to} failed: {message}'.format(
-                q=search_query,
-                from_=datetime_from,
-                to=datetime_to,
+                q=query.body['q'],
+                from_=query.body['from'],
+                to=query.body['to'],
                 message=message,
             )
         )
 
-    if response:
-        _add_id_field(response['articles'])
-        _clean_news(response['articles'])
+    _add_id_field(response['articles'])
+    _clean_news(response['articles'])
+    response['articles'] = _project_news(response['articles'])
 
     return response
@@ -1,25 +1,63 @@
+import math
 import re
 from typing import Iterable
 
+import numpy as np
+
 from config_data import config
+from utils.news.near_duplicates import get_unique_news
 
 MAX_NEWS_COUNT = 30
 SUMMARY_MAX_INPUT = 30000
 UNIQUE_KEY = config.NEWS_BODY
+NEWS_SEPARATOR = '\n\n'
+# capacity of the knapsack selecting news, lengths are rounded up to
+# SUMMARY_MAX_INPUT / KNAPSACK_CELLS characters
+KNAPSACK_CELLS = 1000
+
+_SYMBOLS_NUMBERS_REGEX = re.compile(r'[\W\d]+')
+_SPACES_REGEX = re.compile(r'[\t ]{2,}')
 
 
-def get_summary_input(news: Iterable[dict], text_key: str) -> str:
+def get_summary_input(
+    news: Iterable[dict],
+    text_key: str,
+    importances: dict[str, float] | None = None,
+) -> str:
     """
-    Gets text for summary
+    Gets text for summary. If importances are given, selects news with max
+    total importance fitting in SUMMARY_MAX_INPUT, see _select_news.
+    Otherwise takes first news of about average length.
 
     :param news: news
     :type news: Iterable[dict]
     :param text_key: field to get text from
     :type text_key: str
+    :param importances: importances of news by id
+    :type importances: dict[str, float] | None
+    :raises ValueError: raised if there are no news with text
     :return: text for summary
     :rtype: str
     """
     news = _get_unique_news(news)
+    if importances is not None:
+        if not news:
+            raise ValueError('News list is empty')
+        texts = [
+            _clean_news_text(news_item[text_key]) + NEWS_SEPARATOR
+            for news_item in news
+        ]
+        selected = _select_news(
+            [len(text) for text in texts],
+            [
+                importances.get(news_item[config.NEWS_ID], 0)
+                for news_item in news
+            ],
+            SUMMARY_MAX_INPUT,
+            MAX_NEWS_COUNT,
+        )
+        return ''.join(texts[i] for i in selected)
+
     average_length = _get_average_length(news, text_key)
     news_count = round(SUMMARY_MAX_INPUT / average_length)
     news_count = min(news_count, len(news), MAX_NEWS_COUNT)
@@ -30,9 +68,110 @@ def get_summary_input(news: Iterable[dict], text_key: str) -> str:
     return text_for_summary
 
 
+def _select_news(
+    lengths: list[int], values: list[float], max_length: int, max_count: int
+) -> list[int]:
+    """
+    Selects at most max_count news with max total value and total length
+    not exceeding max_length:
+    1. if max_count most valuable news fit, they are the best choice;
+    2. otherwise the best of greedy selection by value per character and
+       0/1 knapsack solution, which is trimmed to max_count most valuable
+       news if needed.
+
+    :param lengths: lengths of news
+    :type lengths: list[int]
+    :param values: values of news
+    :type values: list[float]
+    :param max_length: max total length
+    :type max_length: int
+    :param max_count: max number of news
+    :type max_count: int
+    :return: indexes of selected news in ascending order
+    :rtype: list[int]
+    """
+    candidates = [
+        i
+        for i in range(len(lengths))
+        if values[i] > 0 and lengths[i] <= max_length
+    ]
+    by_value = sorted(candidates, key=lambda i: values[i], reverse=True)
+    most_valuable = by_value[:max_count]
+    if sum(lengths[i] for i in most_valuable) <= max_length:
+        return sorted(most_valuable)
+
+    greedy = []
+    total_length = 0
+    for i in sorted(
+        candidates, key=lambda i: values[i] / lengths[i], reverse=True
+    ):
+        if total_length + lengths[i] <= max_length:
+            greedy.append(i)
+            total_length += lengths[i]
+            if len(greedy) == max_count:
+                break
+
+    knapsack = _solve_knapsack(
+        [lengths[i] for i in candidates],
+        [values[i] for i in candidates],
+        max_length,
+    )
+    knapsack = sorted(
+        (candidates[i] for i in knapsack),
+        key=lambda i: values[i],
+        reverse=True,
+    )[:max_count]
+
+    best = max(greedy, knapsack, key=lambda news: sum(values[i] for i in news))
+    return sorted(best)
+
+
+def _solve_knapsack(
+    lengths: list[int], values: list[float], max_length: int
+) -> list[int]:
+    """
+    Solves 0/1 knapsack problem with dynamic programming over
+    KNAPSACK_CELLS cells of capacity. Lengths are rounded up to cells, so
+    the solution always fits.
+
+    :param lengths: lengths of items
+    :type lengths: list[int]
+    :param values: values of items
+    :type values: list[float]
+    :param max_length: capacity
+    :type max_length: int
+    :return: indexes of selected items
+    :rtype: list[int]
+    """
+    cell_length = max(1, math.ceil(max_length / KNAPSACK_CELLS))
+    capacity = max_length // cell_length
+    weights = [math.ceil(length / cell_length) for length in lengths]
+
+    # best[c] is max value of items with total weight at most c
+    best = np.zeros(capacity + 1)
+    is_taken = np.zeros((len(weights), capacity + 1), dtype=bool)
+    for i, (weight, value) in enumerate(zip(weights, values)):
+        if weight > capacity:
+            continue
+        with_item = best[: capacity + 1 - weight] + value
+        is_better = with_item > best[weight:]
+        is_taken[i, weight:] = is_better
+        best[weight:] = np.where(is_better, with_item, best[weight:])
+
+    selected = []
+    cell = capacity
+    for i in range(len(weights) - 1, -1, -1):
+        if is_taken[i, cell]:
+            selected.append(i)
+            cell -= weights[i]
+
+    return selected
+
+
 def _get_unique_news(news: Iterable[dict]) -> list[dict]:
     """
-    Returns a copy of news where no duplicates of value of key present
+    Returns a copy of news where no duplicates or near duplicates of value
+    of key present
 
     :param news: news
     :type news: list[dict]
@@ -47,7 +186,7 @@ def _get_unique_news(news: Iterable[dict]) -> list[dict]:
             added_news.add(text_value)
             result.append(item)
 
-    return result
+    return get_unique_news(result, UNIQUE_KEY)
 
 
 def _remove_symbols_numbers(text: str) -> str:
@@ -59,11 +198,7 @@ def _remove_symbols_numbers(text: str) -> str:
     :return: text without symbols and numbers
     :rtype: str
     """
-    pattern = r'[\W\d]+'
-    empty_str = ''
-    text = re.sub(pattern, empty_str, text)
-
-    return text.lower()
+    return _SYMBOLS_NUMBERS_REGEX.sub('', text).lower()
 
 
 def _get_average_length(news: list, key: str) -> int:
@@ -111,16 +246,20 @@ def _clean_news_text(text: str) -> str:
     text = text.rstrip(' \n\r\t:;,-‐‑‒﹣－')
     if not text.endswith(('!', '?', '…', '.')):
         text += '.'
-    text = re.sub(r'[\t ]{2,}', ' ', text, flags=re.MULTILINE)
+    if '  ' in text or '\t' in text:
+        text = _SPACES_REGEX.sub(' ', text)
 
     return text
 
 
 def _join_news(
-    news: list[dict], key: str, max_item_length: int, sep: str = '\n\n'
+    news: list[dict],
+    key: str,
+    max_item_length: int,
+    sep: str = NEWS_SEPARATOR,
 ) -> str:
     """
-    Joins news text
+    Joins news text until their total length exceeds SUMMARY_MAX_INPUT
 
     :param news: news
     :type news: list[dict]
@@ -133,7 +272,7 @@ def _join_news(
     :return: joined news
     :rtype: str
     """
-    result = ''
+    parts = []
     total_length = 0
     for item in news:
         item_text = _clean_news_text(item[key]) + sep
@@ -141,7 +280,7 @@ def _join_news(
             continue
         total_length += len(item_text)
         if total_length > SUMMARY_MAX_INPUT:
-            continue
-        result += item_text
+            break
+        parts.append(item_text)
 
-    return result
+    return ''.join(parts)
@@ -1,6 +1,18 @@
 import functools
+import hashlib
+import re
+import unicodedata
+import uuid
 from datetime import date, timedelta
 from typing import Iterable, Iterator
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from config_data import config
+
+NEWS_ID_LENGTH = 32
+# query params that do not change the page a url points to
+TRACKING_PARAMS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ocid', 'cmpid'}
+TRACKING_PARAM_PREFIXES = ('utm_',)
 
 
 def get_first_day_of_week(date: date) -> date:
@@ -119,3 +131,95 @@ def date_to_to_str(date_to: date, addT: bool = True) -> str:
     """
     char = 'T' if addT else ' '
     return date_to.strftime(f'%Y-%m-%d{char}23:59:59')
+
+
+def get_news_id(news_item: dict) -> str:
+    """
+    Gets a stable id of a news item: hash of its normalized url, or of its
+    title and source name if it has no url. The same article gets the same
+    id in every search query.
+
+    :param news_item: news item as returned by newsapi.org
+    :type news_item: dict
+    :return: id, a hex string
+    :rtype: str
+    """
+    url = news_item.get('url')
+    if url:
+        content = 'url:' + normalize_url(url)
+    elif news_item.get('title'):
+        source = news_item.get('source') or {}
+        content = 'title:{title}:{source}'.format(
+            title=_normalize_text(news_item['title']),
+            source=_normalize_text(source.get('name') or ''),
+        )
+    else:
+        return uuid.uuid4().hex
+
+    return hashlib.blake2b(
+        content.encode(), digest_size=NEWS_ID_LENGTH // 2
+    ).hexdigest()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes url of an article: drops scheme, 'www.', default port,
+    fragment, trailing slash and tracking params, sorts query params
+
+    :param url: url
+    :type url: str
+    :return: normalized url
+    :rtype: str
+    """
+    parts = urlsplit(url.strip())
+
+    host = (parts.hostname or '').removeprefix('www.')
+    if parts.port and parts.port not in (80, 443):
+        host += f':{parts.port}'
+
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS
+        and not name.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    query = urlencode(params)
+
+    path = parts.path.rstrip('/')
+    return host + path + ('?' + query if query else '')
+
+
+def normalize_query(search_query: str, sort_tokens: bool = None) -> str:
+    """
+    Canonicalizes a search query, so equivalent queries share caches and
+    search history: applies NFKC normalization, folds case and collapses
+    whitespace, optionally sorts words
+
+    :param search_query: search query
+    :type search_query: str
+    :param sort_tokens: sort words, defaults to config.QUERY_SORT_TOKENS
+    :type sort_tokens: bool
+    :return: normalized search query
+    :rtype: str
+    """
+    if sort_tokens is None:
+        sort_tokens = config.QUERY_SORT_TOKENS
+
+    search_query = _normalize_text(search_query)
+    if sort_tokens:
+        search_query = ' '.join(sorted(search_query.split(' ')))
+    return search_query
+
+
+def _normalize_text(text: str) -> str:
+    """
+    Normalizes text for comparison: applies NFKC normalization, folds case
+    and collapses whitespace
+
+    :param text: text
+    :type text: str
+    :return: normalized text
+    :rtype: str
+    """
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip().casefold()
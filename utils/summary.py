@@ -1,32 +1,215 @@
-from typing import Optional
+import hashlib
+import time
+from typing import Callable, Optional
+
+from loguru import logger
 
 from config_data import config
+from utils import textrank
 from utils.misc import get_json_value
+from utils.misc import async_api_query_scheduler
+from utils.misc import redis_cache as cache
 from utils.misc.api_query_scheduler import ApiQuery, ApiQueryScheduler
+from utils.news.summary_input import NEWS_SEPARATOR
+
+# seconds to use only the local engine in auto mode after the API fails
+REMOTE_COOLDOWN = 60
+# summaries depend only on text, size and engine, so they are kept long
+SUMMARY_CACHE_TTL = 3600 * 24 * 7
 
-MIN_REQUEST_INTERVAL = 0.005
+_remote_failed_until = 0.0
 
 
-def get_summary(text: str, n_characters: int = 500) -> Optional[list]:
+def get_summary(
+    text: str, n_characters: int = 500, engine: Optional[str] = None
+) -> Optional[list]:
     """
-    Gets text summary using Text-analysis12 API
+    Gets text summary using an engine: 'remote' - Text-analysis12 API,
+    'local' - TextRank, 'auto' - the API, TextRank if the API fails or
+    times out. After a failure auto mode skips the API for REMOTE_COOLDOWN
+    seconds, but still uses cached API summaries. Long texts are
+    summarized by chunks, see _get_remote_summary.
+    Summaries are cached by text, size and the engine which made
+    them, so equal texts are summarized once whatever the caller.
 
     :param text: text
     :type text: str
     :param n_characters: maximum size of the summary
     :type n_characters: int
+    :param engine: 'remote', 'local' or 'auto', defaults to
+        config.SUMMARY_ENGINE
+    :type engine: Optional[str]
     :return: sentences of the summary
     :rtype: Optional[list]
     """
+    global _remote_failed_until
+
     n_characters = max(0, n_characters)
     if len(text) <= n_characters:
         return [text]
 
-    percent = round(n_characters / len(text) * 100, 3)
-    return get_summary_percent(text, percent)
+    engine = engine or config.SUMMARY_ENGINE
+    if engine == 'auto' and time.monotonic() < _remote_failed_until:
+        summary = cache.get(_key_summary('remote', text, n_characters))
+        if summary:
+            return summary
+        engine = 'local'
+
+    if engine == 'local':
+        return _get_cached_summary(
+            'local', textrank.get_summary, text, n_characters
+        )
+
+    summary = _get_cached_summary(
+        'remote', _get_remote_summary, text, n_characters
+    )
+    if engine == 'auto' and not summary:
+        _remote_failed_until = time.monotonic() + REMOTE_COOLDOWN
+        logger.warning('Summary API failed, using local summary engine')
+        return _get_cached_summary(
+            'local', textrank.get_summary, text, n_characters
+        )
+
+    return summary
+
+
+def _get_cached_summary(
+    engine: str,
+    summarize: Callable[[str, int], Optional[list]],
+    text: str,
+    n_characters: int,
+) -> Optional[list]:
+    """
+    Gets text summary or its cache if cached. Empty summaries, e.g. of
+    failed API requests, are not cached.
+
+    :param engine: name of the engine in cache keys
+    :type engine: str
+    :param summarize: function summarizing text to n_characters
+    :type summarize: Callable[[str, int], Optional[list]]
+    :param text: text
+    :type text: str
+    :param n_characters: maximum size of the summary
+    :type n_characters: int
+    :return: sentences of the summary
+    :rtype: Optional[list]
+    """
+    key = _key_summary(engine, text, n_characters)
+    summary = cache.get(key)
+    if summary is None:
+        summary = summarize(text, n_characters)
+        if summary:
+            cache.set(key, summary, ex=SUMMARY_CACHE_TTL)
+
+    return summary
+
+
+def _key_summary(engine: str, text: str, n_characters: int) -> str:
+    """
+    Creates key for a summary of text
+
+    :param engine: name of the engine
+    :type engine: str
+    :param text: text
+    :type text: str
+    :param n_characters: maximum size of the summary
+    :type n_characters: int
+    :return: Redis key
+    :rtype: str
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    return cache.key('text_summary', engine, n_characters, digest)
+
+
+def _get_remote_summary(text: str, n_characters: int) -> Optional[list]:
+    """
+    Gets text summary using Text-analysis12 API. Texts longer than
+    config.SUMMARY_CHUNK_SIZE are split to chunks of whole news, the chunks
+    are summarized concurrently and their summaries are summarized again.
+
+    :param text: text
+    :type text: str
+    :param n_characters: maximum size of the summary
+    :type n_characters: int
+    :return: sentences of the summary
+    :rtype: Optional[list]
+    """
+    chunks = _split_chunks(text, config.SUMMARY_CHUNK_SIZE)
+    if len(chunks) > 1:
+        queries = [
+            _make_query(
+                chunk,
+                _get_percent(chunk, n_characters),
+                config.SUMMARY_API_TIMEOUT,
+            )
+            for chunk in chunks
+        ]
+        chunk_summaries = [
+            get_json_value(response, ['sentences'])
+            for response in async_api_query_scheduler.execute_many(queries)
+        ]
+        if not all(chunk_summaries):
+            return None
+
+        text = NEWS_SEPARATOR.join(map(' '.join, chunk_summaries))
+        if len(text) <= n_characters:
+            return [
+                sentence
+                for chunk_summary in chunk_summaries
+                for sentence in chunk_summary
+            ]
+
+    return get_summary_percent(
+        text, _get_percent(text, n_characters), config.SUMMARY_API_TIMEOUT
+    )
+
+
+def _split_chunks(text: str, chunk_size: int) -> list[str]:
+    """
+    Splits text to chunks of whole news separated by NEWS_SEPARATOR, every
+    chunk is not longer than chunk_size unless it is a single news item
+
+    :param text: text
+    :type text: str
+    :param chunk_size: maximum size of a chunk, 0 or less for no chunks
+    :type chunk_size: int
+    :return: chunks
+    :rtype: list[str]
+    """
+    if chunk_size <= 0 or len(text) <= chunk_size:
+        return [text]
+
+    chunks, chunk = [], []
+    chunk_length = -len(NEWS_SEPARATOR)
+    for news_text in text.split(NEWS_SEPARATOR):
+        length = len(NEWS_SEPARATOR) + len(news_text)
+        if chunk and chunk_length + length > chunk_size:
+            chunks.append(NEWS_SEPARATOR.join(chunk))
+            chunk, chunk_length = [], -len(NEWS_SEPARATOR)
+        chunk.append(news_text)
+        chunk_length += length
+    chunks.append(NEWS_SEPARATOR.join(chunk))
+
+    return chunks
 
 
-def get_summary_percent(text: str, percent: float) -> Optional[list]:
+def _get_percent(text: str, n_characters: int) -> float:
+    """
+    Calculates size of a summary of text in percent
+
+    :param text: text
+    :type text: str
+    :param n_characters: maximum size of the summary
+    :type n_characters: int
+    :return: size of the summary in percent
+    :rtype: float
+    """
+    return round(n_characters / len(text) * 100, 3)
+
+
+def get_summary_percent(
+    text: str, percent: float, timeout: int = 10
+) -> Optional[list]:
     """
     Make API request to Text-analysis12 API to get text summary
 
@@ -34,9 +217,31 @@ def get_summary_percent(text: str, percent: float) -> Optional[list]:
     :type text: str
     :param percent: size of the summary to get
     :type percent: float
+    :param timeout: request timeout, defaults to 10
+    :type timeout: int
     :return: sentences of the summary
     :rtype: Optional[list]
     """
+    query = _make_query(text, percent, timeout)
+    response = ApiQueryScheduler.execute(query)
+    sentences = get_json_value(response, ['sentences'])
+
+    return sentences
+
+
+def _make_query(text: str, percent: float, timeout: int) -> ApiQuery:
+    """
+    Makes Text-analysis12 API query to get text summary
+
+    :param text: text
+    :type text: str
+    :param percent: size of the summary to get
+    :type percent: float
+    :param timeout: request timeout
+    :type timeout: int
+    :return: query
+    :rtype: ApiQuery
+    """
     percent = min(100, percent)
     percent = max(0, percent)
 
@@ -50,14 +255,10 @@ def get_summary_percent(text: str, percent: float) -> Optional[list]:
 
     request = {'language': 'english', 'summary_percent': percent, 'text': text}
 
-    query = ApiQuery(
+    return ApiQuery(
         'POST',
         url,
         headers=headers,
         body=request,
-        interval=MIN_REQUEST_INTERVAL,
+        timeout=timeout,
     )
-    response = ApiQueryScheduler.execute(query)
-    sentences = get_json_value(response, ['sentences'])
-
-    return sentences
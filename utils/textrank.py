@@ -0,0 +1,161 @@
+import re
+import textwrap
+
+import numpy as np
+
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+# shorter sentences are ranked but not selected, they are often fragments
+MIN_SENTENCE_WORDS = 4
+# sentences more similar to a selected one are not selected
+MAX_SIMILARITY = 0.7
+# marks the end of a shortened sentence
+PLACEHOLDER = '…'
+STOP_WORDS = frozenset(
+    (
+        'a about after all also an and any are as at be been but by can '
+        'could did do does for from had has have he her his how i if in '
+        'into is it its just more most my new no not of on one or our out '
+        'over said says she so than that the their them then there these '
+        'they this to up us was we were what when which who will with '
+        'would you your'
+    ).split()
+)
+
+_SENTENCE_END_REGEX = re.compile(r'(?<=[.!?…])\s+(?=\S)|\s*\n\s*')
+_WORD_REGEX = re.compile(r'[^\W\d_]{2,}')
+
+
+def get_summary(text: str, n_characters: int = 500) -> list[str]:
+    """
+    Gets extractive text summary: sentences are ranked with TextRank over
+    a graph of TF-IDF cosine similarities of sentences, the best ranked
+    sentences fitting in n_characters are returned in text order. Short
+    fragments and sentences repeating selected ones are skipped. If no
+    sentence fits, the best one is shortened.
+
+    :param text: text
+    :type text: str
+    :param n_characters: maximum size of the summary
+    :type n_characters: int
+    :return: sentences of the summary, empty if not even a word fits
+    :rtype: list[str]
+    """
+    if n_characters < 1:
+        return []
+    if len(text) <= n_characters:
+        return [text]
+
+    sentences = _split_sentences(text)
+    if not sentences:
+        return []
+
+    tfidf = _get_tfidf(sentences)
+    similarities = tfidf @ tfidf.T
+    np.fill_diagonal(similarities, 0)
+    scores = _rank_sentences(similarities.copy())
+
+    selected = []
+    total_length = 0
+    for i in np.argsort(-scores, kind='stable').tolist():
+        length = len(sentences[i]) + (1 if selected else 0)
+        if (
+            total_length + length <= n_characters
+            and len(sentences[i].split()) >= MIN_SENTENCE_WORDS
+            and not (similarities[i, selected] > MAX_SIMILARITY).any()
+        ):
+            selected.append(i)
+            total_length += length
+
+    if not selected:
+        best = sentences[int(np.argmax(scores))]
+        shortened = textwrap.shorten(
+            best, n_characters, placeholder=PLACEHOLDER
+        )
+        # only the placeholder is left if the first word does not fit
+        if not shortened or shortened == PLACEHOLDER.strip():
+            return []
+        return [shortened]
+
+    return [sentences[i] for i in sorted(selected)]
+
+
+def _split_sentences(text: str) -> list[str]:
+    """
+    Splits text to sentences at sentence ending punctuation followed by
+    spaces and at line breaks
+
+    :param text: text
+    :type text: str
+    :return: sentences
+    :rtype: list[str]
+    """
+    return [
+        sentence
+        for sentence in _SENTENCE_END_REGEX.split(text.strip())
+        if sentence
+    ]
+
+
+def _rank_sentences(similarities: np.ndarray) -> np.ndarray:
+    """
+    Ranks sentences with TextRank
+
+    :param similarities: similarities of sentences with zero diagonal,
+        modified in place
+    :type similarities: np.ndarray
+    :return: scores of sentences
+    :rtype: np.ndarray
+    """
+    n_sentences = len(similarities)
+    weights_sum = similarities.sum(axis=1)
+    # sentences without edges link to all sentences
+    similarities[weights_sum == 0] = 1 / n_sentences
+    weights_sum[weights_sum == 0] = 1
+    transitions = similarities / weights_sum[:, None]
+
+    scores = np.full(n_sentences, 1 / n_sentences)
+    for _ in range(MAX_ITERATIONS):
+        new_scores = (1 - DAMPING) / n_sentences + DAMPING * (
+            transitions.T @ scores
+        )
+        is_converged = np.abs(new_scores - scores).sum() < TOLERANCE
+        scores = new_scores
+        if is_converged:
+            break
+
+    return scores
+
+
+def _get_tfidf(sentences: list[str]) -> np.ndarray:
+    """
+    Calculates L2 normalized TF-IDF vectors of sentences. Only words found
+    in several sentences are columns of the result, other words add only
+    to the norms.
+
+    :param sentences: sentences
+    :type sentences: list[str]
+    :return: matrix of TF-IDF vectors, a row for every sentence
+    :rtype: np.ndarray
+    """
+    word_ids = {}
+    rows, columns = [], []
+    for i_sentence, sentence in enumerate(sentences):
+        for word in _WORD_REGEX.findall(sentence.casefold()):
+            if word not in STOP_WORDS:
+                rows.append(i_sentence)
+                columns.append(word_ids.setdefault(word, len(word_ids)))
+
+    n_sentences, n_words = len(sentences), len(word_ids)
+    counts = np.bincount(
+        np.array(rows, dtype=np.int64) * n_words + columns,
+        minlength=n_sentences * n_words,
+    ).reshape(n_sentences, n_words)
+    doc_freqs = np.count_nonzero(counts, axis=0)
+    tfidf = counts * np.log(n_sentences / np.maximum(doc_freqs, 1))
+
+    norms = np.linalg.norm(tfidf, axis=1)
+    norms[norms == 0] = 1
+    shared = doc_freqs > 1
+    return (tfidf[:, shared] / norms[:, None]).astype(np.float32)
@@ -1,20 +1,36 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
+from threading import Lock
 from typing import Tuple
 
+from loguru import logger
+
 from config_data import config
 from utils.misc import redis_cache as cache
+from utils.misc import singleflight
+from utils.news.near_duplicates import get_unique_news
+from utils.summary import get_summary
 
 TEXT_KEYS = (config.NEWS_TITLE, config.NEWS_BODY)
+# max number of article summaries computed in the background at once
+ARTICLE_SUMMARY_WORKERS = 2
+# max number of prefetch jobs waiting for a worker, the oldest ones are
+# cancelled, their summaries are computed when they are requested
+MAX_PENDING_PREFETCH_JOBS = 50
+
+_article_summary_executor = ThreadPoolExecutor(
+    max_workers=ARTICLE_SUMMARY_WORKERS, thread_name_prefix='article_summary'
+)
+# article summary prefetch jobs by news ids in the order they are submitted
+_prefetch_jobs = OrderedDict()
+_prefetch_jobs_lock = Lock()
 
 
-def get_top_news(
-    sentences: list[str], important_news: dict[dict], n_max: int = 5
-) -> list[dict]:
+def get_top_news(important_news: dict[dict], n_max: int = 5) -> list[dict]:
     """
-    Tries to get top 5 news
+    Tries to get top 5 news, skips near duplicates of more important news
 
-    :param sentences: sentences
-    :type sentences: list[str]
     :param important_news: news: {id: {importance: float, news: dict}, ...}
     :type important_news: dict[dict]
     :param n_max: max number of news to return
@@ -22,30 +38,30 @@ def get_top_news(
     :return: top 5 news
     :rtype: list[dict]
     """
-    top_news = []
-    i_item = 0
-    for news_id in important_news:
-        top_news.append(important_news[news_id]['news'])
-        i_item += 1
-        if i_item >= n_max:
-            break
-
-    return top_news[:n_max]
+    return get_unique_news(
+        (item['news'] for item in important_news.values()), TEXT_KEYS, n_max
+    )
 
 
 def cache_top_news_items(top_news: list[dict], date_to: date) -> None:
     """
-    Caches top news
+    Caches top news. Items have stable ids and are shared by search queries,
+    so TTL of an item cached before is extended if needed.
 
     :param top_news: top news
     :type top_news: list[dict]
     :param date_to: end date of a news search query to calculate cache ttl
     :type date_to: date
     """
-    for news_item in top_news:
-        key = cache.key('top_news_item', news_item[config.NEWS_ID])
-        if not cache.exists(key):
-            cache.set(key, news_item, ex=cache.calc_ttl(date_to))
+    cache.set_many(
+        {
+            cache.key('top_news_item', news_item[config.NEWS_ID]): news_item
+            for news_item in top_news
+        },
+        ex=cache.calc_ttl(date_to),
+        nx=True,
+        extend_ttl=True,
+    )
 
 
 def get_cached_top_news_item(id: str) -> Tuple[dict | None, int]:
@@ -57,8 +73,168 @@ def get_cached_top_news_item(id: str) -> Tuple[dict | None, int]:
     :return: title and url
     :rtype: Tuple[dict | None, int]
     """
-    key = cache.key('top_news_item', id)
-    if cache.exists(key):
-        news_item = cache.get(key)
-        return news_item, cache.get_ttl(key)
-    return None, 0
+    news_item, ttl = cache.get_with_ttl(cache.key('top_news_item', id))
+    if news_item is None:
+        return None, 0
+    return news_item, ttl
+
+
+def get_article_summary(news_item: dict, ttl: int) -> list[str] | None:
+    """
+    Gets summary of a top news item article or its cache if cached.
+    Waits for the summary being computed by another caller, e.g. by a
+    prefetch job, instead of computing it again. A prefetch job of the
+    item waiting for a worker is cancelled, the summary is computed at once.
+
+    :param news_item: top news item
+    :type news_item: dict
+    :param ttl: time in seconds the summary is fresh
+    :type ttl: int
+    :return: sentences of the summary
+    :rtype: list[str] | None
+    """
+    with _prefetch_jobs_lock:
+        job = _prefetch_jobs.get(news_item[config.NEWS_ID])
+    if job is not None:
+        # running jobs are not cancelled, singleflight waits for them
+        job.cancel()
+
+    return _get_article_summary(news_item, ttl)
+
+
+def _get_article_summary(news_item: dict, ttl: int) -> list[str] | None:
+    """
+    Gets summary of a top news item article, see get_article_summary.
+    A cached summary is read in one round trip, singleflight is used only
+    when the summary is not cached.
+
+    :param news_item: top news item
+    :type news_item: dict
+    :param ttl: time in seconds the summary is fresh
+    :type ttl: int
+    :return: sentences of the summary
+    :rtype: list[str] | None
+    """
+    key = cache.key('article_summary', news_item[config.NEWS_ID])
+    (entry,) = cache.prefetch(key)
+    if entry.value is not None:
+        return cache.get_set_entry(
+            entry,
+            ttl,
+            get_summary,
+            news_item[config.NEWS_BODY],
+            engine=config.ARTICLE_SUMMARY_ENGINE,
+        )
+
+    return singleflight.do(
+        key,
+        cache.get_set,
+        key,
+        ttl,
+        get_summary,
+        news_item[config.NEWS_BODY],
+        engine=config.ARTICLE_SUMMARY_ENGINE,
+    )
+
+
+def prefetch_article_summaries(
+    top_news: list[dict], date_to: date
+) -> list[Future]:
+    """
+    Computes and caches article summaries of top news in the background, so
+    that getting a summary of an article is a cache hit. News items with
+    cached summaries or prefetch jobs are skipped, jobs of news items
+    expired from cache do nothing. Only jobs waiting for a worker are
+    cancelled, see MAX_PENDING_PREFETCH_JOBS.
+
+    :param top_news: top news
+    :type top_news: list[dict]
+    :param date_to: end date of a news search query to calculate cache ttl
+    :type date_to: date
+    :return: new jobs
+    :rtype: list[Future]
+    """
+    entries = cache.prefetch(
+        *(
+            cache.key('article_summary', news_item[config.NEWS_ID])
+            for news_item in top_news
+        )
+    )
+    ttl = cache.calc_ttl(date_to)
+
+    jobs = {}
+    with _prefetch_jobs_lock:
+        for news_item, entry in zip(top_news, entries):
+            news_id = news_item[config.NEWS_ID]
+            if entry.value is not None or news_id in _prefetch_jobs:
+                continue
+            jobs[news_id] = _article_summary_executor.submit(
+                _prefetch_article_summary, news_item, ttl
+            )
+        _prefetch_jobs.update(jobs)
+        cancelled_jobs = _pop_old_prefetch_jobs()
+
+    for job in cancelled_jobs:
+        job.cancel()
+    for news_id, job in jobs.items():
+        job.add_done_callback(
+            lambda job, news_id=news_id: _forget_prefetch_job(news_id, job)
+        )
+
+    return list(jobs.values())
+
+
+def _pop_old_prefetch_jobs() -> list[Future]:
+    """
+    Removes the oldest jobs waiting for a worker from prefetch jobs, so
+    that at most MAX_PENDING_PREFETCH_JOBS of them are left. Must be called
+    with _prefetch_jobs_lock held.
+
+    :return: removed jobs to cancel
+    :rtype: list[Future]
+    """
+    pending = [
+        news_id
+        for news_id, job in _prefetch_jobs.items()
+        if not job.running() and not job.done()
+    ]
+    n_excess = max(0, len(pending) - MAX_PENDING_PREFETCH_JOBS)
+    return [_prefetch_jobs.pop(news_id) for news_id in pending[:n_excess]]
+
+
+def _prefetch_article_summary(news_item: dict, ttl: int) -> None:
+    """
+    Computes and caches summary of a top news item article if the item is
+    still cached and the summary is not, e.g. by a click meanwhile
+
+    :param news_item: top news item
+    :type news_item: dict
+    :param ttl: time in seconds the summary is fresh
+    :type ttl: int
+    """
+    news_id = news_item[config.NEWS_ID]
+    if not cache.exists(cache.key('top_news_item', news_id)):
+        logger.debug(f'top_news: {news_id} expired, summary not prefetched')
+        return
+
+    try:
+        _get_article_summary(news_item, ttl)
+        logger.debug(f'top_news: prefetched summary of {news_id}')
+    except Exception as exc:
+        logger.error(
+            f'top_news: unable to prefetch summary of {news_id}: {exc}'
+        )
+
+
+def _forget_prefetch_job(news_id: str, job: Future) -> None:
+    """
+    Forgets a prefetch job when it is done
+
+    :param news_id: news id
+    :type news_id: str
+    :param job: job
+    :type job: Future
+    """
+    with _prefetch_jobs_lock:
+        if _prefetch_jobs.get(news_id) is job:
+            del _prefetch_jobs[news_id]